@@ -0,0 +1,11 @@
+"""
+End-to-end benchmarks of the search and ask endpoints.
+
+The app is booted with benchmarks/settings.py: a small deterministic
+hashing encoder (benchmarks/encoder.py) replaces the E5 model, the fake
+LLM backend replaces Gemini, and the indexes are built from
+quran_complet.json in a scratch directory. No network, no GPU.
+
+    python -m benchmarks.run --concurrency 8 --requests 200 --out bench.json
+    python -m benchmarks.run --baseline bench.json     # compare, exit 1 on regression
+"""
@@ -0,0 +1,58 @@
+"""
+Benchmark indexes built from quran_complet.json with the hashing encoder,
+in the format written by index_quran.py. The hadith collection is not
+shipped with the repository, so the benchmark corpus is the Quran only.
+"""
+
+import json
+import os
+
+from django.conf import settings
+
+from quran_api.services.text_utils import normalize_batch
+
+
+def build_quran_index(encoder, limit: int = None, force: bool = False) -> int:
+    """Write settings.QURAN_INDEX_PATH (and drop its stale FAISS index); returns the verse count."""
+    output = settings.QURAN_INDEX_PATH
+    if os.path.exists(output) and not force:
+        with open(output, 'r', encoding='utf-8') as f:
+            docs = json.load(f)
+        same_dimension = bool(docs) and len(docs[0]['embedding']) == encoder.dimension
+        if same_dimension and (limit is None or len(docs) == limit):
+            return len(docs)
+
+    with open(settings.BASE_DIR / 'quran_complet.json', 'r', encoding='utf-8') as f:
+        verses = json.load(f)
+    if limit:
+        verses = verses[:limit]
+
+    normalized_frs = normalize_batch([v['text_fr'] for v in verses], 'french')
+    normalized_ars = normalize_batch([v['text_ar'] for v in verses], 'arabic')
+
+    docs = []
+    for v, normalized_fr, normalized_ar in zip(verses, normalized_frs, normalized_ars):
+        docs.append({
+            "id": f"v_{v['sourate']}_{v['ayah']}",
+            "reference": f"Sourate {v['sourate']} ({v['sourate_name']}), Verset {v['ayah']}",
+            "text_fr": v['text_fr'],
+            "text_ar": v['text_ar'],
+            "normalized_fr": normalized_fr,
+            "normalized_ar": normalized_ar,
+            "metadata": {
+                "sourate": v['sourate'],
+                "ayah": v['ayah'],
+                "sourate_name": v['sourate_name']
+            }
+        })
+
+    embeddings = encoder.encode([f"passage: {d['normalized_fr']} {d['normalized_ar']}" for d in docs])
+    for doc, embedding in zip(docs, embeddings):
+        doc["embedding"] = embedding.tolist()
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(docs, f, ensure_ascii=False)
+    # VectorService rebuilds the FAISS index from the JSON when it is missing
+    if os.path.exists(settings.FAISS_INDEX_PATH):
+        os.remove(settings.FAISS_INDEX_PATH)
+    return len(docs)
@@ -0,0 +1,122 @@
+"""
+Load generator: `concurrency` threads share a fixed number of requests,
+each thread keeping its own HTTP connection.
+"""
+
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentiles(values) -> dict:
+    if not values:
+        return {f"p{q}": None for q in PERCENTILES}
+    result = np.percentile(np.asarray(values, dtype='float64'), PERCENTILES)
+    return {f"p{q}": round(float(v), 2) for q, v in zip(PERCENTILES, result)}
+
+
+class Scenario:
+    """One endpoint driven by the load generator."""
+
+    def __init__(self, name: str, method: str, path, body=None, streaming: bool = False):
+        self.name = name
+        self.method = method
+        self.path = path            # str, or callable(i) → str
+        self.body = body            # None, or callable(i) → dict
+        self.streaming = streaming
+
+    def request(self, i: int):
+        path = self.path(i) if callable(self.path) else self.path
+        body = json.dumps(self.body(i)).encode('utf-8') if self.body else None
+        return path, body
+
+
+def _send(conn, prefix, scenario, i, headers):
+    """Run one request; returns (latency_ms, ttft_ms or None, ok)."""
+    path, body = scenario.request(i)
+    started = time.perf_counter()
+    conn.request(scenario.method, prefix + path, body=body, headers=headers)
+    response = conn.getresponse()
+    ttft = None
+    ok = response.status == 200
+
+    if scenario.streaming and ok:
+        # NDJSON: time to the first token event, and no error event
+        for line in response:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if event.get('type') == 'token' and ttft is None:
+                ttft = (time.perf_counter() - started) * 1000
+            elif event.get('type') == 'error':
+                ok = False
+    else:
+        response.read()
+    return (time.perf_counter() - started) * 1000, ttft, ok
+
+
+def run(base_url: str, scenario: Scenario, concurrency: int, requests: int, token: str = None,
+        offset: int = 0) -> dict:
+    """
+    Send `requests` requests with `concurrency` threads and return the
+    throughput, latency percentiles (ms), time to first token for streaming
+    scenarios, and the error count.
+    """
+    url = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+    prefix = url.path.rstrip('/')
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f"Token {token}"
+
+    lock = threading.Lock()
+    counter = iter(range(offset, offset + requests))
+    latencies, ttfts = [], []
+    errors = [0]
+
+    def worker():
+        conn = connection_class(url.hostname, url.port, timeout=120)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            try:
+                latency, ttft, ok = _send(conn, prefix, scenario, i, headers)
+            except Exception:
+                conn.close()
+                latency, ttft, ok = None, None, False
+            with lock:
+                if ok:
+                    latencies.append(latency)
+                    if ttft is not None:
+                        ttfts.append(ttft)
+                else:
+                    errors[0] += 1
+        conn.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    result = {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors[0],
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(len(latencies) / duration, 2) if duration > 0 else 0.0,
+        'latency_ms': percentiles(latencies),
+    }
+    if scenario.streaming:
+        result['ttft_ms'] = percentiles(ttfts)
+    return result
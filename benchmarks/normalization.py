@@ -0,0 +1,127 @@
+"""
+Microbenchmark of the text normalizers (quran_api/services/text_utils.py).
+
+Times the translate-table normalizers against the original regex
+implementation (kept below as the reference) on the whole corpus:
+
+    python -m benchmarks.normalization [--hadith bukhari_complet.json] [--out norm.json]
+
+That both return exactly the same output is checked by the test suite
+(NormalizationEquivalenceTests in quran_api/tests.py).
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+
+from quran_api.services import text_utils
+
+
+# --- Reference implementation (regex / NFD / category filter) ---
+
+def reference_french(text: str) -> str:
+    text = text.lower()
+    text = ''.join(
+        c for c in unicodedata.normalize('NFD', text)
+        if unicodedata.category(c) != 'Mn'
+    )
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def reference_arabic(text: str) -> str:
+    text = re.sub('[إأآٱ]', 'ا', text)
+    text = re.sub('ى', 'ي', text)
+    text = re.sub('ؤ', 'و', text)
+    text = re.sub('ئ', 'ي', text)
+    text = re.sub('ة', 'ه', text)
+    text = re.sub(r'[ً-ٟـ]', '', text)
+    return text
+
+
+def reference_text(text: str) -> str:
+    return reference_arabic(reference_french(text))
+
+
+# (name, reference, single-text normalizer, batch kind)
+CASES = (
+    ('french', reference_french, text_utils.normalize_french, 'french'),
+    ('arabic', reference_arabic, text_utils.normalize_arabic, 'arabic'),
+    ('text', reference_text, text_utils.normalize_text, 'text'),
+)
+
+
+def load_corpus(paths) -> list:
+    texts = []
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Fichier {path} introuvable, ignoré.")
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for item in json.load(f):
+                texts.extend([item['text_fr'], item['text_ar']])
+    return texts
+
+
+def best_of(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark de la normalisation FR/AR")
+    parser.add_argument('--quran', default='quran_complet.json')
+    parser.add_argument('--hadith', default=None, help="Ajouter les hadiths (ex: bukhari_complet.json)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out', default=None, help="Fichier JSON des résultats")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus([args.quran] + ([args.hadith] if args.hadith else []))
+
+    results = {'texts': len(corpus), 'characters': sum(map(len, corpus)), 'cases': {}}
+    print(f"\nCorpus : {results['texts']} textes, {results['characters']} caractères (meilleur de {args.repeat})")
+    for name, reference, normalizer, kind in CASES:
+        before = best_of(lambda: [reference(text) for text in corpus], args.repeat)
+        after = best_of(lambda: [normalizer(text) for text in corpus], args.repeat)
+        batch = best_of(lambda: text_utils.normalize_batch(corpus, kind), args.repeat)
+        results['cases'][name] = {
+            'reference_s': round(before, 4),
+            'single_s': round(after, 4),
+            'batch_s': round(batch, 4),
+            'speedup_single': round(before / after, 1),
+            'speedup_batch': round(before / batch, 1),
+        }
+        print(f"  {name:<7} référence {before * 1000:8.1f} ms   un par un {after * 1000:7.1f} ms "
+              f"(x{before / after:.1f})   batch {batch * 1000:7.1f} ms (x{before / batch:.1f})")
+
+    # Memoized path: the same short query normalized again
+    query = "Que dit le Coran sur la patience dans les épreuves ?"
+    text_utils.normalize_text(query)
+    started = time.perf_counter()
+    for _ in range(100000):
+        text_utils.normalize_text(query)
+    memo_us = (time.perf_counter() - started) / 100000 * 1e6
+    started = time.perf_counter()
+    for _ in range(10000):
+        reference_text(query)
+    reference_us = (time.perf_counter() - started) / 10000 * 1e6
+    results['query'] = {'reference_us': round(reference_us, 2), 'memoized_us': round(memo_us, 2)}
+    print(f"  requête courte : référence {reference_us:.1f} µs, mémoïsée {memo_us:.2f} µs")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Résultats écrits dans {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Benchmark CLI: boots the app (or targets --url), drives /api/search/,
+/api/ask/ and /api/ask/stream/, writes the results as JSON and compares
+them with a baseline.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+from . import load
+
+QUESTIONS = [
+    "Que dit le Coran sur la patience dans les épreuves ?",
+    "Quels sont les droits des parents selon le Coran ?",
+    "Comment le Coran décrit-il la miséricorde d'Allah ?",
+    "Que dit le Coran sur le jeûne du mois de Ramadan ?",
+    "Quelle est la récompense de ceux qui font le bien ?",
+    "Que dit le Coran sur la prière ?",
+    "Comment traiter les orphelins selon le Coran ?",
+    "Que dit le Coran sur l'aumône et la zakat ?",
+    "Quelle est l'histoire de Moussa et Pharaon ?",
+    "Que dit le Coran sur le pardon ?",
+    "صبر",
+    "الرحمن الرحيم",
+]
+
+SCENARIOS = {
+    'search': load.Scenario(
+        'search', 'GET',
+        lambda i: f"/search/?q={quote(QUESTIONS[i % len(QUESTIONS)])}&limit=5",
+    ),
+    'ask': load.Scenario(
+        'ask', 'POST', '/ask/',
+        body=lambda i: {'q': QUESTIONS[i % len(QUESTIONS)], 'source_filter': 'both'},
+    ),
+    'ask-stream': load.Scenario(
+        'ask-stream', 'POST', '/ask/stream/',
+        body=lambda i: {'q': QUESTIONS[i % len(QUESTIONS)], 'source_filter': 'both'},
+        streaming=True,
+    ),
+}
+
+# Metrics compared with the baseline: (label, path in a scenario result, higher is better)
+COMPARED = (
+    ('débit (req/s)', ('throughput_rps',), True),
+    ('latence p95 (ms)', ('latency_ms', 'p95'), False),
+    ('TTFT p95 (ms)', ('ttft_ms', 'p95'), False),
+)
+
+
+def rss_mb():
+    """Current resident set size of this process (Linux), else the peak."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf('SC_PAGE_SIZE') / 2**20, 1)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+def boot(verses, dimension):
+    """
+    Start the app in this process behind a threaded WSGI server.
+    Returns (base_url, token, meta).
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+    from rest_framework.authtoken.models import Token
+
+    from quran_api.models import SubscriptionPlan
+    from quran_api.services import vector_service
+    from .corpus import build_quran_index
+    from .encoder import HashingEncoder
+
+    encoder = HashingEncoder(dimension)
+    print(f"Index de benchmark ({settings.BENCHMARK_DIR})...")
+    verse_count = build_quran_index(encoder, limit=verses)
+    call_command('migrate', verbosity=0)
+
+    started = time.perf_counter()
+    vector_service._vector_service = vector_service.VectorService(model=encoder)
+    vector_service._vector_service.indexes.wait()
+    load_s = time.perf_counter() - started
+
+    # Unlimited plan: the benchmark must not hit the daily quota
+    plan, _ = SubscriptionPlan.objects.update_or_create(name='max', defaults={'daily_request_limit': -1})
+    user, _ = User.objects.get_or_create(username='benchmark')
+    user.profile.subscription_plan = plan
+    user.profile.save()
+    token, _ = Token.objects.get_or_create(user=user)
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=True)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, name='benchmark-server', daemon=True).start()
+
+    meta = {
+        'verses': verse_count,
+        'dimension': dimension,
+        'index_load_s': round(load_s, 3),
+        'fake_llm': dict(settings.FAKE_LLM),
+    }
+    return f"http://127.0.0.1:{server.server_port}/api", token.key, meta
+
+
+def _metric(result, path):
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Print current vs baseline; returns the list of regressions."""
+    regressions = []
+    print(f"\nComparaison avec la référence (tolérance {tolerance:.0%}) :")
+    for name, current in results['scenarios'].items():
+        reference = baseline.get('scenarios', {}).get(name)
+        if reference is None:
+            print(f"  {name:<11} absent de la référence")
+            continue
+        for label, path, higher_is_better in COMPARED:
+            value, base = _metric(current, path), _metric(reference, path)
+            if value is None or not base:
+                continue
+            change = (value - base) / base
+            worse = -change if higher_is_better else change
+            flag = "RÉGRESSION" if worse > tolerance else "ok"
+            print(f"  {name:<11} {label:<17} {base:>9} → {value:<9} ({change:+.1%}) {flag}")
+            if worse > tolerance:
+                regressions.append(f"{name} {label}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark des endpoints search / ask / ask-stream")
+    parser.add_argument('--scenarios', default='search,ask,ask-stream',
+                        help="Scénarios séparés par des virgules (search, ask, ask-stream)")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100, help="Requêtes mesurées par scénario")
+    parser.add_argument('--warmup', type=int, default=5, help="Requêtes non mesurées par scénario")
+    parser.add_argument('--verses', type=int, default=None, help="Limiter le corpus aux N premiers versets")
+    parser.add_argument('--dimension', type=int, default=64, help="Dimension de l'encodeur de benchmark")
+    parser.add_argument('--url', default=None, help="Cibler un serveur existant (ex: http://localhost:8000/api)")
+    parser.add_argument('--token', default=None, help="Token DRF à utiliser avec --url")
+    parser.add_argument('--out', default=None, help="Fichier JSON des résultats")
+    parser.add_argument('--baseline', default=None, help="Résultats de référence à comparer")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Dégradation tolérée (0.10 = 10 %%)")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Scénarios inconnus : {', '.join(unknown)}")
+
+    if args.url:
+        base_url, token, meta = args.url, args.token, {'url': args.url}
+    else:
+        base_url, token, meta = boot(args.verses, args.dimension)
+        meta['rss_mb_after_boot'] = rss_mb()
+
+    results = {
+        'meta': {
+            **meta,
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+        },
+        'scenarios': {},
+    }
+
+    for offset, name in enumerate(names):
+        scenario = SCENARIOS[name]
+        if args.warmup:
+            load.run(base_url, scenario, args.concurrency, args.warmup, token)
+        result = load.run(base_url, scenario, args.concurrency, args.requests, token, offset=offset)
+        if not args.url:
+            result['rss_mb'] = rss_mb()
+        results['scenarios'][name] = result
+
+        latency = result['latency_ms']
+        line = (f"{name:<11} {result['throughput_rps']:>8} req/s  "
+                f"p50 {latency['p50']} ms  p95 {latency['p95']} ms  p99 {latency['p99']} ms")
+        if 'ttft_ms' in result:
+            line += f"  TTFT p50 {result['ttft_ms']['p50']} ms"
+        if result['errors']:
+            line += f"  ({result['errors']} erreurs)"
+        print(line)
+
+    if not args.url:
+        results['meta']['rss_mb_peak'] = peak_rss_mb()
+        print(f"RSS : {results['meta']['rss_mb_after_boot']} Mo après démarrage, pic {results['meta']['rss_mb_peak']} Mo")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Résultats écrits dans {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} régression(s) : {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+Django settings of the benchmark runs: production settings with local
+indexes, a scratch SQLite database and the fake LLM backend.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+from core.settings import *  # noqa: F401,F403
+
+BENCHMARK_DIR = Path(os.environ.get('BENCHMARK_DIR', Path(tempfile.gettempdir()) / 'corangpt-benchmark'))
+BENCHMARK_DIR.mkdir(parents=True, exist_ok=True)
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BENCHMARK_DIR / 'db.sqlite3',
+    }
+}
+
+# Indexes built by benchmarks.corpus with the hashing encoder
+QURAN_INDEX_PATH = BENCHMARK_DIR / 'quran_indexed.json'
+FAISS_INDEX_PATH = BENCHMARK_DIR / 'quran_faiss.index'
+HADITH_INDEX_PATH = BENCHMARK_DIR / 'hadith_indexed.json'
+HADITH_FAISS_INDEX_PATH = BENCHMARK_DIR / 'hadith_faiss.index'
+HADITH_CHUNKS_PATH = BENCHMARK_DIR / 'hadith_chunks.npz'
+HADITH_CHUNK_FAISS_INDEX_PATH = BENCHMARK_DIR / 'hadith_chunks_faiss.index'
+RELATED_INDEX_PATH = BENCHMARK_DIR / 'related_neighbors.npz'
+CONCORDANCE_INDEX_PATH = BENCHMARK_DIR / 'concordance.npz'
+INDEX_DIR = BENCHMARK_DIR / 'indexes'
+
+# Fake Gemini; latencies still tunable through FAKE_LLM_* variables
+LLM_BACKEND = 'fake'
+
+# The load generator is one client: no token bucket, the search gate stays on
+ADMISSION = {**ADMISSION, 'rates': {plan: (None, 0) for plan in ADMISSION['rates']}}  # noqa: F405
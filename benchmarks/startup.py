@@ -0,0 +1,132 @@
+"""
+Startup benchmark: what every `manage.py` step of entrypoint.sh (migrate,
+collectstatic, createsuperuser, seed_plans.py) pays before doing any work.
+
+In fresh interpreters, it
+  - runs django.setup() plus the URL configuration (which imports the
+    views and services) under `python -X importtime` and summarizes the
+    import time per top-level package,
+  - checks that none of HEAVY_MODULES was imported (they must stay behind
+    the service accessors),
+  - times `manage.py check` end to end.
+
+    python -m benchmarks.startup [--budget-ms 1500] [--top 15] [--out startup.json]
+
+Exits 1 if a heavy module is imported or the imports exceed the budget.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Loaded by get_vector_service() / get_llm_service() only
+HEAVY_MODULES = ('torch', 'faiss', 'sentence_transformers', 'transformers', 'google.generativeai')
+
+PROBE = (
+    "import django, json, sys\n"
+    "django.setup()\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+    "print(json.dumps(sorted(sys.modules)))\n"
+)
+
+
+def _env(settings_module):
+    env = dict(os.environ)
+    env['DJANGO_SETTINGS_MODULE'] = settings_module
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(ROOT), env.get('PYTHONPATH')]))
+    return env
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Cumulative microseconds per top-level package, from the `-X importtime`
+    lines (`import time: self | cumulative | <indent>name`). Only the
+    outermost imports are summed, nested ones are part of their cumulative.
+    """
+    packages = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|', 2)
+        if name.startswith('  '):
+            continue
+        packages[name.strip().split('.')[0]] += int(cumulative)
+    return dict(packages)
+
+
+def measure_imports(settings_module):
+    """(package → µs, imported module names) of django.setup() + URL loading."""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=ROOT, env=_env(settings_module), capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return parse_importtime(completed.stderr), json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def time_command(args, settings_module, repeat):
+    """Best wall time (seconds) of `python <args>` over `repeat` runs."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=ROOT, env=_env(settings_module),
+                       check=True, capture_output=True)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Temps d'import au démarrage des commandes manage.py")
+    parser.add_argument('--settings', default='benchmarks.settings', help="Module de settings Django")
+    parser.add_argument('--budget-ms', type=float, default=1500, help="Temps d'import maximal toléré (ms)")
+    parser.add_argument('--top', type=int, default=15, help="Paquets affichés")
+    parser.add_argument('--repeat', type=int, default=3, help="Exécutions de manage.py check (meilleure retenue)")
+    parser.add_argument('--out', default=None, help="Fichier JSON des résultats")
+    args = parser.parse_args(argv)
+
+    packages, modules = measure_imports(args.settings)
+    total_ms = sum(packages.values()) / 1000
+    heavy = sorted(name for name in HEAVY_MODULES if name in modules)
+    check_s = time_command(['manage.py', 'check'], args.settings, args.repeat)
+
+    ranking = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    print(f"Imports (django.setup + URLs) : {total_ms:.0f} ms, {len(modules)} modules")
+    for name, us in ranking[:args.top]:
+        print(f"  {name:<28} {us / 1000:8.1f} ms")
+    print(f"manage.py check : {check_s * 1000:.0f} ms (meilleur de {args.repeat})")
+
+    results = {
+        'settings': args.settings,
+        'python': sys.version.split()[0],
+        'import_ms': round(total_ms, 1),
+        'modules': len(modules),
+        'packages_ms': {name: round(us / 1000, 1) for name, us in ranking},
+        'heavy_imported': heavy,
+        'manage_check_ms': round(check_s * 1000, 1),
+    }
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Résultats écrits dans {args.out}")
+
+    failed = False
+    if heavy:
+        print(f"ÉCHEC : modules lourds importés au démarrage : {', '.join(heavy)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"ÉCHEC : {total_ms:.0f} ms d'imports, budget {args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -35,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'quran_api.middleware.TimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -83,6 +84,84 @@ else:
         }
     }
 
+# Cache
+# Quota counters must be shared by all Gunicorn workers: use Redis in production.
+# Without REDIS_URL each process keeps its own in-memory cache (dev only).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds an authenticated token (with profile and plan) stays cached
+AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL', '60'))
+
+# Seconds between two bulk writes of the quota counters to UserProfile
+QUOTA_FLUSH_INTERVAL = int(os.environ.get('QUOTA_FLUSH_INTERVAL', '10'))
+
+# Chat history write-behind queue (see quran_api/services/write_behind.py)
+HISTORY_WRITE_BEHIND = {
+    'max_size': int(os.environ.get('HISTORY_QUEUE_MAX_SIZE', '1000')),
+    'batch_size': int(os.environ.get('HISTORY_QUEUE_BATCH_SIZE', '50')),
+    'flush_interval': float(os.environ.get('HISTORY_QUEUE_FLUSH_INTERVAL', '2')),
+}
+
+# Stage timing histograms (/api/metrics/): seconds between two flushes of a
+# worker's observations to the cache, and optional bearer token of the scraper
+METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', '10'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Admission control (see quran_api/services/admission.py): token bucket per
+# user / IP shared through the cache, as (tokens per second, burst) per plan
+# (None = unlimited), and per-worker cap of concurrent searches with a short
+# priority queue (seconds a search may wait before a 503)
+ADMISSION = {
+    'rates': {
+        'anonymous': (float(os.environ.get('ADMISSION_ANONYMOUS_RATE', '0.5')), 10),
+        'free': (1, 20),
+        'mensuel': (2, 40),
+        'max': (5, 100),
+    },
+    'encode_concurrency': int(os.environ.get('ADMISSION_ENCODE_CONCURRENCY', '2')),
+    'encode_queue': int(os.environ.get('ADMISSION_ENCODE_QUEUE', '8')),
+    'queue_timeout': float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '2')),
+}
+# Ceiling of the `limit` parameter of search / ask
+SEARCH_MAX_TOP_K = int(os.environ.get('SEARCH_MAX_TOP_K', '20'))
+
+# Request ledger (cost / latency per ask), written behind like the history
+LEDGER_WRITE_BEHIND = {
+    'max_size': int(os.environ.get('LEDGER_QUEUE_MAX_SIZE', '5000')),
+    'batch_size': int(os.environ.get('LEDGER_QUEUE_BATCH_SIZE', '200')),
+    'flush_interval': float(os.environ.get('LEDGER_QUEUE_FLUSH_INTERVAL', '5')),
+}
+
+# Seconds a conversation's retrieved contexts stay cached for follow-up questions
+CONVERSATION_CONTEXT_TTL = int(os.environ.get('CONVERSATION_CONTEXT_TTL', '3600'))
+
+# Query caches of the ask pipeline, in seconds (quran_api/services/query_cache.py).
+# With PREWARM_QUERIES > 0, each worker fills them for the most frequent
+# questions of the last PREWARM_DAYS days before it reports ready
+QUERY_CACHE = {
+    'rewrite_ttl': int(os.environ.get('QUERY_CACHE_REWRITE_TTL', str(7 * 86400))),
+    'embedding_ttl': int(os.environ.get('QUERY_CACHE_EMBEDDING_TTL', str(7 * 86400))),
+    'retrieval_ttl': int(os.environ.get('QUERY_CACHE_RETRIEVAL_TTL', '86400')),
+    'prewarm_queries': int(os.environ.get('PREWARM_QUERIES', '0')),
+    'prewarm_days': int(os.environ.get('PREWARM_DAYS', '7')),
+}
+
+# RSS budget of a worker in MB, checked by manage.py memory_report and
+# reported by /api/memory/ (Render starter: 512 MB; 0 = no budget)
+MEMORY_BUDGET_MB = float(os.environ.get('MEMORY_BUDGET_MB', '512'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -111,12 +190,17 @@ CORS_ALLOW_ALL_ORIGINS = True
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'quran_api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
+    ],
+    # Reverse proxies in front of Django (1 behind Render's load balancer):
+    # anonymous clients are throttled per IP, read from X-Forwarded-For only
+    # as far as these proxies appended it; 0 keys on REMOTE_ADDR, since a
+    # client can send any X-Forwarded-For value
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '0')),
 }
 
 # Quran Config
@@ -124,5 +208,63 @@ QURAN_INDEX_PATH = BASE_DIR / "quran_indexed.json"
 FAISS_INDEX_PATH = BASE_DIR / "quran_faiss.index"
 HADITH_INDEX_PATH = BASE_DIR / "hadith_indexed.json"
 HADITH_FAISS_INDEX_PATH = BASE_DIR / "hadith_faiss.index"
+HADITH_CHUNKS_PATH = BASE_DIR / "hadith_chunks.npz"
+HADITH_CHUNK_FAISS_INDEX_PATH = BASE_DIR / "hadith_chunks_faiss.index"
+RELATED_INDEX_PATH = BASE_DIR / "related_neighbors.npz"
+# Positional index of the Arabic words (index_concordance.py)
+CONCORDANCE_INDEX_PATH = BASE_DIR / "concordance.npz"
+# Optional ruku boundaries: JSON list of [sourate, ayah] starts
+QURAN_RUKU_PATH = BASE_DIR / "quran_ruku.json"
+# Searchable collections, one FAISS shard each, searched in parallel by
+# SEARCH_FANOUT_WORKERS threads (quran_api/services/collection_registry.py).
+# Extra hadith collections indexed by index_hadith.py are listed in
+# HADITH_COLLECTIONS (e.g. "muslim,abudawud") and read from <name>_indexed.json
+COLLECTIONS = {
+    'quran': {
+        'source': 'quran',
+        'artifacts': {'data': 'quran_data', 'faiss': 'quran_faiss'},
+    },
+    'bukhari': {
+        'source': 'hadith',
+        'artifacts': {
+            'data': 'hadith_data', 'faiss': 'hadith_faiss',
+            'chunks': 'hadith_chunks', 'chunks_faiss': 'hadith_chunks_faiss',
+        },
+    },
+}
+COLLECTIONS.update({
+    name.strip(): {'source': 'hadith'}
+    for name in os.environ.get('HADITH_COLLECTIONS', '').split(',') if name.strip()
+})
+SEARCH_FANOUT_WORKERS = int(os.environ.get('SEARCH_FANOUT_WORKERS', '4'))
+# Versioned index artifacts (manage.py publish_indexes); the *_PATH files
+# above are used while nothing is published. Workers check the manifest
+# every INDEX_WATCH_INTERVAL seconds and hot-swap a new version (0 = never)
+INDEX_DIR = Path(os.environ.get('INDEX_DIR', BASE_DIR / "indexes"))
+INDEX_WATCH_INTERVAL = float(os.environ.get('INDEX_WATCH_INTERVAL', '30'))
+# Neighbouring ayat added around each verse sent to the LLM (±N)
+ASK_VERSE_WINDOW = int(os.environ.get('ASK_VERSE_WINDOW', '1'))
+MAX_VERSE_WINDOW = 5
 MODEL_NAME = 'intfloat/multilingual-e5-base'
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+GEMINI_MODEL_NAME = os.environ.get('GEMINI_MODEL_NAME', 'gemini-3-flash-preview')
+
+# Prompt context packing (see quran_api/services/prompt_builder.py)
+PROMPT_PACKING = {
+    'token_budget': int(os.environ.get('PROMPT_TOKEN_BUDGET', '3000')),
+    'max_distance': float(os.environ.get('CONTEXT_MAX_DISTANCE', '0.6')),
+    'mmr_lambda': float(os.environ.get('CONTEXT_MMR_LAMBDA', '0.7')),
+    'duplicate_similarity': 0.97,
+    'hadith_max_chars': int(os.environ.get('HADITH_MAX_CHARS', '600')),
+}
+
+# LLM backend: 'gemini' in production, 'fake' for offline load tests / CI
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'gemini')
+FAKE_LLM = {
+    'first_token_latency': float(os.environ.get('FAKE_LLM_FIRST_TOKEN_LATENCY', '0.3')),
+    'tokens_per_second': float(os.environ.get('FAKE_LLM_TOKENS_PER_SECOND', '50')),
+    'failure_rate': float(os.environ.get('FAKE_LLM_FAILURE_RATE', '0')),
+    'answer_tokens': int(os.environ.get('FAKE_LLM_ANSWER_TOKENS', '120')),
+    'seed': int(os.environ.get('FAKE_LLM_SEED', '0')),
+    'fail_after_tokens': int(os.environ.get('FAKE_LLM_FAIL_AFTER_TOKENS', '0')),
+}
@@ -53,10 +53,5 @@ echo "============================================="
 echo "  🟢 Démarrage de Gunicorn sur le port ${PORT:-8000}"
 echo "============================================="
 
-exec gunicorn core.wsgi:application \
-    --bind "0.0.0.0:${PORT:-8000}" \
-    --workers "${GUNICORN_WORKERS:-2}" \
-    --threads "${GUNICORN_THREADS:-4}" \
-    --timeout "${GUNICORN_TIMEOUT:-120}" \
-    --access-logfile - \
-    --error-logfile -
+# Bind, workers, threads, timeout and GUNICORN_PRELOAD: see gunicorn.conf.py
+exec gunicorn core.wsgi:application --config gunicorn.conf.py
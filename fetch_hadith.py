@@ -1,12 +1,56 @@
-import requests
+"""
+Téléchargement des recueils de hadiths (éditions française et arabe de
+fawazahmed0/hadith-api) et fusion en <recueil>_complet.json.
+
+Les éditions sont téléchargées en parallèle et écrites sur disque au fil
+de l'eau dans --cache-dir :
+- une édition inchangée n'est pas retéléchargée (If-None-Match /
+  If-Modified-Since, réponse 304) ;
+- un téléchargement interrompu reprend où il s'était arrêté (Range +
+  If-Range sur le fichier .part) ;
+- les erreurs réseau et 5xx sont retentées avec un délai croissant.
+
+La fusion FR/AR par numéro de hadith lit les deux éditions en flux, sans
+charger les JSON entiers, et écrit un hadith par ligne.
+
+    python fetch_hadith.py                                # Sahih al-Bukhari
+    python fetch_hadith.py --collections bukhari,muslim
+    python fetch_hadith.py --collections all --base-url http://localhost:8001/editions
+"""
+
+import argparse
 import json
 import logging
-from typing import Dict, List
+import os
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BASE_URL = 'https://cdn.jsdelivr.net/gh/fawazahmed0/hadith-api@1/editions'
+
+# Recueil (nom des éditions) → (nom affiché, grade de tout le recueil)
+COLLECTIONS = {
+    'bukhari': ("Sahih al-Bukhari", "Sahih"),
+    'muslim': ("Sahih Muslim", "Sahih"),
+    'abudawud': ("Sunan Abu Dawud", None),
+    'nasai': ("Sunan an-Nasai", None),
+    'ibnmajah': ("Sunan Ibn Majah", None),
+    'malik': ("Muwatta Malik", None),
+}
+
+LANGUAGES = ('fra', 'ara')
+CHUNK_SIZE = 1 << 16
+
+
+class IncompleteDownload(Exception):
+    pass
+
+
 def clean_text(text: str) -> str:
     """Clean HTML tags and extra spaces from text."""
     # Supprimer les balises HTML si présentes
@@ -15,63 +59,254 @@ def clean_text(text: str) -> str:
     text = re.sub(r'\s+', ' ', text)
     return text.strip()
 
-def download_and_merge_hadiths():
-    fra_url = 'https://cdn.jsdelivr.net/gh/fawazahmed0/hadith-api@1/editions/fra-bukhari.json'
-    ara_url = 'https://cdn.jsdelivr.net/gh/fawazahmed0/hadith-api@1/editions/ara-bukhari.json'
-
-    logger.info("Téléchargement de Sahih al-Bukhari (Français)...")
-    fra_resp = requests.get(fra_url)
-    fra_data = fra_resp.json()
-
-    logger.info("Téléchargement de Sahih al-Bukhari (Arabe)...")
-    ara_resp = requests.get(ara_url)
-    ara_data = ara_resp.json()
-
-    logger.info("Fusion des données (Français + Arabe)...")
-    
-    # Créer un dictionnaire pour l'arabe par hadithnumber
-    ara_dict = {h['hadithnumber']: h['text'] for h in ara_data['hadiths']}
-
-    merged_hadiths = []
-    
-    for fra_h in fra_data['hadiths']:
-        hadith_no = fra_h['hadithnumber']
-        
-        # Ignorer les hadiths sans texte valide
-        text_fr = clean_text(fra_h.get('text', ''))
-        text_ar = clean_text(ara_dict.get(hadith_no, ''))
-
-        if not text_fr or not text_ar:
+
+def _read_meta(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_meta(path, meta):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, path)
+
+
+def _validators(response):
+    return {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+
+
+def download(session, url, path, timeout=30, retries=3, backoff=1.0):
+    """
+    Télécharge `url` dans `path` en flux. Retourne 'unchanged' (304),
+    'downloaded' ou 'resumed' (suite d'un .part).
+
+    `path`.meta.json garde l'ETag / Last-Modified du fichier complet
+    ('file') et du .part en cours ('part').
+    """
+    part_path, meta_path = f"{path}.part", f"{path}.meta.json"
+
+    for attempt in range(retries + 1):
+        meta = _read_meta(meta_path)
+        # Sans compression : les octets du .part sont ceux de la ressource, donc
+        # Range et Content-Length portent sur ce qui est écrit sur le disque
+        headers = {'Accept-Encoding': 'identity'}
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        part = meta.get('part') or {}
+        if offset and (part.get('etag') or part.get('last_modified')):
+            # If-Range : la suite seulement si la ressource n'a pas changé, sinon 200 complet
+            headers['Range'] = f"bytes={offset}-"
+            headers['If-Range'] = part.get('etag') or part.get('last_modified')
+        elif os.path.exists(path) and meta.get('file'):
+            if meta['file'].get('etag'):
+                headers['If-None-Match'] = meta['file']['etag']
+            if meta['file'].get('last_modified'):
+                headers['If-Modified-Since'] = meta['file']['last_modified']
+
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 304:
+                    return 'unchanged'
+                if response.status_code == 416:
+                    # .part invalide (plus long que la ressource) : on repart de zéro
+                    os.remove(part_path)
+                    raise IncompleteDownload(f"{url} : plage refusée, reprise depuis le début")
+                response.raise_for_status()
+
+                resumed = response.status_code == 206
+                # Serveur qui compresse malgré tout : iter_content décode, les tailles
+                # ne correspondent plus à la ressource, pas de reprise possible
+                encoded = response.headers.get('Content-Encoding', 'identity').lower() != 'identity'
+                meta['part'] = None if encoded else _validators(response)
+                _write_meta(meta_path, meta)
+
+                expected = None if encoded else response.headers.get('Content-Length')
+                written = 0
+                with open(part_path, 'ab' if resumed else 'wb') as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        written += len(chunk)
+                if expected is not None and written < int(expected):
+                    raise IncompleteDownload(f"{url} : {written}/{expected} octets reçus")
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                IncompleteDownload) as e:
+            error = e
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code < 500:
+                raise
+            error = e
+        else:
+            os.replace(part_path, path)
+            meta['file'], meta['part'] = _validators(response), None
+            _write_meta(meta_path, meta)
+            return 'resumed' if resumed else 'downloaded'
+
+        if attempt == retries:
+            raise error
+        delay = backoff * 2 ** attempt
+        logger.warning(f"{error} — nouvel essai dans {delay:.0f} s ({attempt + 1}/{retries})")
+        time.sleep(delay)
+
+
+def iter_json_array(path, key='hadiths'):
+    """Les objets du tableau `key` d'un gros fichier JSON, lus en flux."""
+    decoder = json.JSONDecoder()
+    marker = re.compile(rf'"{re.escape(key)}"\s*:\s*\[')
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                raise ValueError(f"{path} : tableau '{key}' introuvable")
+            # Garder la fin du tampon : la clé peut être coupée entre deux blocs
+            buffer = buffer[-256:] + chunk
+            match = marker.search(buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+
+        eof = False
+        while True:
+            buffer = buffer.lstrip(' \t\r\n,')
+            if buffer.startswith(']'):
+                return
+            try:
+                if not buffer:
+                    raise json.JSONDecodeError("fin du tampon", buffer, 0)
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError(f"{path} : JSON tronqué")
+                chunk = f.read(CHUNK_SIZE)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield item
+            buffer = buffer[end:]
+
+
+def merge_editions(collection, fra_path, ara_path, output_file):
+    """
+    Fusionne les éditions française et arabe par numéro de hadith en un
+    seul passage : les deux fichiers sont lus en parallèle et seuls les
+    textes arabes lus en avance (éditions non alignées) restent en mémoire.
+    """
+    name, collection_grade = COLLECTIONS.get(collection, (collection, None))
+    arabic = iter_json_array(ara_path)
+    pending = {}
+    count = 0
+
+    tmp = f"{output_file}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as out:
+        out.write('[\n')
+        for fra_h in iter_json_array(fra_path):
+            hadith_no = fra_h['hadithnumber']
+            while hadith_no not in pending:
+                ara_h = next(arabic, None)
+                if ara_h is None:
+                    break
+                pending[ara_h['hadithnumber']] = ara_h.get('text', '')
+
+            # Ignorer les hadiths sans texte valide
+            text_fr = clean_text(fra_h.get('text', ''))
+            text_ar = clean_text(pending.pop(hadith_no, ''))
+            if not text_fr or not text_ar:
+                continue
+
+            grade = collection_grade
+            if grade is None:
+                grade = next((g['grade'] for g in fra_h.get('grades', []) if g.get('grade')), "Non précisé")
+
+            merged_hadith = {
+                "collection": name,
+                "book_number": fra_h.get('reference', {}).get('book', 0),
+                "hadith_number": hadith_no,
+                "grade": grade,
+                "text_ar": text_ar,
+                "text_fr": text_fr,
+                "keywords": []  # Peut être rempli plus tard, ou par extraction Mots-clés
+            }
+            out.write(',\n' if count else '')
+            out.write(json.dumps(merged_hadith, ensure_ascii=False))
+            count += 1
+        out.write('\n]\n')
+    os.replace(tmp, output_file)
+    return count
+
+
+def fetch_collections(collections, base_url=BASE_URL, cache_dir='hadith_sources', output_dir='.',
+                      workers=6, timeout=30, retries=3):
+    """Télécharge toutes les éditions en parallèle puis fusionne chaque recueil modifié."""
+    os.makedirs(cache_dir, exist_ok=True)
+    # Une session (et son pool de connexions) par thread : Session n'est pas thread-safe
+    local = threading.local()
+    sessions = []
+    jobs = {
+        (collection, language): os.path.join(cache_dir, f"{language}-{collection}.json")
+        for collection in collections for language in LANGUAGES
+    }
+
+    def fetch(job):
+        collection, language = job
+        url = f"{base_url.rstrip('/')}/{language}-{collection}.json"
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+            sessions.append(session)
+        started = time.perf_counter()
+        status = download(session, url, jobs[job], timeout=timeout, retries=retries)
+        logger.info(f"{language}-{collection} : {status} ({time.perf_counter() - started:.1f} s)")
+        return status
+
+    statuses, failed = {}, set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {job: pool.submit(fetch, job) for job in jobs}
+        for (collection, language), future in futures.items():
+            try:
+                statuses[collection, language] = future.result()
+            except Exception as e:
+                logger.error(f"Échec du téléchargement de {language}-{collection} : {e}")
+                failed.add(collection)
+    for session in sessions:
+        session.close()
+
+    for collection in collections:
+        if collection in failed:
+            continue
+        output_file = os.path.join(output_dir, f"{collection}_complet.json")
+        if os.path.exists(output_file) and all(statuses[collection, lang] == 'unchanged' for lang in LANGUAGES):
+            logger.info(f"{collection} : éditions inchangées, {output_file} conservé")
             continue
+        logger.info(f"Fusion de {collection} (Français + Arabe)...")
+        count = merge_editions(
+            collection, jobs[collection, 'fra'], jobs[collection, 'ara'], output_file
+        )
+        logger.info(f"Sauvegarde de {count} hadiths dans {output_file}")
+
+    if failed:
+        logger.error(f"Recueils non mis à jour : {', '.join(sorted(failed))}")
+    else:
+        logger.info("Opération terminée avec succès !")
+    return not failed
 
-        book_no = fra_h.get('reference', {}).get('book', 0)
-        
-        # Tous les Bukhari sont Sahih, on peut affirmer "Sahih" globalement,
-        # ou utiliser les `grades` s'ils existent dans fra_h.
-        grades = fra_h.get('grades', [])
-        grade = "Sahih" 
-        for g in grades:
-            if g.get('name') == 'Sahih Bukhari':
-                grade = g.get('grade', 'Sahih')
-
-        merged_hadith = {
-            "collection": "Sahih al-Bukhari",
-            "book_number": book_no,
-            "hadith_number": hadith_no,
-            "grade": grade,
-            "text_ar": text_ar,
-            "text_fr": text_fr,
-            "keywords": [] # Peut être rempli plus tard, ou par extraction Mots-clés
-        }
-        
-        merged_hadiths.append(merged_hadith)
-
-    output_file = 'bukhari_complet.json'
-    logger.info(f"Sauvegarde de {len(merged_hadiths)} hadiths dans {output_file}...")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(merged_hadiths, f, ensure_ascii=False, indent=2)
-
-    logger.info("Opération terminée avec succès !")
 
 if __name__ == "__main__":
-    download_and_merge_hadiths()
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Téléchargement des recueils de hadiths (FR + AR)")
+    parser.add_argument('--collections', default='bukhari',
+                        help=f"Recueils séparés par des virgules, ou all ({', '.join(COLLECTIONS)})")
+    parser.add_argument('--base-url', default=BASE_URL, help="Dossier des éditions (ex : serveur local de test)")
+    parser.add_argument('--cache-dir', default='hadith_sources', help="Éditions téléchargées et fichiers .part")
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--workers', type=int, default=6, help="Téléchargements simultanés")
+    parser.add_argument('--timeout', type=float, default=30, help="Délai réseau en secondes")
+    parser.add_argument('--retries', type=int, default=3)
+    args = parser.parse_args()
+
+    names = list(COLLECTIONS) if args.collections == 'all' else [c.strip() for c in args.collections.split(',') if c.strip()]
+    ok = fetch_collections(names, args.base_url, args.cache_dir, args.output_dir,
+                           args.workers, args.timeout, args.retries)
+    raise SystemExit(0 if ok else 1)
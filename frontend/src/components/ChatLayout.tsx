@@ -35,6 +35,8 @@ export function ChatLayout({ chat, theme, onToggleTheme }: ChatLayoutProps) {
                 currentId={chat.currentId}
                 isOpen={sidebarOpen}
                 theme={theme}
+                hasMore={chat.hasMoreConversations}
+                onLoadMore={chat.loadMoreConversations}
                 onNewChat={() => { chat.newChat(); setSidebarOpen(false) }}
                 onSelect={(id) => { chat.selectConversation(id); setSidebarOpen(false) }}
                 onDelete={chat.deleteConversation}
@@ -6,6 +6,9 @@ interface SidebarProps {
     currentId: string
     isOpen: boolean
     theme: 'light' | 'dark'
+    /** More server conversations can be fetched (cursor pagination) */
+    hasMore: boolean
+    onLoadMore: () => void
     onNewChat: () => void
     onSelect: (id: string) => void
     onDelete: (id: string) => void
@@ -21,6 +24,8 @@ export function Sidebar({
     currentId,
     isOpen,
     theme,
+    hasMore,
+    onLoadMore,
     onNewChat,
     onSelect,
     onDelete,
@@ -63,7 +68,14 @@ export function Sidebar({
             </div>
 
             {/* Conversation list */}
-            <div className="flex-1 overflow-y-auto px-3 py-1 space-y-1">
+            <div
+                className="flex-1 overflow-y-auto px-3 py-1 space-y-1"
+                onScroll={(e) => {
+                    // Infinite scroll: fetch the next page when nearing the bottom
+                    const el = e.currentTarget
+                    if (hasMore && el.scrollHeight - el.scrollTop - el.clientHeight < 80) onLoadMore()
+                }}
+            >
                 {conversations.length > 0 && (
                     <div className="px-2 py-1 mt-1 mb-1">
                         <p className="text-[12px] font-semibold text-stone-400 dark:text-stone-500">Aujourd'hui</p>
@@ -94,6 +106,14 @@ export function Sidebar({
                         </button>
                     </div>
                 ))}
+                {hasMore && (
+                    <button
+                        onClick={onLoadMore}
+                        className="w-full px-3 py-2 rounded-lg text-[13px] text-stone-500 dark:text-stone-400 hover:bg-stone-200/50 dark:hover:bg-[#202123] transition-colors"
+                    >
+                        Afficher plus
+                    </button>
+                )}
             </div>
 
             {/* Footer / User Settings & Profile */}
@@ -1,11 +1,23 @@
 import { useState, useRef, useCallback, useEffect } from 'react'
 import type { Conversation, Message, QuranVerse } from '../types/chat'
-import { streamQuestion, fetchHistory } from '../lib/api'
+import { streamQuestion, fetchConversations, fetchConversation } from '../lib/api'
 import { useAuth } from './useAuth'
 
 /** Generate a unique ID */
 const uid = () => crypto.randomUUID()
 
+/** Sidebar entry of a server conversation; its messages are fetched when it is opened */
+const fromServer = (item: any): Conversation => ({
+    id: item.id.toString(),
+    title: item.title.length > 40 ? item.title.slice(0, 40) + '…' : item.title,
+    createdAt: new Date(item.last_message_at),
+    conversationId: item.id,
+    loaded: false,
+    messages: [
+        { id: uid(), role: 'assistant', content: '', isStreaming: true, createdAt: new Date(item.last_message_at) } as Message
+    ]
+})
+
 /** Create a blank conversation */
 const createConversation = (): Conversation => ({
     id: uid(),
@@ -35,19 +47,17 @@ export function useChat() {
     const [isStreaming, setIsStreaming] = useState(false);
     const [sourceFilter, setSourceFilter] = useState<'both' | 'quran' | 'hadith'>('both');
     const abortRef = useRef<AbortController | null>(null);
+    // Cursor URL of the next page of server conversations (null once all are listed)
+    const [nextPage, setNextPage] = useState<string | null>(null);
+    const loadingMoreRef = useRef(false);
 
     useEffect(() => {
+        setNextPage(null);
         if (token) {
-            fetchHistory().then((historyItems: any[]) => {
-                const loadedConvos = historyItems && historyItems.length > 0 ? historyItems.map(item => ({
-                    id: item.id.toString(),
-                    title: item.query.length > 40 ? item.query.slice(0, 40) + '…' : item.query,
-                    createdAt: new Date(item.created_at),
-                    messages: [
-                        { id: uid(), role: 'user', content: item.query, createdAt: new Date(item.created_at) } as Message,
-                        { id: uid(), role: 'assistant', content: item.response, sources: (item.sources || []), createdAt: new Date(item.created_at) } as Message
-                    ]
-                })) : [];
+            fetchConversations().then((page: { results: any[]; next: string | null }) => {
+                const items = page.results;
+                const loadedConvos = items && items.length > 0 ? items.map(fromServer) : [];
+                setNextPage(page.next);
 
                 setConversations(prev => {
                     const savedId = sessionStorage.getItem('currentChatId');
@@ -106,6 +116,47 @@ export function useChat() {
         }
     }, [token]);
 
+    /** Append the next page of server conversations to the sidebar */
+    const loadMoreConversations = useCallback(() => {
+        if (!nextPage || loadingMoreRef.current) return;
+        loadingMoreRef.current = true;
+        fetchConversations(nextPage).then((page: { results: any[]; next: string | null }) => {
+            setConversations(prev => {
+                const known = new Set(prev.map(c => c.conversationId));
+                return [...prev, ...page.results.filter(item => !known.has(item.id)).map(fromServer)];
+            });
+            setNextPage(page.next);
+        }).catch(e => {
+            console.error(e);
+        }).finally(() => {
+            loadingMoreRef.current = false;
+        });
+    }, [nextPage]);
+
+    // Load the messages of a server conversation when it is opened
+    useEffect(() => {
+        const conv = conversations.find(c => c.id === currentId);
+        if (!conv || !conv.conversationId || conv.loaded) return;
+
+        const conversationId = conv.conversationId;
+        setConversations(prev => prev.map(c => (c.id === conv.id ? { ...c, loaded: true } : c)));
+        fetchConversation(conversationId).then(data => {
+            setConversations(prev => prev.map(c => (c.id === conv.id ? {
+                ...c,
+                messages: (data.messages as any[]).flatMap(item => [
+                    { id: uid(), role: 'user', content: item.query, createdAt: new Date(item.created_at) } as Message,
+                    { id: uid(), role: 'assistant', content: item.response, sources: (item.sources || []), createdAt: new Date(item.created_at) } as Message
+                ])
+            } : c)));
+        }).catch(e => {
+            console.error(e);
+            setConversations(prev => prev.map(c => (c.id === conv.id ? {
+                ...c,
+                messages: c.messages.map(m => (m.isStreaming ? { ...m, content: `Erreur: ${e.message}`, isStreaming: false } : m))
+            } : c)));
+        });
+    }, [currentId, conversations]);
+
     // Update sessionStorage continuously
     useEffect(() => {
         if (currentId) {
@@ -312,6 +363,7 @@ export function useChat() {
                 await streamQuestion(
                     content.trim(),
                     sourceFilter,
+                    currentConversation.conversationId,
                     {
                         onSources: (sources: QuranVerse[]) => {
                             updateMessages(msgs =>
@@ -320,6 +372,13 @@ export function useChat() {
                                 )
                             )
                         },
+                        onConversation: (conversationId: number) => {
+                            setConversations(prev =>
+                                prev.map(c =>
+                                    c.id === currentId ? { ...c, conversationId, loaded: true } : c
+                                )
+                            )
+                        },
                         onToken: (token: string) => {
                             updateMessages(msgs =>
                                 msgs.map(m =>
@@ -402,7 +461,7 @@ export function useChat() {
                 abortRef.current = null
             }
         },
-        [isStreaming, currentMessages.length, sourceFilter, updateMessages, updateConversationTitle]
+        [isStreaming, currentId, currentConversation.conversationId, currentMessages.length, sourceFilter, updateMessages, updateConversationTitle]
     )
 
     return {
@@ -415,6 +474,8 @@ export function useChat() {
         nextResetTime,
         sourceFilter,
         setSourceFilter,
+        hasMoreConversations: nextPage !== null,
+        loadMoreConversations,
         newChat,
         sendMessage,
         selectConversation,
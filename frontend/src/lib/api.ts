@@ -39,8 +39,9 @@ export async function register(username: string, email: string, password: string
     return response.json();
 }
 
-export async function fetchHistory() {
-    const response = await fetch(`${API_BASE}/history/`, {
+/** One page of the sidebar conversations (cursor pagination, most recent first). */
+export async function fetchConversations(cursorUrl?: string) {
+    const response = await fetch(cursorUrl || `${API_BASE}/conversations/`, {
         method: 'GET',
         headers: {
             'Content-Type': 'application/json',
@@ -52,6 +53,35 @@ export async function fetchHistory() {
     return response.json();
 }
 
+/** Messages of a conversation (responses + sources), loaded when it is opened. */
+export async function fetchConversation(id: number, attempts = 3): Promise<any> {
+    const response = await fetch(`${API_BASE}/conversations/${id}/`, {
+        method: 'GET',
+        headers: {
+            'Content-Type': 'application/json',
+            ...getAuthHeaders(),
+        }
+    });
+
+    // 503 while the server loads the texts of the sources: retry once it is ready
+    if (response.status === 503 && attempts > 1) {
+        const retryAfter = Number(response.headers.get('Retry-After')) || 2;
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+        return fetchConversation(id, attempts - 1);
+    }
+    if (!response.ok) throw new Error('Erreur récupération historique');
+    return response.json();
+}
+
+/** Typeahead of the search box: sourates, verse references and frequent words. */
+export async function fetchSuggestions(query: string, limit = 8, signal?: AbortSignal) {
+    const params = new URLSearchParams({ q: query, limit: String(limit) });
+    const response = await fetch(`${API_BASE}/suggest/?${params}`, { method: 'GET', signal });
+
+    if (!response.ok) throw new Error('Erreur récupération suggestions');
+    return response.json();
+}
+
 /**
  * Stream a question to the Quran AI.
  *
@@ -61,8 +91,10 @@ export async function fetchHistory() {
 export async function streamQuestion(
     question: string,
     sourceFilter: string,
+    conversationId: number | undefined,
     callbacks: {
         onSources: (sources: any[]) => void
+        onConversation: (conversationId: number) => void
         onToken: (token: string) => void
         onDone: () => void
         onError: (error: string, errorCode?: string, resetTime?: string) => void
@@ -75,7 +107,8 @@ export async function streamQuestion(
             'Content-Type': 'application/json',
             ...getAuthHeaders()
         },
-        body: JSON.stringify({ q: question, limit: 5, source_filter: sourceFilter }),
+        // Follow-up questions send their conversation so the server reuses its contexts
+        body: JSON.stringify({ q: question, limit: 5, source_filter: sourceFilter, conversation_id: conversationId }),
         signal,
     })
 
@@ -88,6 +121,12 @@ export async function streamQuestion(
             throw error;
         } else if (response.status === 401) {
             throw new Error('Veuillez vous connecter pour utiliser le chat.');
+        } else if (response.status === 429 || response.status === 503) {
+            const data = await response.json().catch(() => ({}));
+            if (data.error_code === 'llm_not_configured') throw new Error(data.error);
+            // Shed by admission control: retry after the advertised delay
+            const retryAfter = response.headers.get('Retry-After') || '1';
+            throw new Error(`Trop de requêtes en cours, réessayez dans ${retryAfter} s.`);
         }
         throw new Error(`HTTP ${response.status}: ${response.statusText}`)
     }
@@ -117,6 +156,9 @@ export async function streamQuestion(
                     case 'token':
                         callbacks.onToken(event.data)
                         break
+                    case 'conversation':
+                        callbacks.onConversation(event.data)
+                        break
                     case 'done':
                         callbacks.onDone()
                         break
@@ -29,11 +29,16 @@ export interface Conversation {
     title: string
     messages: Message[]
     createdAt: Date
+    /** Server conversation id: messages are fetched when the conversation is opened */
+    conversationId?: number
+    loaded?: boolean
 }
 
 /** NDJSON event types from the streaming endpoint */
 export type StreamEvent =
     | { type: 'sources'; data: QuranVerse[] }
     | { type: 'token'; data: string }
+    | { type: 'conversation'; data: number }
+    | { type: 'timing'; data: Record<string, number> }
     | { type: 'done' }
     | { type: 'error'; data: string; error_code?: string; reset_time?: string }
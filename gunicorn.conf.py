@@ -0,0 +1,33 @@
+# ==============================================================
+# gunicorn.conf.py – Gunicorn settings (read by entrypoint.sh)
+# ==============================================================
+# GUNICORN_PRELOAD=1 loads the model and the FAISS indexes once in the
+# master before forking: workers share those pages copy-on-write and
+# each one runs a warm-up search before serving. Otherwise each worker
+# loads and warms up in the background (/api/health/ready/ answers 503
+# until it is done).
+# ==============================================================
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('GUNICORN_WORKERS', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0').lower() in ('1', 'true', 'yes')
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    if preload_app:
+        from quran_api.services.warmup import preload
+        server.log.info("Préchargement du modèle et des index...")
+        preload()
+
+
+def post_worker_init(worker):
+    from quran_api.services import warmup
+    if preload_app:
+        warmup.warm_up()
+    else:
+        warmup.start_background_warm_up()
@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+# Add project root to path so we can import from quran_api
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from quran_api.services.text_utils import arabic_tokens, normalize_batch
+
+
+def load_documents(data_file, raw_file=None):
+    """
+    (ids, références, texte arabe normalisé) d'une source indexée.
+
+    Sans fichier indexé, le Coran peut être lu depuis `raw_file`
+    (quran_complet.json) avec les mêmes ids que index_quran.py.
+    """
+    if os.path.exists(data_file):
+        with open(data_file, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        texts = [item.get('normalized_ar') for item in metadata]
+        missing = [i for i, text in enumerate(texts) if text is None]
+        if missing:
+            normalized = normalize_batch([metadata[i]['text_ar'] for i in missing], 'arabic')
+            for i, text in zip(missing, normalized):
+                texts[i] = text
+        return [item['id'] for item in metadata], [item['reference'] for item in metadata], texts
+
+    if raw_file and os.path.exists(raw_file):
+        with open(raw_file, 'r', encoding='utf-8') as f:
+            verses = json.load(f)
+        ids = [f"v_{v['sourate']}_{v['ayah']}" for v in verses]
+        refs = [f"Sourate {v['sourate']} ({v['sourate_name']}), Verset {v['ayah']}" for v in verses]
+        return ids, refs, normalize_batch([v['text_ar'] for v in verses], 'arabic')
+
+    print(f"Fichier {data_file} introuvable, source ignorée.")
+    return [], [], []
+
+
+def build_concordance(texts):
+    """
+    Index positionnel inversé des mots arabes de `texts`.
+
+    Retourne un dict de tableaux :
+    - terms        : mots distincts, triés (un préfixe = une plage contiguë)
+    - term_offsets : occurrences du mot i dans [term_offsets[i], term_offsets[i + 1])
+    - post_docs    : document de chaque occurrence (triées par mot, document, position)
+    - post_pos     : position du mot dans le document (0 = premier mot)
+    - doc_offsets  : mots du document d dans doc_terms[doc_offsets[d]:doc_offsets[d + 1]]
+    - doc_terms    : identifiant de chaque mot, dans l'ordre du texte (contexte des occurrences)
+    """
+    vocabulary = {}
+    token_ids, doc_lengths = [], []
+    for text in texts:
+        tokens = arabic_tokens(text)
+        doc_lengths.append(len(tokens))
+        token_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+
+    terms = sorted(vocabulary)
+    rank = np.empty(len(terms), dtype='int32')
+    rank[[vocabulary[term] for term in terms]] = np.arange(len(terms), dtype='int32')
+
+    doc_terms = rank[np.asarray(token_ids, dtype='int32')] if token_ids else np.zeros(0, dtype='int32')
+    doc_lengths = np.asarray(doc_lengths, dtype='int64')
+    doc_offsets = np.concatenate([[0], np.cumsum(doc_lengths)]).astype('int64')
+    docs = np.repeat(np.arange(len(texts), dtype='int32'), doc_lengths)
+    positions = np.arange(len(doc_terms), dtype='int64') - doc_offsets[docs]
+
+    # Stable sort by term keeps each term's occurrences in (document, position) order
+    order = np.argsort(doc_terms, kind='stable')
+    counts = np.bincount(doc_terms, minlength=len(terms))
+    position_dtype = np.min_scalar_type(int(positions.max()) if len(positions) else 0)
+    return {
+        'terms': np.array(terms),
+        'term_offsets': np.concatenate([[0], np.cumsum(counts)]).astype('int64'),
+        'post_docs': docs[order],
+        'post_pos': positions[order].astype(position_dtype),
+        'doc_offsets': doc_offsets,
+        'doc_terms': doc_terms,
+    }
+
+
+def create_concordance(quran_file="quran_indexed.json", hadith_file="hadith_indexed.json",
+                       raw_quran_file="quran_complet.json", output_file="concordance.npz"):
+    print("Chargement des textes arabes...")
+    quran_ids, quran_refs, quran_texts = load_documents(quran_file, raw_quran_file)
+    hadith_ids, hadith_refs, hadith_texts = load_documents(hadith_file)
+    if not quran_ids and not hadith_ids:
+        print("Aucun document à indexer.")
+        return
+
+    print(f"Indexation de {len(quran_ids)} versets et {len(hadith_ids)} hadiths...")
+    arrays = build_concordance(quran_texts + hadith_texts)
+
+    print(f"{len(arrays['terms'])} mots distincts, {len(arrays['post_docs'])} occurrences.")
+    print(f"Sauvegarde de la concordance dans {output_file}...")
+    np.savez(
+        output_file,
+        doc_ids=np.array(quran_ids + hadith_ids),
+        doc_refs=np.array(quran_refs + hadith_refs),
+        quran_docs=np.int64(len(quran_ids)),
+        **arrays,
+    )
+    print("🚀 Concordance terminée !")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concordance des mots arabes (Coran + Hadiths)")
+    parser.add_argument('--output', default="concordance.npz")
+    args = parser.parse_args()
+
+    create_concordance(output_file=args.output)
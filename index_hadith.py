@@ -1,16 +1,27 @@
+import argparse
 import json
 from sentence_transformers import SentenceTransformer
+import numpy as np
 import os
 import sys
 
 # Add project root to path so we can import from quran_api
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from quran_api.services.text_utils import normalize_text, normalize_arabic, normalize_french
+from quran_api.services.text_utils import normalize_batch, chunk_spans
 
-def create_hadith_index(input_file="bukhari_complet.json", output_file="hadith_indexed.json"):
+
+def create_hadith_index(input_file="bukhari_complet.json", output_file="hadith_indexed.json",
+                        chunks_file=None, window=3, overlap=1, batch_size=64):
     """
     Indexation pour les Hadiths.
     Modèle : Multilingual E5 Base (Performance Top-tier).
+
+    Si `chunks_file` est fourni, chaque hadith est aussi découpé en fenêtres
+    de `window` phrases (chevauchement `overlap`) et les embeddings des
+    fragments sont sauvegardés dans un .npz :
+    - embeddings : float32 (n_fragments, dim)
+    - parents    : int32   (n_fragments,)   → ligne du hadith dans `output_file`
+    - spans      : int32   (n_fragments, 2) → offsets [début, fin) dans text_fr
     """
     if not os.path.exists(input_file):
         print(f"Fichier {input_file} introuvable.")
@@ -18,7 +29,7 @@ def create_hadith_index(input_file="bukhari_complet.json", output_file="hadith_i
 
     print("Chargement du modèle Multilingual E5 Base...")
     model = SentenceTransformer('intfloat/multilingual-e5-base')
-    
+
     with open(input_file, 'r', encoding='utf-8') as f:
         hadith_data = json.load(f)
 
@@ -26,22 +37,15 @@ def create_hadith_index(input_file="bukhari_complet.json", output_file="hadith_i
     total = len(hadith_data)
     print(f"Début de l'indexation de {total} hadiths...")
 
-    for i, v in enumerate(hadith_data):
+    # --- Texte normalisé, en un seul lot ---
+    normalized_frs = normalize_batch([v['text_fr'] for v in hadith_data], 'french')
+    normalized_ars = normalize_batch([v['text_ar'] for v in hadith_data], 'arabic')
+
+    for v, normalized_fr, normalized_ar in zip(hadith_data, normalized_frs, normalized_ars):
         # --- Texte original ---
         original_fr = v['text_fr']
         original_ar = v['text_ar']
 
-        # --- Texte normalisé ---
-        normalized_fr = normalize_french(original_fr)
-        normalized_ar = normalize_arabic(original_ar)
-
-        # Embedding sur le texte normalisé (FR + AR combinés)
-        content_normalized = f"{normalized_fr} {normalized_ar}"
-        # using the 'passage: ' prefix required by multilingual-e5
-        text_to_embed = f"passage: {content_normalized}"
-        
-        embedding = model.encode(text_to_embed, convert_to_tensor=False).tolist()
-        
         doc = {
             "id": f"h_{v['collection']}_{v['book_number']}_{v['hadith_number']}",
             "reference": f"{v['collection']}, Livre {v['book_number']}, Hadith {v['hadith_number']} ({v['grade']})",
@@ -49,7 +53,6 @@ def create_hadith_index(input_file="bukhari_complet.json", output_file="hadith_i
             "text_ar": original_ar,
             "normalized_fr": normalized_fr,
             "normalized_ar": normalized_ar,
-            "embedding": embedding,
             "metadata": {
                 "collection": v['collection'],
                 "book_number": v['book_number'],
@@ -58,15 +61,66 @@ def create_hadith_index(input_file="bukhari_complet.json", output_file="hadith_i
             }
         }
         indexed_docs.append(doc)
-        
-        if i % 200 == 0:
-            print(f"Progression : {i}/{total} hadiths indexés...")
+
+    # Embedding sur le texte normalisé (FR + AR combinés),
+    # using the 'passage: ' prefix required by multilingual-e5
+    texts_to_embed = [f"passage: {doc['normalized_fr']} {doc['normalized_ar']}" for doc in indexed_docs]
+    embeddings = model.encode(texts_to_embed, batch_size=batch_size, show_progress_bar=True, convert_to_numpy=True)
+    for doc, embedding in zip(indexed_docs, embeddings):
+        doc["embedding"] = embedding.tolist()
 
     print(f"Sauvegarde de l'index dans {output_file}...")
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(indexed_docs, f, ensure_ascii=False)
-    
+
+    if chunks_file:
+        create_hadith_chunks(model, indexed_docs, chunks_file, window, overlap, batch_size)
+
     print("🚀 Indexation des hadiths terminée !")
 
+
+def create_hadith_chunks(model, indexed_docs, chunks_file, window=3, overlap=1, batch_size=64):
+    """
+    Découpe les hadiths en fragments de phrases et sauvegarde leurs embeddings.
+
+    Même recette que les hadiths entiers et les versets (FR + AR) : le fragment
+    français suivi du texte arabe de son hadith, pour que les distances des
+    fragments restent comparables à celles du Coran lors de la fusion.
+    Un hadith sans texte français n'a pas de fragment : il reste cherché
+    par son vecteur entier.
+    """
+    parents, spans, chunk_texts = [], [], []
+    for row, doc in enumerate(indexed_docs):
+        for start, end in chunk_spans(doc['text_fr'], window, overlap):
+            parents.append(row)
+            spans.append((start, end))
+            chunk_texts.append(doc['text_fr'][start:end])
+    texts_to_embed = [
+        f"passage: {text} {indexed_docs[row]['normalized_ar']}"
+        for text, row in zip(normalize_batch(chunk_texts, 'french'), parents)
+    ]
+
+    print(f"Embedding de {len(texts_to_embed)} fragments ({len(indexed_docs)} hadiths)...")
+    embeddings = model.encode(texts_to_embed, batch_size=batch_size, show_progress_bar=True, convert_to_numpy=True)
+
+    print(f"Sauvegarde des fragments dans {chunks_file}...")
+    np.savez(
+        chunks_file,
+        embeddings=embeddings.astype('float32'),
+        parents=np.asarray(parents, dtype='int32'),
+        spans=np.asarray(spans, dtype='int32').reshape(-1, 2),
+    )
+
+
 if __name__ == "__main__":
-    create_hadith_index()
+    parser = argparse.ArgumentParser(description="Indexation des hadiths (E5 + FAISS)")
+    parser.add_argument('--input', default="bukhari_complet.json")
+    parser.add_argument('--output', default="hadith_indexed.json")
+    parser.add_argument('--chunks', metavar='FICHIER_NPZ', default=None,
+                        help="Découpe aussi les hadiths en fragments de phrases (ex: hadith_chunks.npz)")
+    parser.add_argument('--window', type=int, default=3, help="Phrases par fragment")
+    parser.add_argument('--overlap', type=int, default=1, help="Phrases partagées entre fragments voisins")
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    create_hadith_index(args.input, args.output, args.chunks, args.window, args.overlap, args.batch_size)
@@ -6,7 +6,7 @@ import torch
 
 # Add project root to path so we can import from quran_api
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from quran_api.services.text_utils import normalize_text, normalize_arabic, normalize_french
+from quran_api.services.text_utils import normalize_batch
 
 
 def create_improved_index(input_file="quran_complet.json", output_file="quran_indexed.json"):
@@ -32,15 +32,15 @@ def create_improved_index(input_file="quran_complet.json", output_file="quran_in
     total = len(quran_data)
     print(f"Début de l'indexation de {total} versets (avec normalisation)...")
 
-    for i, v in enumerate(quran_data):
+    # --- Texte normalisé (pour recherche & embedding), en un seul lot ---
+    normalized_frs = normalize_batch([v['text_fr'] for v in quran_data], 'french')
+    normalized_ars = normalize_batch([v['text_ar'] for v in quran_data], 'arabic')
+
+    for i, (v, normalized_fr, normalized_ar) in enumerate(zip(quran_data, normalized_frs, normalized_ars)):
         # --- Texte original (pour affichage) ---
         original_fr = v['text_fr']
         original_ar = v['text_ar']
 
-        # --- Texte normalisé (pour recherche & embedding) ---
-        normalized_fr = normalize_french(original_fr)
-        normalized_ar = normalize_arabic(original_ar)
-
         # Embedding sur le texte normalisé (FR + AR combinés)
         content_normalized = f"{normalized_fr} {normalized_ar}"
         text_to_embed = f"passage: {content_normalized}"
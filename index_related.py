@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+
+import faiss
+import numpy as np
+
+
+def load_embeddings(data_file, index_file):
+    """
+    Charge les ids, références et embeddings d'une source.
+
+    Les vecteurs sont relus depuis l'index FAISS s'il existe (plus rapide
+    que de parser les listes JSON), sinon depuis le champ 'embedding'.
+    """
+    with open(data_file, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    ids = np.array([item['id'] for item in metadata])
+    refs = np.array([item['reference'] for item in metadata])
+
+    if os.path.exists(index_file):
+        index = faiss.read_index(str(index_file))
+        embeddings = index.reconstruct_n(0, index.ntotal)
+    else:
+        embeddings = np.array([item['embedding'] for item in metadata]).astype('float32')
+
+    return ids, refs, np.ascontiguousarray(embeddings, dtype='float32')
+
+
+def knn(queries, corpus, k, exclude_self=False, batch_size=1024):
+    """
+    Recherche k-NN de toutes les `queries` dans `corpus` (FAISS IndexFlatL2),
+    par lots. Retourne (indices int32, distances float16) de forme (n, k).
+    """
+    index = faiss.IndexFlatL2(corpus.shape[1])
+    index.add(corpus)
+
+    k_search = min(k + 1 if exclude_self else k, index.ntotal)
+    all_idx = np.full((len(queries), k), -1, dtype='int32')
+    all_dist = np.full((len(queries), k), np.inf, dtype='float16')
+
+    for start in range(0, len(queries), batch_size):
+        batch = queries[start:start + batch_size]
+        distances, indices = index.search(batch, k_search)
+
+        if exclude_self:
+            rows = np.arange(start, start + len(batch))[:, None]
+            keep = indices != rows
+            # Each row drops its own match (or its last neighbour if self was not found)
+            keep[keep.all(axis=1), -1] = False
+            indices = indices[keep].reshape(len(batch), -1)
+            distances = distances[keep].reshape(len(batch), -1)
+
+        width = min(k, indices.shape[1])
+        all_idx[start:start + len(batch), :width] = indices[:, :width]
+        all_dist[start:start + len(batch), :width] = distances[:, :width]
+
+    return all_idx, all_dist
+
+
+def create_related_index(quran_file="quran_indexed.json", quran_index="quran_faiss.index",
+                         hadith_file="hadith_indexed.json", hadith_index="hadith_faiss.index",
+                         output_file="related_neighbors.npz", k=10):
+    """
+    Pré-calcule les voisins de chaque document (Coran→Coran, Coran→Hadith,
+    Hadith→Coran) en une recherche FAISS tous-contre-tous par paire de sources.
+    """
+    print("Chargement des embeddings du Coran...")
+    quran_ids, quran_refs, quran_vectors = load_embeddings(quran_file, quran_index)
+    print("Chargement des embeddings des Hadiths...")
+    hadith_ids, hadith_refs, hadith_vectors = load_embeddings(hadith_file, hadith_index)
+
+    print(f"Coran→Coran ({len(quran_ids)} versets, k={k})...")
+    qq_idx, qq_dist = knn(quran_vectors, quran_vectors, k, exclude_self=True)
+    print("Coran→Hadith...")
+    qh_idx, qh_dist = knn(quran_vectors, hadith_vectors, k)
+    print("Hadith→Coran...")
+    hq_idx, hq_dist = knn(hadith_vectors, quran_vectors, k)
+
+    print(f"Sauvegarde de la table de voisins dans {output_file}...")
+    np.savez(
+        output_file,
+        quran_ids=quran_ids, quran_refs=quran_refs,
+        hadith_ids=hadith_ids, hadith_refs=hadith_refs,
+        quran_quran_idx=qq_idx, quran_quran_dist=qq_dist,
+        quran_hadith_idx=qh_idx, quran_hadith_dist=qh_dist,
+        hadith_quran_idx=hq_idx, hadith_quran_dist=hq_dist,
+    )
+    print("🚀 Table des voisins terminée !")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pré-calcul des versets / hadiths similaires")
+    parser.add_argument('--output', default="related_neighbors.npz")
+    parser.add_argument('-k', type=int, default=10, help="Voisins conservés par document et par source")
+    args = parser.parse_args()
+
+    create_related_index(output_file=args.output, k=args.k)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile, SubscriptionPlan, ChatHistory
+from .models import UserProfile, SubscriptionPlan, ChatHistory, Conversation, RequestLedger
 
 @admin.register(SubscriptionPlan)
 class SubscriptionPlanAdmin(admin.ModelAdmin):
@@ -17,3 +17,15 @@ class ChatHistoryAdmin(admin.ModelAdmin):
     list_display = ('user', 'query', 'created_at')
     search_fields = ('user__username', 'query', 'response')
     list_filter = ('created_at', 'user')
+
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'title', 'message_count', 'last_message_at')
+    search_fields = ('user__username', 'title')
+    list_filter = ('last_message_at',)
+
+@admin.register(RequestLedger)
+class RequestLedgerAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'endpoint', 'plan', 'success', 'prompt_tokens', 'completion_tokens', 'total_ms')
+    search_fields = ('request_id', 'user__username')
+    list_filter = ('endpoint', 'plan', 'success', 'created_at')
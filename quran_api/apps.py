@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class QuranApiConfig(AppConfig):
     name = 'quran_api'
+
+    def ready(self):
+        # Register the auth cache invalidation signals
+        from . import authentication  # noqa: F401
+        from .services import admission
+
+        # Rates come from the environment: fail at start-up, not on the first request
+        admission.check_rates()
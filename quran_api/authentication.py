@@ -0,0 +1,88 @@
+"""
+Token authentication with a short-lived cache.
+
+DRF's TokenAuthentication hits `authtoken_token` on every request, then
+the views hit `profile` and `subscription_plan`. CachedTokenAuthentication
+loads all three in one query and caches the result for AUTH_CACHE_TTL
+seconds, so an authenticated ask starts without any DB round trip.
+
+Entries are dropped when the token is deleted (logout) or the profile
+changes; a plan change bumps a version shared by every entry.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import SubscriptionPlan, UserProfile
+from .services import timing
+
+_PLAN_VERSION_KEY = 'auth:plan_version'
+
+
+def _plan_version():
+    version = cache.get(_PLAN_VERSION_KEY)
+    if version is None:
+        cache.add(_PLAN_VERSION_KEY, 1, None)
+        version = cache.get(_PLAN_VERSION_KEY, 1)
+    return version
+
+
+def _token_cache_key(key: str) -> str:
+    return f"auth:token:{_plan_version()}:{key}"
+
+
+def invalidate_token(key: str):
+    cache.delete(_token_cache_key(key))
+
+
+def invalidate_user(user_id):
+    for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache_key = _token_cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            timing.cache_hit('auth')
+            return cached
+
+        try:
+            token = Token.objects.select_related(
+                'user__profile__subscription_plan'
+            ).get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        # Attach the preloaded objects to the token's user so request.user,
+        # request.user.profile and profile.subscription_plan all come from cache
+        result = (token.user, token)
+        cache.set(cache_key, result, getattr(settings, 'AUTH_CACHE_TTL', 60))
+        return result
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_profile_tokens(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=SubscriptionPlan)
+def invalidate_plan_tokens(sender, instance, **kwargs):
+    try:
+        cache.incr(_PLAN_VERSION_KEY)
+    except ValueError:
+        cache.add(_PLAN_VERSION_KEY, 1, None)
@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from quran_api.services.ledger import daily_report
+
+
+class Command(BaseCommand):
+    help = "Agrège le registre des requêtes par jour et par abonnement (tokens, latences p50/p95/p99)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help="Nombre de jours (aujourd'hui inclus)")
+        parser.add_argument('--plan', default=None, help="Limiter à un abonnement (free, mensuel, max)")
+        parser.add_argument('--json', action='store_true', help="Sortie JSON")
+
+    def handle(self, *args, **options):
+        report = daily_report(days=max(1, options['days']), plan=options['plan'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+
+        if not report:
+            self.stdout.write("Aucune requête enregistrée sur la période.")
+            return
+
+        for row in report:
+            total = row['total_ms']
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{row['day']}  {row['plan']:<8} {row['requests']} requêtes, {row['errors']} erreurs"
+            ))
+            self.stdout.write(
+                f"  tokens : {row['prompt_tokens']} prompt / {row['completion_tokens']} réponse"
+                f" (moyenne {row['prompt_tokens'] // row['requests']} / {row['completion_tokens'] // row['requests']})"
+            )
+            self.stdout.write(f"  total  : p50 {total['p50']} ms, p95 {total['p95']} ms, p99 {total['p99']} ms")
+            for name, stage in row['stages_ms'].items():
+                self.stdout.write(f"  {name:<8}: p50 {stage['p50']} ms, p95 {stage['p95']} ms, p99 {stage['p99']} ms")
+            if row['cache_hits']:
+                hits = ", ".join(f"{name} {count}" for name, count in sorted(row['cache_hits'].items()))
+                self.stdout.write(f"  cache  : {hits}")
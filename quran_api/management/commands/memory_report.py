@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quran_api.services import memory_report
+
+MB = memory_report.MB
+
+
+class Command(BaseCommand):
+    help = (
+        "Charge le modèle, les index et les tables comme un worker puis détaille la mémoire "
+        "par composant ; échoue si le RSS dépasse le budget (MEMORY_BUDGET_MB)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget-mb', type=float, default=None,
+                            help="Budget de RSS en Mo (défaut : MEMORY_BUDGET_MB, 0 = aucun)")
+        parser.add_argument('--json', action='store_true', help="Sortie JSON")
+
+    def handle(self, *args, **options):
+        memory_report.load_serving_stack()
+        report = memory_report.report(options['budget_mb'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            for component in report['components']:
+                detail = ", ".join(f"{key} {value}" for key, value in component.items() if key not in ('name', 'bytes'))
+                self.stdout.write(
+                    f"  {component['name']:<28} {component['bytes'] / MB:>9.1f} Mo" + (f"  ({detail})" if detail else "")
+                )
+            self.stdout.write(f"  {'non attribué':<28} {report['unattributed_bytes'] / MB:>9.1f} Mo")
+            budget = f" / budget {report['budget_mb']:.0f} Mo" if report['budget_mb'] else ""
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"RSS {report['rss_bytes'] / MB:.1f} Mo (pic {report['peak_rss_bytes'] / MB:.1f} Mo){budget}"
+            ))
+
+        if report['over_budget']:
+            raise CommandError(
+                f"RSS de {report['rss_bytes'] / MB:.1f} Mo au-delà du budget de {report['budget_mb']:.0f} Mo"
+            )
@@ -0,0 +1,89 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from quran_api.services import query_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Préchauffe les caches de réécriture, d'embedding et de recherche avec les questions "
+        "les plus fréquentes de l'historique, ou (--report) mesure leur taux de succès."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=200, help="Nombre de questions à préchauffer")
+        parser.add_argument('--days', type=int, default=7, help="Fenêtre de l'historique en jours")
+        parser.add_argument('--no-rewrite', action='store_true',
+                            help="Ne pas appeler le LLM pour réécrire les questions")
+        parser.add_argument('--batch-size', type=int, default=32, help="Questions encodées par lot")
+        parser.add_argument('--dry-run', action='store_true', help="Afficher les questions sans préchauffer")
+        parser.add_argument('--report', action='store_true',
+                            help="Taux de succès des caches pendant l'heure qui suit le dernier préchauffage")
+        parser.add_argument('--since', default=None,
+                            help="Début de la période du rapport (ISO 8601, défaut : dernier préchauffage)")
+        parser.add_argument('--hours', type=float, default=1, help="Durée de la période du rapport")
+        parser.add_argument('--json', action='store_true', help="Sortie JSON")
+
+    def handle(self, *args, **options):
+        if options['report']:
+            return self._report(options)
+
+        questions = query_cache.popular_queries(max(1, options['top']), max(1, options['days']))
+        if not questions:
+            self.stdout.write("Aucune question dans l'historique sur la période.")
+            return
+        if options['dry_run']:
+            for question, count in questions:
+                self.stdout.write(f"{count:>6}  {question}")
+            return
+        if not query_cache.is_shared():
+            raise CommandError(
+                "Le cache est local à ce processus (pas de REDIS_URL) : les entrées préchauffées "
+                "disparaîtraient à la fin de la commande. Configurez REDIS_URL, ou PREWARM_QUERIES "
+                "pour que chaque worker préchauffe son propre cache au démarrage."
+            )
+
+        stats = query_cache.prewarm(
+            [question for question, _ in questions],
+            rewrite=not options['no_rewrite'],
+            batch_size=max(1, options['batch_size']),
+        )
+        if options['json']:
+            self.stdout.write(json.dumps(stats, ensure_ascii=False, indent=2))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['questions']} questions préchauffées en {stats['seconds']} s : "
+            f"{stats['encoded']} encodées, {stats['searched']} recherches mises en cache."
+        ))
+
+    def _report(self, options):
+        if options['since']:
+            since = datetime.datetime.fromisoformat(options['since'])
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        else:
+            if not query_cache.is_shared():
+                raise CommandError(
+                    "Le cache est local à ce processus (pas de REDIS_URL) : la date du dernier "
+                    "préchauffage des workers n'y est pas ; précisez --since."
+                )
+            last = query_cache.last_prewarm()
+            if not last:
+                raise CommandError("Aucun préchauffage enregistré dans le cache ; précisez --since.")
+            since = datetime.datetime.fromtimestamp(last['at'], tz=datetime.timezone.utc)
+
+        report = query_cache.hit_rate(since, options['hours'])
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{report['since']} → {report['until']} : {report['requests']} requêtes, "
+            f"{report['searches']} recherches (hors questions de suivi)"
+        ))
+        for name, rate in report['rates'].items():
+            value = "-" if rate is None else f"{rate:.1%}"
+            self.stdout.write(f"  {name:<9}: {report['hits'].get(name, 0)} succès ({value})")
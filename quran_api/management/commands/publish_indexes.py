@@ -0,0 +1,56 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quran_api.services import index_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Publie les index (quran_indexed.json, quran_faiss.index, ...) comme nouvelle version "
+        "dans INDEX_DIR ; les workers la chargent et la basculent sans redémarrage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=None,
+                            help="Dossier contenant les fichiers d'index (défaut : chemins *_PATH des settings)")
+        parser.add_argument('--name', default=None, help="Nom de la version (défaut : date et heure)")
+        parser.add_argument('--no-activate', action='store_true', help="Publier sans rendre la version courante")
+        parser.add_argument('--keep', type=int, default=3, help="Versions conservées (la courante l'est toujours)")
+        parser.add_argument('--activate', default=None, metavar='VERSION',
+                            help="Rendre courante une version déjà publiée (retour arrière)")
+        parser.add_argument('--list', action='store_true', help="Lister les versions publiées")
+
+    def handle(self, *args, **options):
+        if options['list']:
+            return self._list()
+
+        try:
+            if options['activate']:
+                index_store.activate(options['activate'])
+                self.stdout.write(self.style.SUCCESS(f"Version {options['activate']} activée."))
+                return
+
+            if options['source']:
+                source = Path(options['source'])
+                sources = {name: source / filename for name, (_, filename) in index_store.artifacts().items()}
+            else:
+                sources = index_store.legacy_paths()
+            version = index_store.publish(
+                sources, version=options['name'], activate=not options['no_activate'], keep=max(1, options['keep'])
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        state = "publiée" if options['no_activate'] else "publiée et activée"
+        self.stdout.write(self.style.SUCCESS(f"Version {version} {state} dans {index_store.index_dir()}."))
+
+    def _list(self):
+        manifest = index_store.read_manifest()
+        if not manifest:
+            self.stdout.write(f"Aucune version publiée dans {index_store.index_dir()} (fichiers *_PATH utilisés).")
+            return
+        for version, entry in sorted(manifest['versions'].items(), key=lambda item: item[1]['created_at']):
+            marker = '*' if version == manifest['current'] else ' '
+            size = sum(info['size'] for info in entry['files'].values()) / 2**20
+            self.stdout.write(f"{marker} {version}  {entry['created_at']}  {len(entry['files'])} fichiers, {size:.1f} Mo")
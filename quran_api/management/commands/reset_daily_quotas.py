@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from quran_api.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Remet à zéro les compteurs de requêtes quotidiens (un seul UPDATE)."
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        updated = UserProfile.objects.filter(last_request_date__lt=today).update(
+            requests_today=0, last_request_date=today
+        )
+        self.stdout.write(self.style.SUCCESS(f"{updated} profils remis à zéro pour le {today}."))
@@ -0,0 +1,27 @@
+from .services.timing import request_timer
+
+
+class TimingMiddleware:
+    """
+    Time every API request and report its stages in a Server-Timing header
+    (plus its id, also stored in the request ledger, in X-Request-ID).
+
+    Streaming responses are returned before their body is produced: the
+    streaming view times itself and ends its NDJSON stream with a `timing`
+    event instead.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith('/api/'):
+            return self.get_response(request)
+
+        with request_timer() as timer:
+            response = self.get_response(request)
+            response['X-Request-ID'] = timer.request_id
+            if not response.streaming:
+                response['Server-Timing'] = timer.server_timing()
+                timer.endpoint = getattr(request.resolver_match, 'url_name', None) or 'unknown'
+        return response
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-19 09:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quran_api', '0003_chathistory_sources'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chathistory',
+            index=models.Index(fields=['user', '-created_at'], name='chathistory_user_created'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:05
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def _compact(source):
+    # Same format as quran_api.services.source_refs.compact_source,
+    # copied so the migration does not change if that module does
+    if not isinstance(source, dict) or 'id' not in source:
+        return source
+    ref = {'id': source['id']}
+    if 'score' in source:
+        ref['score'] = round(float(source['score']), 4)
+    if 'match_span' in source:
+        ref['match_span'] = source['match_span']
+    metadata = source.get('metadata') or {}
+    if 'ayah_end' in metadata:
+        ref['ayah_start'] = metadata['ayah_start']
+        ref['ayah_end'] = metadata['ayah_end']
+    return ref
+
+
+def compact_sources(apps, schema_editor):
+    ChatHistory = apps.get_model('quran_api', 'ChatHistory')
+    batch = []
+    for item in ChatHistory.objects.only('id', 'sources').iterator(chunk_size=BATCH_SIZE):
+        if not item.sources:
+            continue
+        compacted = [_compact(source) for source in item.sources]
+        if compacted != item.sources:
+            item.sources = compacted
+            batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            ChatHistory.objects.bulk_update(batch, ['sources'])
+            batch = []
+    if batch:
+        ChatHistory.objects.bulk_update(batch, ['sources'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quran_api', '0004_chathistory_user_created_index'),
+    ]
+
+    operations = [
+        # Full copies cannot be rebuilt without the corpus: reverse is a no-op
+        # (compact references are hydrated on read either way)
+        migrations.RunPython(compact_sources, migrations.RunPython.noop),
+    ]
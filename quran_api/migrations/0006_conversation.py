@@ -0,0 +1,41 @@
+# Generated by Django 6.0.2 on 2026-10-19 11:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quran_api', '0005_compact_chathistory_sources'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('contexts', models.JSONField(blank=True, default=list, help_text='Compact references of the retrieved contexts, reused by follow-up questions')),
+                ('message_count', models.IntegerField(default=0)),
+                ('last_message_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-last_message_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='chathistory',
+            name='conversation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='quran_api.conversation'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user', '-last_message_at'], name='conversation_user_last'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-19 13:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quran_api', '0006_conversation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('request_id', models.CharField(max_length=32)),
+                ('plan', models.CharField(blank=True, max_length=20)),
+                ('endpoint', models.CharField(max_length=30)),
+                ('success', models.BooleanField(default=True)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('total_ms', models.PositiveIntegerField(default=0)),
+                ('stages', models.JSONField(blank=True, default=dict)),
+                ('cache_hits', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='ledger_created')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:40
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+# Same as quran_api.services.conversation_service.TITLE_LENGTH, copied so
+# the migration does not change if that module does
+TITLE_LENGTH = 80
+
+
+def _title(question):
+    return question if len(question) <= TITLE_LENGTH else question[:TITLE_LENGTH].rstrip() + '…'
+
+
+def _backfill(Conversation, ChatHistory, rows):
+    conversations = [
+        Conversation(
+            user_id=row.user_id,
+            title=_title(row.query),
+            contexts=[source for source in (row.sources or []) if isinstance(source, dict) and 'id' in source],
+            message_count=1,
+            last_message_at=row.created_at,
+        )
+        for row in rows
+    ]
+    Conversation.objects.bulk_create(conversations)
+    for row, conversation in zip(rows, conversations):
+        row.conversation_id = conversation.pk
+    ChatHistory.objects.bulk_update(rows, ['conversation'])
+
+
+def backfill_conversations(apps, schema_editor):
+    """
+    One conversation per ChatHistory row written before conversations
+    existed, as the sidebar listed them; its sources become the contexts
+    a follow-up reuses.
+    """
+    Conversation = apps.get_model('quran_api', 'Conversation')
+    ChatHistory = apps.get_model('quran_api', 'ChatHistory')
+    batch = []
+    legacy = ChatHistory.objects.filter(conversation__isnull=True).only('id', 'user_id', 'query', 'sources', 'created_at')
+    for row in legacy.order_by('id').iterator(chunk_size=BATCH_SIZE):
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            _backfill(Conversation, ChatHistory, batch)
+            batch = []
+    if batch:
+        _backfill(Conversation, ChatHistory, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quran_api', '0007_requestledger'),
+    ]
+
+    operations = [
+        # Backfilled conversations are indistinguishable from new ones:
+        # reverse is a no-op (0006 reversed drops them all anyway)
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
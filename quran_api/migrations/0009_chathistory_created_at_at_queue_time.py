@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quran_api', '0008_backfill_conversations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chathistory',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Count, F, Max, OuterRef, Subquery
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db.models.signals import post_save
@@ -29,24 +30,31 @@ class UserProfile(models.Model):
     def __str__(self):
         return self.user.username
     
+    def requests_used_today(self):
+        # A count from a previous day is stale until the daily reset runs
+        if self.last_request_date != timezone.localdate():
+            return 0
+        return self.requests_today
+
     def can_make_request(self):
-        # Reset daily count if the day has changed
-        today = timezone.now().date()
-        if self.last_request_date != today:
-            self.requests_today = 0
-            self.last_request_date = today
-            self.save()
-        
         limit = self.subscription_plan.daily_request_limit if self.subscription_plan else 5
         
         if limit == -1:
             return True
             
-        return self.requests_today < limit
+        return self.requests_used_today() < limit
         
     def increment_request(self):
-        self.requests_today += 1
-        self.save()
+        # Single-column atomic UPDATE; the ask views count through QuotaService instead
+        today = timezone.localdate()
+        profiles = UserProfile.objects.filter(pk=self.pk)
+        if self.last_request_date == today:
+            profiles.update(requests_today=F('requests_today') + 1)
+            self.requests_today += 1
+        else:
+            profiles.update(requests_today=1, last_request_date=today)
+            self.requests_today = 1
+            self.last_request_date = today
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -62,15 +70,86 @@ def create_user_profile(sender, instance, created, **kwargs):
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
 
+class Conversation(models.Model):
+    """
+    A thread of questions. Title, message count and last activity are
+    denormalized so the sidebar reads one row per conversation.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversations')
+    title = models.CharField(max_length=200)
+    contexts = models.JSONField(default=list, blank=True, help_text="Compact references of the retrieved contexts, reused by follow-up questions")
+    message_count = models.IntegerField(default=0)
+    last_message_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-last_message_at']
+        indexes = [
+            models.Index(fields=['user', '-last_message_at'], name='conversation_user_last'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.title[:50]}"
+
+    @classmethod
+    def record_messages(cls, messages):
+        """
+        Update the summaries after a batch of ChatHistory rows was written.
+        Counted from the stored rows rather than incremented, so that a row
+        dropped by the write-behind queue cannot leave a count that does not
+        match the messages.
+        """
+        conversation_ids = {message.conversation_id for message in messages if message.conversation_id is not None}
+        if not conversation_ids:
+            return
+
+        stored = ChatHistory.objects.filter(conversation=OuterRef('pk')).order_by().values('conversation')
+        cls.objects.filter(pk__in=conversation_ids).update(
+            message_count=Subquery(stored.annotate(count=Count('pk')).values('count')),
+            last_message_at=Subquery(stored.annotate(last=Max('created_at')).values('last')),
+        )
+
 class ChatHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_history')
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages', null=True, blank=True)
     query = models.TextField()
     response = models.TextField()
     sources = models.JSONField(default=list, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the exchange is queued, not when the write-behind flusher stores it
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='chathistory_user_created'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.query[:50]}"
+
+
+class RequestLedger(models.Model):
+    """
+    Append-only cost and latency record of one ask, written in batches off
+    the request path (services/ledger.py). Durations are in milliseconds;
+    the plan is copied so later plan changes do not rewrite history.
+    """
+    request_id = models.CharField(max_length=32)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    plan = models.CharField(max_length=20, blank=True)
+    endpoint = models.CharField(max_length=30)
+    success = models.BooleanField(default=True)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    total_ms = models.PositiveIntegerField(default=0)
+    stages = models.JSONField(default=dict, blank=True)
+    cache_hits = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='ledger_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} {self.request_id} ({self.total_ms} ms)"
@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ChatHistoryCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (user, -created_at), served by the
+    chathistory_user_created index; cost does not grow with the page depth.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = '-created_at'
+
+
+class ConversationCursorPagination(CursorPagination):
+    """Keyset pagination over (user, -last_message_at) (conversation_user_last index)."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = '-last_message_at'
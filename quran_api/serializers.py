@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import ChatHistory, UserProfile, SubscriptionPlan
+from .models import ChatHistory, Conversation, UserProfile, SubscriptionPlan
+from .services.source_refs import hydrate_sources
 
 class SubscriptionPlanSerializer(serializers.ModelSerializer):
     class Meta:
@@ -22,7 +23,34 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'profile']
 
 class ChatHistorySerializer(serializers.ModelSerializer):
+    # Stored as compact references, returned with their texts
+    sources = serializers.SerializerMethodField()
+
     class Meta:
         model = ChatHistory
         fields = ['id', 'user', 'query', 'response', 'sources', 'created_at']
         read_only_fields = ['id', 'user', 'created_at']
+
+    def get_sources(self, obj):
+        return hydrate_sources(obj.sources)
+
+class ChatHistoryListSerializer(serializers.ModelSerializer):
+    """Lean sidebar entry: no response text, no sources."""
+    QUERY_PREVIEW_LENGTH = 80
+
+    query = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChatHistory
+        fields = ['id', 'query', 'created_at']
+
+    def get_query(self, obj):
+        if len(obj.query) <= self.QUERY_PREVIEW_LENGTH:
+            return obj.query
+        return obj.query[:self.QUERY_PREVIEW_LENGTH].rstrip() + '…'
+
+class ConversationListSerializer(serializers.ModelSerializer):
+    """Sidebar entry of a conversation (its contexts stay server-side)."""
+    class Meta:
+        model = Conversation
+        fields = ['id', 'title', 'message_count', 'last_message_at']
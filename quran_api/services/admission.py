@@ -0,0 +1,232 @@
+"""
+Admission control for the CPU-bound search pipeline.
+
+Two layers, both ordered by subscription plan (max > mensuel > free >
+anonymous):
+
+- A token bucket per user (per IP for anonymous clients), shared by the
+  workers through the cache and applied by quran_api.throttling before a
+  search or ask view runs. The bucket holds `burst` tokens and refills at
+  `rate` per second; a refused request gets a 429 with Retry-After.
+- A per-worker gate in front of encode + FAISS: at most
+  `encode_concurrency` searches run at once, the others wait in a short
+  priority queue. When the queue is full a request evicts a waiter of a
+  lower plan or is shed, and a waiter is shed after `queue_timeout`
+  seconds; shed requests get a 503 with Retry-After.
+"""
+
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+from . import timing
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+PRIORITIES = {'max': 0, 'mensuel': 1, 'free': 2, 'anonymous': 3}
+
+DEFAULTS = {
+    'rates': {'anonymous': (0.5, 10), 'free': (1, 20), 'mensuel': (2, 40), 'max': (5, 100)},
+    'encode_concurrency': 2,
+    'encode_queue': 8,
+    'queue_timeout': 2.0,
+}
+
+# Bucket counters are renewed every epoch, which bounds their lifetime
+_EPOCH = 3600
+
+
+def config(name):
+    return getattr(settings, 'ADMISSION', {}).get(name, DEFAULTS[name])
+
+
+def check_rates():
+    """Reject at start-up the plan rates a bucket cannot refill at (None = unlimited)."""
+    for plan, (rate, burst) in config('rates').items():
+        if rate is None:
+            continue
+        if rate <= 0 or burst < 1:
+            raise ImproperlyConfigured(
+                f"ADMISSION['rates']['{plan}'] : débit {rate} / rafale {burst} invalides "
+                f"(débit > 0 et rafale >= 1, ou None pour illimité)"
+            )
+
+
+def tier(user) -> str:
+    """Plan name used for rates and priority ('anonymous' when logged out)."""
+    if user is None or not user.is_authenticated:
+        return 'anonymous'
+    profile = getattr(user, 'profile', None)
+    plan = profile.subscription_plan if profile else None
+    return plan.name if plan and plan.name in PRIORITIES else 'free'
+
+
+class Overloaded(Exception):
+    """The request was shed; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"retry after {retry_after}s")
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def _bucket_key(client, epoch) -> str:
+    return f"admission:bucket:{client}:{epoch}"
+
+
+def _open_epoch(client: str, epoch: int, rate: float):
+    """
+    Create the counter of a new epoch, carrying over the tokens the client
+    was short of at the boundary: the bucket does not refill at the
+    epoch change.
+    """
+    previous = cache.get(_bucket_key(client, epoch - 1))
+    carried = max(0, math.ceil(previous - rate * _EPOCH)) if previous is not None else 0
+    cache.add(_bucket_key(client, epoch), carried, _EPOCH + 60)
+
+
+def take_token(client: str, rate: float, burst: int, now: float = None):
+    """
+    Take one token from the bucket of `client`. Returns (allowed, wait):
+    `wait` is the number of seconds until a token is available.
+
+    The bucket is one cache counter per epoch holding the tokens consumed
+    since the epoch started, so every update is an atomic incr/decr: the
+    tokens available are `burst + rate * elapsed - consumed`, and credit
+    beyond `burst` (idle client) is consumed away so the bucket never holds
+    more than `burst`. `rate` must be > 0 (check_rates()).
+    """
+    now = time.time() if now is None else now
+    epoch = int(now // _EPOCH)
+    key = _bucket_key(client, epoch)
+    try:
+        consumed = cache.incr(key)
+    except ValueError:
+        # First request of the epoch, or counter evicted
+        _open_epoch(client, epoch, rate)
+        consumed = cache.incr(key)
+
+    allowance = burst + rate * (now - epoch * _EPOCH)
+    if consumed > allowance:
+        cache.decr(key)
+        return False, (consumed - allowance) / rate
+
+    # Leave at most burst - 1 tokens once this one is taken
+    idle_credit = int(allowance - consumed - (burst - 1))
+    if idle_credit > 0:
+        cache.incr(key, idle_credit)
+    return True, 0.0
+
+
+class _Waiter:
+    __slots__ = ('evicted',)
+
+    def __init__(self):
+        self.evicted = False
+
+
+class SearchGate:
+    """Per-worker concurrency cap with a short priority queue."""
+
+    def __init__(self, concurrency: int, queue_size: int, timeout: float):
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = []              # heap of (priority, seq, waiter)
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.shed = 0
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'active': self._active,
+                'waiting': len(self._waiting),
+                'admitted': self.admitted,
+                'shed': self.shed,
+            }
+
+    def would_admit(self, priority: int) -> bool:
+        """Cheap pre-check for callers that cannot answer 503 later (streams)."""
+        with self._cond:
+            if len(self._waiting) < self.queue_size or self._active < self.concurrency:
+                return True
+            return bool(self._waiting) and max(self._waiting)[0] > priority
+
+    @contextmanager
+    def slot(self, priority: int):
+        with timing.stage('admission'):
+            self._acquire(priority)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+    def _shed(self, retry_after):
+        self.shed += 1
+        return Overloaded(retry_after)
+
+    def _acquire(self, priority):
+        with self._cond:
+            if self._active < self.concurrency and not self._waiting:
+                self._active += 1
+                self.admitted += 1
+                return
+
+            if len(self._waiting) >= self.queue_size:
+                worst = max(self._waiting) if self._waiting else None
+                if worst is None or worst[0] <= priority:
+                    raise self._shed(self.timeout)
+                # A lower plan gives its place in the queue
+                self._waiting.remove(worst)
+                heapq.heapify(self._waiting)
+                worst[2].evicted = True
+                self._cond.notify_all()
+
+            entry = (priority, next(self._seq), _Waiter())
+            heapq.heappush(self._waiting, entry)
+            deadline = time.monotonic() + self.timeout
+            while True:
+                if entry[2].evicted:
+                    raise self._shed(self.timeout)
+                if self._waiting[0] is entry and self._active < self.concurrency:
+                    heapq.heappop(self._waiting)
+                    self._active += 1
+                    self.admitted += 1
+                    # The next waiter may fit too
+                    self._cond.notify_all()
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    raise self._shed(self.timeout)
+                self._cond.wait(remaining)
+
+
+# Singleton instance
+_search_gate = None
+_search_gate_lock = threading.Lock()
+
+def get_search_gate():
+    global _search_gate
+    if _search_gate is None:
+        with _search_gate_lock:
+            if _search_gate is None:
+                _search_gate = SearchGate(
+                    config('encode_concurrency'), config('encode_queue'), config('queue_timeout')
+                )
+    return _search_gate
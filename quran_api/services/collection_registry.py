@@ -0,0 +1,71 @@
+"""
+Registry of the searchable collections (settings.COLLECTIONS).
+
+Each collection is one shard of an IndexSet: its own metadata, FAISS
+index and optional hadith sentence chunks, read from index artifacts
+(services/index_store.py). The Quran and Sahih al-Bukhari keep their
+historical files (quran_*, hadith_*); another collection `name` declared
+without `artifacts` is read from <name>_indexed.json, <name>_faiss.index,
+<name>_chunks.npz and <name>_chunks_faiss.index.
+
+`source` ('quran' or 'hadith') groups collections for the source_filter
+of a search, which may also name one collection.
+"""
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# source → source_type of the documents (shown to the user and the LLM)
+SOURCE_TYPES = {'quran': 'Coran', 'hadith': 'Hadith'}
+
+# Artifact kinds of a collection → file name pattern of a declared collection
+KINDS = {
+    'data': '{name}_indexed.json',
+    'faiss': '{name}_faiss.index',
+    'chunks': '{name}_chunks.npz',
+    'chunks_faiss': '{name}_chunks_faiss.index',
+}
+
+DEFAULT_COLLECTIONS = {
+    'quran': {
+        'source': 'quran',
+        'artifacts': {'data': 'quran_data', 'faiss': 'quran_faiss'},
+    },
+    'bukhari': {
+        'source': 'hadith',
+        'artifacts': {
+            'data': 'hadith_data', 'faiss': 'hadith_faiss',
+            'chunks': 'hadith_chunks', 'chunks_faiss': 'hadith_chunks_faiss',
+        },
+    },
+}
+
+
+class Collection:
+    def __init__(self, name: str, source: str, artifacts: dict = None):
+        if source not in SOURCE_TYPES:
+            raise ImproperlyConfigured(f"COLLECTIONS['{name}']: source inconnue '{source}'")
+        self.name = name
+        self.source = source
+        self.source_type = SOURCE_TYPES[source]
+        # kind → artifact name (key of index_store.artifacts())
+        self.artifacts = artifacts or {kind: f"{name}_{kind}" for kind in KINDS}
+
+    def matches(self, source_filter: str) -> bool:
+        return source_filter in ('both', self.source, self.name)
+
+
+def registry() -> list:
+    """The declared collections, in settings order (the Quran first)."""
+    declared = getattr(settings, 'COLLECTIONS', DEFAULT_COLLECTIONS)
+    return [Collection(name, **spec) for name, spec in declared.items()]
+
+
+def extra_artifacts() -> dict:
+    """Artifact name → file name of the collections declared without `artifacts`."""
+    files = {}
+    for collection in registry():
+        for kind, artifact in collection.artifacts.items():
+            if artifact == f"{collection.name}_{kind}":
+                files[artifact] = KINDS[kind].format(name=collection.name)
+    return files
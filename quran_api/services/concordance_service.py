@@ -0,0 +1,146 @@
+import bisect
+import logging
+import os
+
+import numpy as np
+from django.conf import settings
+
+from .text_utils import arabic_tokens, normalize_arabic
+
+logger = logging.getLogger(__name__)
+
+# An occurrence is the key document * _STRIDE + position, so that a phrase
+# is an intersection of shifted sorted key arrays
+_STRIDE = 1 << 20
+
+
+class ConcordanceService:
+    """
+    Every occurrence of an Arabic word or phrase in the Quran and the
+    hadiths, from the positional index built by index_concordance.py.
+
+    Words are matched after normalize_arabic() (no harakat, unified alif /
+    hamza / ta marbuta). A query word ending with `*` matches every word
+    starting with it; terms are sorted, so a prefix is one bisect and one
+    contiguous slice of the occurrence arrays.
+    """
+
+    MIN_PREFIX = 2
+
+    def __init__(self, path=None):
+        path = path or getattr(settings, 'CONCORDANCE_INDEX_PATH', settings.BASE_DIR / 'concordance.npz')
+        self.available = os.path.exists(path)
+        if not self.available:
+            logger.warning(f"Concordance index not found at {path}")
+            return
+
+        data = np.load(path)
+        self.terms = data['terms'].tolist()
+        self.term_offsets = data['term_offsets']
+        self.post_docs = data['post_docs']
+        self.post_pos = data['post_pos']
+        self.doc_offsets = data['doc_offsets']
+        self.doc_terms = data['doc_terms']
+        self.doc_ids = data['doc_ids']
+        self.doc_refs = data['doc_refs']
+        self.quran_docs = int(data['quran_docs'])
+        logger.info(f"Concordance loaded: {len(self.terms)} terms, {len(self.post_docs)} occurrences")
+
+    def _parse(self, query: str):
+        """[(word, is_prefix)] of a query; ValueError if it has no Arabic word."""
+        words = []
+        for raw in query.split():
+            prefix = raw.endswith('*')
+            tokens = arabic_tokens(normalize_arabic(raw.rstrip('*')))
+            for i, token in enumerate(tokens):
+                words.append((token, prefix and i == len(tokens) - 1))
+        if not words:
+            raise ValueError("La requête ne contient aucun mot arabe.")
+        for word, prefix in words:
+            if prefix and len(word) < self.MIN_PREFIX:
+                raise ValueError(f"Un préfixe doit compter au moins {self.MIN_PREFIX} lettres.")
+        return words
+
+    def _term_range(self, word, prefix):
+        low = bisect.bisect_left(self.terms, word)
+        if prefix:
+            return low, bisect.bisect_left(self.terms, word + '\uffff', low)
+        if low < len(self.terms) and self.terms[low] == word:
+            return low, low + 1
+        return low, low
+
+    def _keys(self, low, high):
+        """Sorted occurrence keys of the terms [low, high)."""
+        start, end = self.term_offsets[low], self.term_offsets[high]
+        keys = self.post_docs[start:end].astype('int64') * _STRIDE + self.post_pos[start:end]
+        if high - low > 1:
+            keys.sort()
+        return keys
+
+    def _words(self, term_ids):
+        return " ".join(self.terms[i] for i in term_ids.tolist())
+
+    def _context(self, doc, position, length, size):
+        """Keyword in context: `size` words on each side of the occurrence."""
+        tokens = self.doc_terms[self.doc_offsets[doc]:self.doc_offsets[doc + 1]]
+        return {
+            "left": self._words(tokens[max(0, position - size):position]),
+            "match": self._words(tokens[position:position + length]),
+            "right": self._words(tokens[position + length:position + length + size]),
+        }
+
+    def search(self, query: str, source: str = 'both', offset: int = 0, limit: int = 50, context: int = 5):
+        """
+        Occurrences of `query` (a word, a phrase, `*`-suffixed prefixes),
+        in corpus order (Quran, then hadiths). Returns the total, the words
+        matched by each prefix, and the page [offset, offset + limit) of
+        hits with their keyword-in-context.
+        """
+        words = self._parse(query)
+
+        keys = None
+        expansions = {}
+        for shift, (word, prefix) in enumerate(words):
+            low, high = self._term_range(word, prefix)
+            if prefix:
+                counts = np.diff(self.term_offsets[low:high + 1])
+                top = np.argsort(-counts, kind='stable')[:50]
+                expansions[f"{word}*"] = [
+                    {"term": self.terms[low + i], "count": int(counts[i])} for i in top.tolist()
+                ]
+            # Occurrences of the n-th word of a phrase, moved back to the phrase start
+            shifted = self._keys(low, high) - shift
+            keys = shifted if keys is None else np.intersect1d(keys, shifted, assume_unique=True)
+
+        if source in ('quran', 'hadith'):
+            boundary = np.searchsorted(keys, self.quran_docs * _STRIDE)
+            keys = keys[:boundary] if source == 'quran' else keys[boundary:]
+
+        hits = []
+        for key in keys[offset:offset + limit].tolist():
+            doc, position = divmod(key, _STRIDE)
+            hit = {
+                "id": str(self.doc_ids[doc]),
+                "reference": str(self.doc_refs[doc]),
+                "position": position,
+            }
+            if context >= 0:
+                hit.update(self._context(doc, position, len(words), context))
+            hits.append(hit)
+
+        return {
+            "query": " ".join(word + ('*' if prefix else '') for word, prefix in words),
+            "total": int(len(keys)),
+            "expansions": expansions,
+            "results": hits,
+        }
+
+
+# Singleton instance
+_concordance_service = None
+
+def get_concordance_service():
+    global _concordance_service
+    if _concordance_service is None:
+        _concordance_service = ConcordanceService()
+    return _concordance_service
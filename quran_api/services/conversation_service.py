@@ -0,0 +1,71 @@
+"""
+Conversations and the contexts they reuse.
+
+The first question of a conversation runs the full pipeline; its packed
+contexts are stored (as compact references) on the Conversation and in
+the cache. Follow-up questions hydrate those references from the loaded
+corpus instead of rewriting the query and searching again.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import timing
+
+logger = logging.getLogger(__name__)
+
+TITLE_LENGTH = 80
+
+
+def _contexts_key(user_id, conversation_id) -> str:
+    # The user id is part of the key: a cache hit implies ownership
+    return f"conversation:{user_id}:{conversation_id}:contexts"
+
+
+def _ttl():
+    return getattr(settings, 'CONVERSATION_CONTEXT_TTL', 3600)
+
+
+def get_contexts(user_id, conversation_id):
+    """
+    Compact context references of a user's conversation, or None if the
+    conversation does not exist or belongs to someone else.
+    """
+    from ..models import Conversation
+
+    key = _contexts_key(user_id, conversation_id)
+    refs = cache.get(key)
+    if refs is not None:
+        timing.cache_hit('contexts')
+        return refs
+
+    row = Conversation.objects.filter(pk=conversation_id, user_id=user_id).values_list('contexts', flat=True).first()
+    if row is None:
+        return None
+    cache.set(key, row, _ttl())
+    return row
+
+
+def start_conversation(user, question: str, refs: list):
+    """
+    Create the conversation of a first question. The one synchronous write
+    of the ask path, and only for a new conversation: the client needs its
+    id in this response to send follow-ups. Its message count and last
+    activity are filled from the stored messages (Conversation.record_messages).
+    """
+    from ..models import Conversation
+
+    title = question if len(question) <= TITLE_LENGTH else question[:TITLE_LENGTH].rstrip() + '…'
+    conversation = Conversation.objects.create(user=user, title=title, contexts=refs)
+    cache.set(_contexts_key(user.id, conversation.id), refs, _ttl())
+    return conversation
+
+
+def store_contexts(user_id, conversation_id, refs: list):
+    """Replace the contexts of a conversation after a fresh retrieval."""
+    from ..models import Conversation
+
+    Conversation.objects.filter(pk=conversation_id, user_id=user_id).update(contexts=refs)
+    cache.set(_contexts_key(user_id, conversation_id), refs, _ttl())
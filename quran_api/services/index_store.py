@@ -0,0 +1,235 @@
+"""
+Versioned index artifacts.
+
+A published version is a directory INDEX_DIR/<version>/ holding the same
+files as the legacy layout (quran_indexed.json, quran_faiss.index, ...).
+INDEX_DIR/manifest.json lists the versions and names the current one:
+
+    {
+        "current": "20261019-120000",
+        "versions": {
+            "20261019-120000": {
+                "created_at": "2026-10-19T12:00:00+00:00",
+                "files": {"quran_indexed.json": {"size": 123, "sha256": "..."}, ...}
+            }
+        }
+    }
+
+Extra collections (services/collection_registry.py) add their own files to the
+same version directory.
+
+The manifest is always replaced atomically (os.replace), so a reader sees
+either the old or the new one. Without a manifest the indexes are read
+from the *_PATH settings, as before.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import collection_registry
+
+logger = logging.getLogger(__name__)
+
+# Artifact → (legacy path setting, file name inside a version directory)
+ARTIFACTS = {
+    'quran_data': ('QURAN_INDEX_PATH', 'quran_indexed.json'),
+    'quran_faiss': ('FAISS_INDEX_PATH', 'quran_faiss.index'),
+    'hadith_data': ('HADITH_INDEX_PATH', 'hadith_indexed.json'),
+    'hadith_faiss': ('HADITH_FAISS_INDEX_PATH', 'hadith_faiss.index'),
+    'hadith_chunks': ('HADITH_CHUNKS_PATH', 'hadith_chunks.npz'),
+    'hadith_chunks_faiss': ('HADITH_CHUNK_FAISS_INDEX_PATH', 'hadith_chunks_faiss.index'),
+    'quran_ruku': ('QURAN_RUKU_PATH', 'quran_ruku.json'),
+}
+
+LEGACY_VERSION = 'legacy'
+
+# Bumped by the admin reload endpoint; every worker's watcher compares it
+RELOAD_KEY = 'indexes:reload'
+
+
+def artifacts() -> dict:
+    """ARTIFACTS plus the files of the extra collections (services/collection_registry.py)."""
+    names = dict(ARTIFACTS)
+    for name, filename in collection_registry.extra_artifacts().items():
+        names.setdefault(name, (None, filename))
+    return names
+
+
+def index_dir() -> Path:
+    return Path(getattr(settings, 'INDEX_DIR', settings.BASE_DIR / 'indexes'))
+
+
+def manifest_path() -> Path:
+    return index_dir() / 'manifest.json'
+
+
+def legacy_paths() -> dict:
+    paths = {}
+    for name, (setting, filename) in artifacts().items():
+        default = settings.BASE_DIR / filename
+        paths[name] = Path(getattr(settings, setting, default) if setting else default)
+    return paths
+
+
+def read_manifest():
+    """The parsed manifest, or None when no version has been published."""
+    try:
+        with open(manifest_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def manifest_signature():
+    """Cheap change detector for the watcher: (mtime_ns, size) of the manifest."""
+    try:
+        stat = os.stat(manifest_path())
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def fingerprint(paths: dict) -> str:
+    """
+    Short digest of the (size, mtime) of the existing artifact files: tells
+    apart two contents of the legacy layout, which always has the same version.
+    """
+    digest = hashlib.sha1()
+    for name in sorted(paths):
+        try:
+            stat = os.stat(paths[name])
+        except OSError:
+            continue
+        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+def resolve(manifest=None):
+    """
+    (version, artifact paths) of the current version, or of the legacy
+    layout when nothing is published. Raises ValueError when the manifest
+    names a version whose files are missing or truncated.
+    """
+    manifest = manifest if manifest is not None else read_manifest()
+    if not manifest or not manifest.get('current'):
+        return LEGACY_VERSION, legacy_paths()
+
+    version = manifest['current']
+    entry = manifest.get('versions', {}).get(version)
+    if entry is None:
+        raise ValueError(f"Version {version} absent du manifeste")
+
+    directory = index_dir() / version
+    paths = {name: directory / filename for name, (_, filename) in artifacts().items()}
+    for filename, info in entry.get('files', {}).items():
+        path = directory / filename
+        if not path.exists() or path.stat().st_size != info['size']:
+            raise ValueError(f"Fichier {path} manquant ou incomplet")
+    return version, paths
+
+
+def _sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_manifest(manifest):
+    path = manifest_path()
+    tmp = path.with_suffix('.json.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def publish(sources: dict, version: str = None, activate: bool = True, keep: int = 3) -> str:
+    """
+    Copy the artifacts `sources` (artifact name → path, missing ones are
+    skipped) into a new version directory, record it in the manifest and,
+    with `activate`, make it current. Keeps the `keep` most recent versions,
+    and always the current one.
+    """
+    if not Path(sources['quran_data']).exists():
+        raise ValueError(f"{sources['quran_data']} introuvable")
+
+    version = version or datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    directory = index_dir() / version
+    if directory.exists():
+        raise ValueError(f"La version {version} existe déjà")
+
+    # Copy into a hidden directory first: a half-copied version is never visible
+    staging = index_dir() / f".{version}.tmp"
+    staging.mkdir(parents=True)
+    files = {}
+    for name, (_, filename) in artifacts().items():
+        if name not in sources:
+            continue
+        source = Path(sources[name])
+        if not source.exists():
+            continue
+        shutil.copyfile(source, staging / filename)
+        files[filename] = {'size': source.stat().st_size, 'sha256': _sha256(staging / filename)}
+    os.replace(staging, directory)
+
+    manifest = read_manifest() or {'current': None, 'versions': {}}
+    manifest['versions'][version] = {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'files': files,
+    }
+    if activate:
+        manifest['current'] = version
+    _prune(manifest, keep)
+    _write_manifest(manifest)
+    logger.info(f"Index version {version} published ({len(files)} files)")
+    return version
+
+
+def activate(version: str):
+    """Make an already published version current (e.g. to roll back)."""
+    manifest = read_manifest()
+    if not manifest or version not in manifest.get('versions', {}):
+        raise ValueError(f"Version {version} inconnue")
+    manifest['current'] = version
+    _write_manifest(manifest)
+
+
+def _prune(manifest, keep):
+    """
+    Forget the oldest versions beyond `keep` (never the current one). Their
+    directories are removed: workers still searching them keep the data
+    they already loaded in memory.
+    """
+    # Newest first; versions published within the same second keep their
+    # publication (manifest insertion) order
+    versions = sorted(manifest['versions'], key=lambda v: manifest['versions'][v]['created_at'])[::-1]
+    for version in versions[keep:]:
+        if version == manifest['current']:
+            continue
+        del manifest['versions'][version]
+        shutil.rmtree(index_dir() / version, ignore_errors=True)
+
+
+def request_reload():
+    """Ask every worker to reload its indexes at its next manifest check."""
+    cache.add(RELOAD_KEY, 0, timeout=None)
+    try:
+        return cache.incr(RELOAD_KEY)
+    except ValueError:
+        cache.set(RELOAD_KEY, 1, timeout=None)
+        return 1
+
+
+def reload_generation():
+    return cache.get(RELOAD_KEY, 0)
@@ -0,0 +1,105 @@
+"""
+Per-request cost and latency ledger.
+
+`record()` turns the RequestTimer of the current ask (stage durations,
+Gemini token usage, cache hits) into a RequestLedger row and hands it to
+the ledger write-behind queue. `daily_report()` aggregates the rows of
+the last days per (day, plan) for the `ledger_report` command.
+"""
+
+import datetime
+import logging
+from collections import defaultdict
+
+import numpy as np
+from django.utils import timezone
+
+from . import timing
+from .write_behind import get_ledger_queue
+
+logger = logging.getLogger(__name__)
+
+# Stages summarized by the report, in pipeline order
+REPORT_STAGES = ('rewrite', 'encode', 'faiss', 'pack', 'ttft', 'generate', 'history')
+PERCENTILES = (50, 95, 99)
+
+
+def record(user, endpoint: str, success: bool = True):
+    """Queue the ledger row of the current request (no-op outside a timed request)."""
+    from ..models import RequestLedger
+
+    timer = timing.current_timer()
+    if timer is None:
+        return
+
+    profile = getattr(user, 'profile', None)
+    plan = profile.subscription_plan.name if profile and profile.subscription_plan else ''
+    get_ledger_queue().put(RequestLedger(
+        request_id=timer.request_id,
+        user_id=user.id,
+        plan=plan,
+        endpoint=endpoint,
+        success=success,
+        prompt_tokens=timer.prompt_tokens,
+        completion_tokens=timer.completion_tokens,
+        total_ms=int(timer.total_ms()),
+        stages={name: round(ms, 1) for name, ms in timer.stages.items()},
+        cache_hits=list(timer.cache_hits),
+        created_at=timezone.now(),
+    ))
+
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {f"p{q}": None for q in PERCENTILES}
+    result = np.percentile(np.asarray(values, dtype='float64'), PERCENTILES)
+    return {f"p{q}": round(float(v), 1) for q, v in zip(PERCENTILES, result)}
+
+
+def daily_report(days: int = 7, plan: str = None) -> list:
+    """
+    One dict per (day, plan), most recent day first: request and error
+    counts, token sums, cache hit counts, and p50/p95/p99 of the total and
+    stage durations.
+    """
+    from ..models import RequestLedger
+
+    since = timezone.localdate() - datetime.timedelta(days=days - 1)
+    rows = RequestLedger.objects.filter(created_at__date__gte=since)
+    if plan is not None:
+        rows = rows.filter(plan=plan)
+
+    groups = defaultdict(lambda: {
+        'requests': 0, 'errors': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+        'total_ms': [], 'stages': defaultdict(list), 'cache_hits': defaultdict(int),
+    })
+    fields = ('created_at', 'plan', 'success', 'prompt_tokens', 'completion_tokens',
+              'total_ms', 'stages', 'cache_hits')
+    for created_at, row_plan, success, prompt_tokens, completion_tokens, total_ms, stages, hits in (
+            rows.values_list(*fields).iterator(chunk_size=2000)):
+        group = groups[(timezone.localtime(created_at).date(), row_plan or '-')]
+        group['requests'] += 1
+        group['errors'] += 0 if success else 1
+        group['prompt_tokens'] += prompt_tokens
+        group['completion_tokens'] += completion_tokens
+        group['total_ms'].append(total_ms)
+        for name in REPORT_STAGES:
+            if name in stages:
+                group['stages'][name].append(stages[name])
+        for name in hits:
+            group['cache_hits'][name] += 1
+
+    report = []
+    for (day, row_plan), group in sorted(groups.items(), key=lambda item: (-item[0][0].toordinal(), item[0][1])):
+        report.append({
+            'day': day.isoformat(),
+            'plan': row_plan,
+            'requests': group['requests'],
+            'errors': group['errors'],
+            'prompt_tokens': group['prompt_tokens'],
+            'completion_tokens': group['completion_tokens'],
+            'cache_hits': dict(group['cache_hits']),
+            'total_ms': _percentiles(group['total_ms']),
+            'stages_ms': {name: _percentiles(group['stages'][name]) for name in REPORT_STAGES if group['stages'][name]},
+        })
+    return report
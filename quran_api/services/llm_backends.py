@@ -0,0 +1,196 @@
+"""
+LLM backends used by LLMService.
+
+A backend only knows how to turn a prompt into text: `rewrite` and
+`generate` return a full string, `stream` yields text chunks. Each call
+reports its token usage to the current request (services/timing.py).
+Prompt construction, fallbacks and error messages stay in LLMService.
+
+Available backends (settings.LLM_BACKEND):
+- 'gemini' : Google Gemini via google.generativeai (production)
+- 'fake'   : deterministic local generator for load tests and CI
+"""
+
+import hashlib
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from . import timing
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBackendError(RuntimeError):
+    """Raised by a backend when a generation call fails."""
+
+
+class LLMBackend:
+    """Interface shared by every LLM backend."""
+
+    name = 'base'
+
+    def rewrite(self, prompt: str) -> str:
+        """Return the keywords produced for a query-rewrite prompt."""
+        return self.generate(prompt)
+
+    def generate(self, prompt: str) -> str:
+        """Return the full completion for `prompt`."""
+        raise NotImplementedError
+
+    def stream(self, prompt: str):
+        """Yield completion chunks for `prompt`."""
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    name = 'gemini'
+
+    def __init__(self, api_key: str, model_name: str):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+        self.model_name = model_name
+
+    def generate(self, prompt: str) -> str:
+        response = self.model.generate_content(prompt)
+        self._record_usage(response)
+        return response.text.strip()
+
+    def stream(self, prompt: str):
+        response = self.model.generate_content(prompt, stream=True)
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+        # Usage metadata is complete once the stream is consumed
+        self._record_usage(response)
+
+    @staticmethod
+    def _record_usage(response):
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            timing.add_usage(usage.prompt_token_count, usage.candidates_token_count)
+
+
+# Vocabulary used by the fake backend to build plausible French answers
+_FAKE_VOCABULARY = (
+    "Allah", "Coran", "verset", "sourate", "patience", "miséricorde",
+    "prière", "jeûne", "croyants", "Prophète", "récompense", "foi",
+    "bienfaisance", "rappel", "sagesse", "épreuve", "lumière", "guidée",
+    "selon", "le", "la", "les", "et", "dans", "qui", "est", "de", "des",
+)
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic, network-free backend for benchmarks and CI.
+
+    - first_token_latency : seconds slept before the first chunk
+    - tokens_per_second   : streaming rate after the first chunk (0 = no delay)
+    - failure_rate        : probability in [0, 1] that a call raises LLMBackendError
+    - fail_after_tokens   : chunks a failing stream yields before it raises
+                            (0 = fails before the first one)
+    - answer_tokens       : number of tokens in each generated answer
+    - seed                : seed of the failure draws
+
+    The text of an answer only depends on the prompt, so two runs with the
+    same inputs produce the same output.
+    """
+
+    name = 'fake'
+
+    def __init__(self, first_token_latency: float = 0.3, tokens_per_second: float = 50.0,
+                 failure_rate: float = 0.0, answer_tokens: int = 120, seed: int = 0,
+                 fail_after_tokens: int = 0):
+        self.first_token_latency = max(0.0, float(first_token_latency))
+        self.tokens_per_second = max(0.0, float(tokens_per_second))
+        self.failure_rate = min(1.0, max(0.0, float(failure_rate)))
+        self.fail_after_tokens = max(0, int(fail_after_tokens))
+        self.answer_tokens = max(1, int(answer_tokens))
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def _fails(self) -> bool:
+        if self.failure_rate <= 0:
+            return False
+        with self._rng_lock:
+            draw = self._rng.random()
+        return draw < self.failure_rate
+
+    def _maybe_fail(self):
+        if self._fails():
+            raise LLMBackendError("Fake backend: simulated failure")
+
+    def _tokens(self, prompt: str, count: int):
+        digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+        rng = random.Random(int.from_bytes(digest[:8], 'big'))
+        return [rng.choice(_FAKE_VOCABULARY) for _ in range(count)]
+
+    def _token_delay(self):
+        if self.tokens_per_second > 0:
+            time.sleep(1.0 / self.tokens_per_second)
+
+    def _record_usage(self, prompt: str, completion_tokens: int):
+        # Whitespace words stand in for the tokenizer
+        timing.add_usage(len(prompt.split()), completion_tokens)
+
+    def rewrite(self, prompt: str) -> str:
+        self._maybe_fail()
+        time.sleep(self.first_token_latency)
+        self._record_usage(prompt, 4)
+        return " ".join(self._tokens(prompt, 4))
+
+    def generate(self, prompt: str) -> str:
+        self._maybe_fail()
+        time.sleep(self.first_token_latency)
+        tokens = self._tokens(prompt, self.answer_tokens)
+        if self.tokens_per_second > 0:
+            time.sleep((len(tokens) - 1) / self.tokens_per_second)
+        self._record_usage(prompt, len(tokens))
+        return " ".join(tokens)
+
+    def stream(self, prompt: str):
+        fails = self._fails()
+        if fails and self.fail_after_tokens == 0:
+            raise LLMBackendError("Fake backend: simulated failure")
+        time.sleep(self.first_token_latency)
+        tokens = self._tokens(prompt, self.answer_tokens)
+        for i, token in enumerate(tokens):
+            if fails and i == self.fail_after_tokens:
+                raise LLMBackendError(f"Fake backend: simulated failure after {i} chunks")
+            if i > 0:
+                self._token_delay()
+            yield token if i == 0 else f" {token}"
+        self._record_usage(prompt, len(tokens))
+
+
+def build_backend():
+    """
+    Instantiate the backend selected by settings.LLM_BACKEND.
+
+    Returns None when the Gemini backend is selected but no API key is set:
+    LLMService is then not `configured` and the ask views answer 503.
+    """
+    backend_name = getattr(settings, 'LLM_BACKEND', 'gemini')
+
+    if backend_name == 'fake':
+        options = getattr(settings, 'FAKE_LLM', {})
+        logger.info(f"LLM backend: fake {options}")
+        return FakeBackend(**options)
+
+    if backend_name != 'gemini':
+        raise ValueError(f"Unknown LLM_BACKEND '{backend_name}'")
+
+    api_key = getattr(settings, 'GEMINI_API_KEY', None)
+    if not api_key or api_key.lower() in ('none', ''):
+        logger.warning("GEMINI_API_KEY is not configured.")
+        return None
+
+    model_name = getattr(settings, 'GEMINI_MODEL_NAME', 'gemini-3-flash-preview')
+    backend = GeminiBackend(api_key, model_name)
+    logger.info(f"LLMService initialized with key {api_key[:8]}...{api_key[-4:]}")
+    return backend
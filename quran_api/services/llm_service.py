@@ -1,9 +1,14 @@
-import google.generativeai as genai
-from django.conf import settings
+from .llm_backends import build_backend
+from .prompt_builder import build_prompt
+from . import query_cache, timing
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# End of a backend stream
+_END = object()
+
 # Prompt for query rewriting — short, focused
 _REWRITE_SYSTEM_PROMPT = (
     "Tu es un expert en recherche islamique. "
@@ -25,16 +30,25 @@ _REWRITE_SYSTEM_PROMPT = (
 )
 
 
-class LLMService:
+class GenerationError(Exception):
+    """The backend failed to produce an answer (the request must not count)."""
+
+
+class LLMNotConfigured(GenerationError):
+    """No backend (GEMINI_API_KEY missing): the ask views answer 503 before reserving quota."""
+
     def __init__(self):
-        api_key = getattr(settings, 'GEMINI_API_KEY', None)
-        if api_key and api_key.lower() not in ('none', ''):
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-3-flash-preview')
-            logger.info(f"LLMService initialized with key {api_key[:8]}...{api_key[-4:]}")
-        else:
-            self.model = None
-            logger.warning("GEMINI_API_KEY is not configured.")
+        super().__init__("LLM non configuré : vérifiez la présence de GEMINI_API_KEY.")
+
+
+class LLMService:
+    def __init__(self, backend=None):
+        # Backend selected by settings.LLM_BACKEND unless one is injected
+        self.backend = backend if backend is not None else build_backend()
+
+    @property
+    def configured(self) -> bool:
+        return self.backend is not None
 
     def rewrite_query(self, question: str) -> str:
         """
@@ -44,7 +58,7 @@ class LLMService:
         producing an optimized query for vector search.
         Returns the original question if rewriting fails.
         """
-        if not self.model:
+        if not self.backend:
             return question
 
         # Short questions (< 6 words) don't need rewriting
@@ -52,17 +66,23 @@ class LLMService:
             logger.debug(f"Query too short to rewrite: '{question}'")
             return question
 
+        cached = query_cache.get_rewrite(question)
+        if cached is not None:
+            return cached
+
         try:
             prompt = f"{_REWRITE_SYSTEM_PROMPT}\n\nQ: {question}\nR:"
-            response = self.model.generate_content(prompt)
-            rewritten = response.text.strip()
+            with timing.stage('rewrite'):
+                rewritten = self.backend.rewrite(prompt).strip()
 
             # Sanity check: if rewrite is empty or too long, fallback
             if not rewritten or len(rewritten) > len(question):
                 logger.warning(f"Query rewrite produced bad result, using original")
+                query_cache.set_rewrite(question, question)
                 return question
 
             logger.info(f"Query rewrite: '{question}' → '{rewritten}'")
+            query_cache.set_rewrite(question, rewritten)
             return rewritten
 
         except Exception as e:
@@ -70,97 +90,57 @@ class LLMService:
             return question
 
     def generate_response(self, question: str, contexts: list):
-        if not self.model:
-            return "Désolé, le service LLM n'est pas configuré. Veuillez vérifier la présence de GEMINI_API_KEY."
-
-        # Format context for the prompt
-        context_str = ""
-        for i, ctx in enumerate(contexts):
-            source_type = ctx.get('source_type', 'Coran')
-            context_str += f"- [{source_type}] {ctx['reference']} :\n  Texte Arabe : {ctx.get('text_ar', '')}\n  Traduction Française : {ctx.get('text_fr', '')}\n\n"
-
-        system_instruction = (
-            "Tu es un assistant islamique bienveillant et érudit. "
-            "Ta mission est d'aider les utilisateurs à comprendre l'Islam "
-            "en t'appuyant sur le Coran et les Hadiths qui te sont fournis en contexte.\n\n"
-            "Comment répondre :\n"
-            "- Utilise un langage naturel, fluide et chaleureux, comme un savant qui explique avec douceur.\n"
-            "- Base tes réponses UNIQUEMENT sur les sources fournies dans le contexte ci-dessous.\n"
-            "- Précise toujours la source de tes citations (ex: Sourate Al-Baqara, 2:153 pour le Coran ou la référence du Hadith fournie).\n"
-            "- Explique le sens des textes de manière accessible, en les reliant à la question posée.\n"
-            "- Tu peux reformuler, contextualiser et enrichir ta réponse pour la rendre pédagogique.\n"
-            "- Si les textes fournis répondent clairement à la question, n'hésite pas à le dire avec assurance.\n"
-            "- Si aucun texte du contexte ne traite du sujet demandé, réponds simplement :\n"
-            "  \"Je ne trouve pas de réponse claire dans les sources qui me sont fournies.\"\n\n"
-            "Garde toujours un ton respectueux, bienveillant et accessible."
-        )
-
-        prompt = (
-            f"{system_instruction}\n\n"
-            f"CONTEXTE :\n{context_str}\n"
-            f"QUESTION : {question}\n\n"
-            f"RÉPONSE :"
-        )
+        """
+        Full answer to `question` from `contexts`. Raises GenerationError
+        when the backend fails, so that the caller records a failed request.
+        """
+        if not self.backend:
+            raise LLMNotConfigured()
+
+        prompt = build_prompt(question, contexts)
 
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            with timing.stage('generate'):
+                return self.backend.generate(prompt)
         except Exception as e:
-            logger.exception(f"Erreur lors de l'appel à Gemini: {e}")
-            return "Une erreur est survenue lors de la génération de la réponse."
+            logger.exception(f"Erreur lors de l'appel au LLM ({self.backend.name}): {e}")
+            raise GenerationError("Une erreur est survenue lors de la génération de la réponse.") from e
 
     def generate_response_stream(self, question: str, contexts: list):
         """
-        Generator that yields text chunks from Gemini streaming.
+        Generator that yields text chunks from the backend stream.
 
         Uses the same prompt as generate_response but streams
-        the output token by token for real-time display.
+        the output token by token for real-time display. Raises
+        GenerationError when the backend fails, possibly after some chunks.
         """
-        if not self.model:
-            yield "Désolé, le service LLM n'est pas configuré."
-            return
-
-        # Format context
-        context_str = ""
-        for ctx in contexts:
-            source_type = ctx.get('source_type', 'Coran')
-            context_str += (
-                f"- [{source_type}] {ctx['reference']} :\n"
-                f"  Texte Arabe : {ctx.get('text_ar', '')}\n"
-                f"  Traduction Française : {ctx.get('text_fr', '')}\n\n"
-            )
-
-        system_instruction = (
-            "Tu es un assistant islamique bienveillant et érudit. "
-            "Ta mission est d'aider les utilisateurs à comprendre l'Islam "
-            "en t'appuyant sur le Coran et les Hadiths qui te sont fournis en contexte.\n\n"
-            "Comment répondre :\n"
-            "- Utilise un langage naturel, fluide et chaleureux, comme un savant qui explique avec douceur.\n"
-            "- Base tes réponses UNIQUEMENT sur les sources fournies dans le contexte ci-dessous.\n"
-            "- Précise toujours la source de tes citations (ex: Sourate Al-Baqara, 2:153 pour le Coran ou la référence du Hadith fournie).\n"
-            "- Explique le sens des textes de manière accessible, en les reliant à la question posée.\n"
-            "- Tu peux reformuler, contextualiser et enrichir ta réponse pour la rendre pédagogique.\n"
-            "- Si les textes fournis répondent clairement à la question, n'hésite pas à le dire avec assurance.\n"
-            "- Si aucun texte du contexte ne traite du sujet demandé, réponds simplement :\n"
-            "  \"Je ne trouve pas de réponse claire dans les sources qui me sont fournies.\"\n\n"
-            "Garde toujours un ton respectueux, bienveillant et accessible."
-        )
-
-        prompt = (
-            f"{system_instruction}\n\n"
-            f"CONTEXTE :\n{context_str}\n"
-            f"QUESTION : {question}\n\n"
-            f"RÉPONSE :"
-        )
+        if not self.backend:
+            raise LLMNotConfigured()
+
+        prompt = build_prompt(question, contexts)
 
+        started = time.perf_counter()
+        first_chunk = True
+        # Only the time spent in the backend: the time the consumer takes
+        # between two chunks (client backpressure) is not generation
+        generating = 0.0
         try:
-            response = self.model.generate_content(prompt, stream=True)
-            for chunk in response:
-                if chunk.text:
-                    yield chunk.text
+            chunks = iter(self.backend.stream(prompt))
+            while True:
+                waited = time.perf_counter()
+                chunk = next(chunks, _END)
+                generating += time.perf_counter() - waited
+                if chunk is _END:
+                    break
+                if first_chunk:
+                    timing.record('ttft', (time.perf_counter() - started) * 1000)
+                    first_chunk = False
+                yield chunk
         except Exception as e:
             logger.exception(f"Streaming error: {e}")
-            yield f"\n\n[Erreur: {str(e)}]"
+            raise GenerationError("La génération de la réponse a été interrompue.") from e
+        finally:
+            timing.record('generate', generating * 1000)
 
 # Singleton instance
 _llm_service = None
@@ -0,0 +1,160 @@
+"""
+Memory budget of the serving process.
+
+`load_serving_stack()` loads what a worker holds once warmed up (encoder,
+every index shard, concordance, related table); `report()` then breaks
+the process RSS down per component:
+
+- model parameters and buffers (bytes of the torch tensors)
+- FAISS indexes: ntotal * d float32 per flat index
+- metadata dicts, deep size, with the `embedding` lists kept in them
+  counted apart (the vectors are already in the FAISS index)
+- lookups built at load time (doc positions, verse positions, suggestions)
+
+Deep sizes share one `seen` set, so an object referenced by two
+components is counted once. The remainder of the RSS (interpreter,
+libraries, allocator slack) is reported as unattributed.
+"""
+
+import logging
+import os
+import sys
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MB = 2**20
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (Linux), else the peak (0 if unknown)."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        # No /proc (macOS), no os.sysconf (Windows)
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    try:
+        # Unix only: imported here so that the URLconf still loads on Windows
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def deep_size(obj, seen: set) -> int:
+    """Bytes of `obj` and everything it references that is not in `seen` yet."""
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            size += sys.getsizeof(item) + (item.nbytes if item.base is None else 0)
+            continue
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, '__dict__') and not isinstance(item, type):
+            stack.append(vars(item))
+    return size
+
+
+def model_bytes(model):
+    """Bytes of the torch parameters and buffers, or None for a non-torch encoder."""
+    if not hasattr(model, 'parameters'):
+        return None
+    tensors = list(model.parameters()) + list(getattr(model, 'buffers', lambda: [])())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+def index_bytes(index) -> int:
+    # Flat L2 indexes store every vector as float32
+    return int(index.ntotal) * int(index.d) * 4 if index is not None else 0
+
+
+def load_serving_stack():
+    """Load what a warmed-up worker holds (see services/warmup.py)."""
+    from .concordance_service import get_concordance_service
+    from .related_service import get_related_service
+    from .vector_service import get_vector_service
+    from .warmup import WARM_UP_QUERY
+
+    service = get_vector_service()
+    service.indexes.wait()
+    service.search(WARM_UP_QUERY, top_k=1)
+    get_concordance_service()
+    get_related_service()
+    return service
+
+
+def report(budget_mb: float = None) -> dict:
+    """
+    Per-component bytes of the loaded stack and the process RSS. With a
+    budget (MB, default settings.MEMORY_BUDGET_MB), `over_budget` tells
+    whether the RSS exceeds it.
+    """
+    from . import concordance_service, related_service, vector_service
+
+    seen = set()
+    components = []
+
+    def add(name, size, **detail):
+        components.append({'name': name, 'bytes': int(size), **detail})
+
+    service = vector_service._vector_service
+    if service is not None:
+        add('model', model_bytes(service.model) or 0, encoder=type(service.model).__name__)
+        indexes = service.indexes
+        for shard in indexes.shards:
+            add(f"faiss:{shard.name}", index_bytes(shard.index),
+                vectors=int(shard.index.ntotal) if shard.index is not None else 0)
+            if shard.chunk_index is not None:
+                add(f"faiss:{shard.name}:chunks", index_bytes(shard.chunk_index),
+                    vectors=int(shard.chunk_index.ntotal))
+            if shard.unchunked_index is not None:
+                add(f"faiss:{shard.name}:unchunked", index_bytes(shard.unchunked_index),
+                    vectors=int(shard.unchunked_index.ntotal))
+            # Embedding lists first, so that the metadata size excludes them
+            embeddings = sum(deep_size(item['embedding'], seen) for item in shard.metadata if 'embedding' in item)
+            add(f"embeddings:{shard.name}", embeddings,
+                documents=sum(1 for item in shard.metadata if 'embedding' in item))
+            add(f"metadata:{shard.name}", deep_size(shard.metadata, seen), documents=len(shard.metadata))
+            lookups = [shard.chunk_parents, shard.chunk_spans, shard.unchunked_rows, shard.verse_positions]
+            add(f"lookups:{shard.name}", deep_size(lookups, seen))
+        add('doc_positions', deep_size(indexes.doc_positions, seen), documents=len(indexes.doc_positions))
+        add('suggestions', deep_size(indexes.suggestions, seen))
+
+    for name, module, attribute in (
+            ('concordance', concordance_service, '_concordance_service'),
+            ('related', related_service, '_related_service')):
+        loaded = getattr(module, attribute, None)
+        if loaded is not None and loaded.available:
+            add(name, deep_size(loaded, seen))
+
+    rss = rss_bytes()
+    attributed = sum(component['bytes'] for component in components)
+    budget_mb = budget_mb if budget_mb is not None else getattr(settings, 'MEMORY_BUDGET_MB', None)
+    return {
+        'pid': os.getpid(),
+        'rss_bytes': rss,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'attributed_bytes': attributed,
+        'unattributed_bytes': max(0, rss - attributed),
+        'components': sorted(components, key=lambda component: -component['bytes']),
+        'budget_mb': budget_mb,
+        'over_budget': bool(budget_mb) and rss > budget_mb * MB,
+    }
@@ -0,0 +1,163 @@
+"""
+Prometheus histograms of request and pipeline stage durations.
+
+Each worker accumulates its observations locally; a daemon thread adds
+them to counters in the Django cache every METRICS_FLUSH_INTERVAL seconds
+(same scheme as QuotaService). /api/metrics/ reads those counters, so it
+reports the sum over all Gunicorn workers when the cache is shared
+(REDIS_URL); with the local memory cache each worker only reports itself.
+"""
+
+import atexit
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the histogram buckets, +Inf is implicit
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# histogram → (metric name, label name, help text)
+HISTOGRAMS = {
+    'stage': ('quran_stage_duration_seconds', 'stage', 'Duration of a pipeline stage'),
+    'request': ('quran_request_duration_seconds', 'endpoint', 'Duration of an API request'),
+}
+
+# Series registry, add-only so concurrent workers never overwrite each other:
+# a marker per series claims it (cache.add), the claimant takes the next slot
+# number from a counter (cache.incr) and stores the series in that slot
+_SERIES_COUNT = 'metrics:series:count'
+_SUM_SCALE = 1_000_000      # sums are stored as integer microseconds (cache.incr is integer-only)
+
+
+def _key(histogram, label, field) -> str:
+    return f"metrics:{histogram}:{label}:{field}"
+
+
+def _incr(key, delta):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, None)
+        return cache.incr(key, delta)
+
+
+def _register(histogram, label):
+    """Give the series a slot unless some worker already did."""
+    if cache.add(f"metrics:series:claimed:{histogram}:{label}", True, None):
+        slot = _incr(_SERIES_COUNT, 1)
+        cache.set(f"metrics:series:slot:{slot}", (histogram, label), None)
+
+
+def _registered_series() -> list:
+    count = cache.get(_SERIES_COUNT, 0)
+    slots = cache.get_many([f"metrics:series:slot:{slot}" for slot in range(1, count + 1)])
+    return [tuple(series) for series in slots.values()]
+
+
+class Metrics:
+    def __init__(self, flush_interval: float = None):
+        self.flush_interval = flush_interval if flush_interval is not None else getattr(
+            settings, 'METRICS_FLUSH_INTERVAL', 10
+        )
+        self._pending = defaultdict(int)        # cache key → delta not yet in the cache
+        self._series = set()                    # (histogram, label) observed by this worker
+        self._registered = set()                # … and already in the cache's registry
+        self._lock = threading.Lock()
+        self._flusher = None
+        atexit.register(self.flush)
+
+    def observe(self, histogram: str, label: str, seconds: float):
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self._series.add((histogram, label))
+            self._pending[_key(histogram, label, f"b{bucket}")] += 1
+            self._pending[_key(histogram, label, 'count')] += 1
+            self._pending[_key(histogram, label, 'sum')] += int(seconds * _SUM_SCALE)
+        self._ensure_flusher()
+
+    def flush(self):
+        """Add pending observations to the shared counters."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            series = self._series - self._registered
+        if not pending:
+            return 0
+
+        try:
+            for histogram, label in sorted(series):
+                _register(histogram, label)
+            self._registered |= series
+            for key, delta in pending.items():
+                _incr(key, delta)
+        except Exception as e:
+            logger.exception(f"Metrics flush failed, keeping observations for the next flush: {e}")
+            with self._lock:
+                for key, delta in pending.items():
+                    self._pending[key] += delta
+            return 0
+        return len(pending)
+
+    def render(self, gauges: dict = None) -> str:
+        """
+        Prometheus text exposition of every histogram, followed by `gauges`
+        ({name: (help, value)}) describing the worker serving the scrape;
+        names ending in `_total` are exposed as counters.
+        """
+        self.flush()
+        series = _registered_series()
+        fields = [f"b{i}" for i in range(len(BUCKETS) + 1)] + ['count', 'sum']
+        values = cache.get_many([_key(h, label, f) for h, label in series for f in fields])
+
+        lines = []
+        for histogram, (name, label_name, help_text) in HISTOGRAMS.items():
+            labels = sorted(label for h, label in series if h == histogram)
+            if not labels:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for label in labels:
+                cumulative = 0
+                for i, bound in enumerate(BUCKETS + (float('inf'),)):
+                    cumulative += values.get(_key(histogram, label, f"b{i}"), 0)
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{{{label_name}="{label}",le="{le}"}} {cumulative}')
+                total = values.get(_key(histogram, label, 'sum'), 0) / _SUM_SCALE
+                lines.append(f'{name}_sum{{{label_name}="{label}"}} {total:.6f}')
+                lines.append(f'{name}_count{{{label_name}="{label}"}} {values.get(_key(histogram, label, "count"), 0)}')
+
+        for name, (help_text, value) in (gauges or {}).items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+            lines.append(f'{name}{{worker="{os.getpid()}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def _ensure_flusher(self):
+        if self._flusher is not None or self.flush_interval <= 0:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+# Singleton instance
+_metrics = None
+
+def get_metrics():
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
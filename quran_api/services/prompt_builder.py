@@ -0,0 +1,249 @@
+"""
+Prompt construction for the RAG answer.
+
+`pack_contexts` selects what goes into the prompt under a token budget:
+- drops hits farther than a distance cutoff (always keeps the best one)
+- removes duplicates and diversifies with MMR over the hit embeddings
+- trims long hadiths to the matched chunk (chunked index) or to the
+  sentences closest to the question
+`build_prompt` formats the packed contexts into the final Gemini prompt.
+"""
+
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.conf import settings
+
+from .text_utils import normalize_text, sentence_spans
+
+logger = logging.getLogger(__name__)
+
+_SYSTEM_INSTRUCTION = (
+    "Tu es un assistant islamique bienveillant et érudit. "
+    "Ta mission est d'aider les utilisateurs à comprendre l'Islam "
+    "en t'appuyant sur le Coran et les Hadiths qui te sont fournis en contexte.\n\n"
+    "Comment répondre :\n"
+    "- Utilise un langage naturel, fluide et chaleureux, comme un savant qui explique avec douceur.\n"
+    "- Base tes réponses UNIQUEMENT sur les sources fournies dans le contexte ci-dessous.\n"
+    "- Précise toujours la source de tes citations (ex: Sourate Al-Baqara, 2:153 pour le Coran ou la référence du Hadith fournie).\n"
+    "- Explique le sens des textes de manière accessible, en les reliant à la question posée.\n"
+    "- Tu peux reformuler, contextualiser et enrichir ta réponse pour la rendre pédagogique.\n"
+    "- Si les textes fournis répondent clairement à la question, n'hésite pas à le dire avec assurance.\n"
+    "- Si aucun texte du contexte ne traite du sujet demandé, réponds simplement :\n"
+    "  \"Je ne trouve pas de réponse claire dans les sources qui me sont fournies.\"\n\n"
+    "Garde toujours un ton respectueux, bienveillant et accessible."
+)
+
+_DEFAULT_PACKING = {
+    'token_budget': 3000,
+    'max_distance': 0.6,
+    'mmr_lambda': 0.7,
+    'duplicate_similarity': 0.97,
+    'hadith_max_chars': 600,
+}
+
+_ARABIC_CHAR_RE = re.compile(r'[؀-ۿ]')
+_WORD_RE = re.compile(r'\w+')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate for Gemini.
+
+    Latin text averages ~4 characters per token, Arabic ~2.5
+    (the tokenizer splits Arabic words more aggressively).
+    """
+    if not text:
+        return 0
+    arabic = len(_ARABIC_CHAR_RE.findall(text))
+    return math.ceil(arabic / 2.5 + (len(text) - arabic) / 4)
+
+
+def format_context(ctx: dict) -> str:
+    source_type = ctx.get('source_type', 'Coran')
+    return (
+        f"- [{source_type}] {ctx['reference']} :\n"
+        f"  Texte Arabe : {ctx.get('text_ar', '')}\n"
+        f"  Traduction Française : {ctx.get('text_fr', '')}\n\n"
+    )
+
+
+def build_prompt(question: str, contexts: list) -> str:
+    context_str = "".join(format_context(ctx) for ctx in contexts)
+    return (
+        f"{_SYSTEM_INSTRUCTION}\n\n"
+        f"CONTEXTE :\n{context_str}\n"
+        f"QUESTION : {question}\n\n"
+        f"RÉPONSE :"
+    )
+
+
+@dataclass
+class PackedContexts:
+    contexts: list                      # contexts as sent to the LLM (hadiths may be trimmed)
+    selected: list                      # same hits, untrimmed, for display as sources
+    stats: dict = field(default_factory=dict)
+
+
+def _query_terms(question: str) -> set:
+    text = normalize_text(question)
+    return {w for w in _WORD_RE.findall(text) if len(w) > 2}
+
+
+def trim_to_relevant(text: str, terms: set, max_chars: int) -> str:
+    """
+    Keep the sentences of `text` sharing the most words with the question,
+    in their original order, within `max_chars`.
+    """
+    if len(text) <= max_chars:
+        return text
+
+    sentences = [text[start:end] for start, end in sentence_spans(text)]
+    if len(sentences) <= 1:
+        return text[:max_chars].rsplit(' ', 1)[0] + " […]"
+
+    scores = []
+    for i, sentence in enumerate(sentences):
+        words = set(_WORD_RE.findall(normalize_text(sentence)))
+        scores.append((len(words & terms), -i))
+
+    kept, used = set(), 0
+    for _, neg_i in sorted(scores, reverse=True):
+        i = -neg_i
+        if used + len(sentences[i]) > max_chars and kept:
+            continue
+        kept.add(i)
+        used += len(sentences[i]) + 1
+        if used >= max_chars:
+            break
+
+    parts, previous = [], -1
+    for i in sorted(kept):
+        if previous != -1 and i != previous + 1:
+            parts.append("[…]")
+        parts.append(sentences[i])
+        previous = i
+    return " ".join(parts)
+
+
+def matched_passage(text: str, span) -> str:
+    """Return the chunk of `text` matched by the search, marking cut ends."""
+    start, end = span
+    passage = text[start:end].strip()
+    if start > 0:
+        passage = "[…] " + passage
+    if end < len(text.rstrip()):
+        passage = passage + " […]"
+    return passage
+
+
+def mmr_order(vectors: np.ndarray, query_vector: np.ndarray, lambda_: float, duplicate_similarity: float) -> list:
+    """
+    Maximal Marginal Relevance ordering over cosine similarities.
+
+    Returns candidate indices in selection order; candidates whose similarity
+    to an already selected one reaches `duplicate_similarity` are dropped.
+    """
+    n = len(vectors)
+    if n == 0:
+        return []
+
+    normed = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+    relevance = normed @ query
+    similarity = normed @ normed.T
+
+    order = []
+    max_sim = np.full(n, -np.inf, dtype='float32')
+    available = np.ones(n, dtype=bool)
+    while available.any():
+        redundancy = np.where(np.isfinite(max_sim), max_sim, 0.0)
+        scores = lambda_ * relevance - (1 - lambda_) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        order.append(best)
+        available[best] = False
+        max_sim = np.maximum(max_sim, similarity[:, best])
+        available &= max_sim < duplicate_similarity
+    return order
+
+
+def pack_contexts(question: str, contexts: list, vectors=None, query_vector=None) -> PackedContexts:
+    """
+    Select and trim contexts for the prompt within the configured token budget.
+
+    `vectors` (aligned with `contexts`) and `query_vector` come from
+    VectorService.search_with_vectors; without them the MMR step is skipped
+    and only exact duplicates are removed.
+    """
+    options = {**_DEFAULT_PACKING, **getattr(settings, 'PROMPT_PACKING', {})}
+    tokens_before = sum(estimate_tokens(format_context(ctx)) for ctx in contexts)
+
+    # 1. Distance cutoff (results are sorted by score, keep at least the best hit)
+    max_distance = options['max_distance']
+    candidates = [
+        i for i, ctx in enumerate(contexts)
+        if i == 0 or max_distance is None or ctx.get('score', 0.0) <= max_distance
+    ]
+    dropped_distance = len(contexts) - len(candidates)
+
+    # 2. Exact duplicates (same document id or same text)
+    seen, unique = set(), []
+    for i in candidates:
+        key = contexts[i].get('id') or (contexts[i].get('text_ar'), contexts[i].get('text_fr'))
+        if key not in seen:
+            seen.add(key)
+            unique.append(i)
+
+    # 3. Near duplicates + diversity
+    if vectors is not None and query_vector is not None and len(unique) > 1:
+        picked = mmr_order(
+            np.asarray(vectors, dtype='float32')[unique],
+            np.asarray(query_vector, dtype='float32'),
+            options['mmr_lambda'],
+            options['duplicate_similarity'],
+        )
+        ordered = [unique[j] for j in picked]
+    else:
+        ordered = unique
+    dropped_duplicates = len(candidates) - len(ordered)
+
+    # 4. Trim long hadiths and fill the budget
+    terms = _query_terms(question)
+    max_chars = options['hadith_max_chars']
+    packed, selected, used = [], [], 0
+    for i in ordered:
+        ctx = contexts[i]
+        if ctx.get('source_type') == 'Hadith':
+            trimmed = ctx.copy()
+            if ctx.get('match_span'):
+                trimmed['text_fr'] = matched_passage(ctx.get('text_fr', ''), ctx['match_span'])
+            else:
+                trimmed['text_fr'] = trim_to_relevant(ctx.get('text_fr', ''), terms, max_chars)
+            trimmed['text_ar'] = trim_to_relevant(ctx.get('text_ar', ''), terms, max_chars)
+        else:
+            trimmed = ctx
+        cost = estimate_tokens(format_context(trimmed))
+        if packed and used + cost > options['token_budget']:
+            continue
+        packed.append(trimmed)
+        selected.append(ctx)
+        used += cost
+
+    stats = {
+        'contexts_in': len(contexts),
+        'contexts_out': len(packed),
+        'dropped_distance': dropped_distance,
+        'dropped_duplicates': dropped_duplicates,
+        'tokens_before': tokens_before,
+        'tokens_after': used,
+        'tokens_saved': tokens_before - used,
+    }
+    logger.info(
+        f"Context packing: {stats['contexts_in']}→{stats['contexts_out']} contexts, "
+        f"~{stats['tokens_saved']} tokens saved ({tokens_before}→{used})"
+    )
+    return PackedContexts(contexts=packed, selected=selected, stats=stats)
@@ -0,0 +1,241 @@
+"""
+Query caches of the ask pipeline, and their pre-warming.
+
+Keyed by the normalized text, in the Django cache (shared by the workers
+with Redis):
+
+- rewrite   : question → search keywords from LLMService.rewrite_query()
+- embedding : (model, search text) → encoded query vector
+- retrieval : (model, index fingerprint, search text, options) → hits as
+              compact references plus their stored vectors; a reload to
+              another index version, or rebuilt legacy files, changes
+              every key
+
+`prewarm()` fills the three caches for the most frequent questions of
+ChatHistory (`popular_queries()`), from manage.py prewarm_cache or from
+the worker warm-up (QUERY_CACHE['prewarm_queries'] > 0). `hit_rate()`
+measures the result in the request ledger.
+"""
+
+import datetime
+import hashlib
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import timing
+from .source_refs import compact_source
+from .text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'rewrite_ttl': 7 * 86400,
+    'embedding_ttl': 7 * 86400,
+    'retrieval_ttl': 86400,
+    'prewarm_queries': 0,
+    'prewarm_days': 7,
+}
+
+# Time and size of the last pre-warm, for hit_rate()
+PREWARM_KEY = 'query_cache:prewarm'
+
+# Search options of the ask endpoints, which pre-warming reproduces
+ASK_TOP_K = 10
+
+
+def config(name):
+    return getattr(settings, 'QUERY_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def is_shared() -> bool:
+    """
+    False when the cache lives in this process only (LocMemCache without
+    REDIS_URL, DummyCache): entries written by a manage.py command are
+    lost when it exits and never reach the workers.
+    """
+    from django.core.cache import caches
+    from django.core.cache.backends.dummy import DummyCache
+    from django.core.cache.backends.locmem import LocMemCache
+
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def _rewrite_key(question):
+    return f"query_cache:rewrite:{_digest(question)}"
+
+
+def _model():
+    # Vectors of another encoder have another meaning, or dimension
+    return hashlib.sha1(str(getattr(settings, 'MODEL_NAME', '')).encode('utf-8')).hexdigest()[:8]
+
+
+def _embedding_key(text):
+    return f"query_cache:embedding:{_model()}:{_digest(text)}"
+
+
+def _retrieval_key(fingerprint, text, top_k, source_filter, window, ruku):
+    return (
+        f"query_cache:retrieval:{_model()}:{fingerprint}:{source_filter}:{top_k}:{window}:{int(ruku)}:"
+        f"{_digest(text)}"
+    )
+
+
+def get_rewrite(question: str):
+    rewritten = cache.get(_rewrite_key(question))
+    if rewritten is not None:
+        timing.cache_hit('rewrite')
+    return rewritten
+
+
+def set_rewrite(question: str, rewritten: str):
+    cache.set(_rewrite_key(question), rewritten, config('rewrite_ttl'))
+
+
+def get_embedding(text: str):
+    vector = cache.get(_embedding_key(text))
+    if vector is not None:
+        timing.cache_hit('embedding')
+    return vector
+
+
+def set_embedding(text: str, vector):
+    cache.set(_embedding_key(text), np.asarray(vector, dtype='float32'), config('embedding_ttl'))
+
+
+def get_retrieval(indexes, text, top_k, source_filter, window, ruku):
+    """Cached hits as (item, vector, row) hydrated from `indexes`, or None."""
+    entry = cache.get(_retrieval_key(indexes.fingerprint, text, top_k, source_filter, window, ruku))
+    if entry is None:
+        return None
+    refs, vectors = entry
+    items = [indexes.hydrate(ref) for ref in refs]
+    if any(item is None for item in items):
+        return None
+    timing.cache_hit('retrieval')
+    return [(item, vector, None) for item, vector in zip(items, vectors)]
+
+
+def set_retrieval(indexes, text, top_k, source_filter, window, ruku, hits):
+    if not indexes.loaded.is_set():
+        # Hits of the collections loaded so far: not the answer of this version
+        return
+    refs = [compact_source(item) for item, _, _ in hits]
+    vectors = np.stack([vector for _, vector, _ in hits]) if hits else np.zeros((0, 0), dtype='float32')
+    cache.set(
+        _retrieval_key(indexes.fingerprint, text, top_k, source_filter, window, ruku),
+        (refs, vectors), config('retrieval_ttl')
+    )
+
+
+def popular_queries(limit: int = 200, days: int = 7) -> list:
+    """The `limit` most asked questions of the last `days` days as (question, count)."""
+    from ..models import ChatHistory
+
+    since = timezone.now() - datetime.timedelta(days=days)
+    counts = Counter()
+    original = {}
+    for query in ChatHistory.objects.filter(created_at__gte=since).values_list('query', flat=True).iterator(chunk_size=2000):
+        key = normalize_text(query)
+        if key:
+            counts[key] += 1
+            original.setdefault(key, query)
+    return [(original[key], count) for key, count in counts.most_common(limit)]
+
+
+def prewarm(questions: list, rewrite: bool = True, batch_size: int = 32, workers: int = 4) -> dict:
+    """
+    Rewrite, encode (in batches) and search `questions` with the options of
+    the ask endpoints, filling the three caches. Entries already cached are
+    kept, so every worker of a deploy can run it. Returns counters.
+    """
+    from .llm_service import get_llm_service
+    from .vector_service import get_vector_service
+
+    started = time.perf_counter()
+    service = get_vector_service()
+    indexes = service.indexes
+    # Retrievals are cached for the complete set only
+    indexes.wait()
+
+    if rewrite:
+        # LLM calls wait on the network: a few at a time
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            texts = list(pool.map(get_llm_service().rewrite_query, questions))
+    else:
+        texts = list(questions)
+
+    unique = list(dict.fromkeys(normalize_text(text) for text in texts))
+    unique = [text for text in unique if text]
+    vectors = {text: cache.get(_embedding_key(text)) for text in unique}
+    missing = [text for text, vector in vectors.items() if vector is None]
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        encoded = service.model.encode([f"query: {text}" for text in batch]).astype('float32')
+        for text, vector in zip(batch, encoded):
+            set_embedding(text, vector)
+            vectors[text] = vector
+
+    window = getattr(settings, 'ASK_VERSE_WINDOW', 1)
+    searched = 0
+    for text in unique:
+        key = _retrieval_key(indexes.fingerprint, text, ASK_TOP_K, 'both', window, False)
+        if cache.get(key) is not None:
+            continue
+        hits = indexes.search(vectors[text][None, :], ASK_TOP_K, 'both', window, False)
+        set_retrieval(indexes, text, ASK_TOP_K, 'both', window, False, hits)
+        searched += 1
+
+    stats = {
+        'questions': len(questions),
+        'texts': len(unique),
+        'encoded': len(missing),
+        'searched': searched,
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+    cache.set(PREWARM_KEY, {'at': time.time(), **stats}, None)
+    logger.info(f"Query caches pre-warmed: {stats}")
+    return stats
+
+
+def hit_rate(since: datetime.datetime, hours: float = 1) -> dict:
+    """
+    Cache hit rates of the asks logged in the request ledger during
+    `hours` hours from `since`. A follow-up reuses its conversation's
+    contexts without searching: it is left out of the search hit rates.
+    """
+    from ..models import RequestLedger
+
+    until = since + datetime.timedelta(hours=hours)
+    rows = RequestLedger.objects.filter(created_at__gte=since, created_at__lt=until)
+    requests, searches = 0, 0
+    hits = Counter()
+    for cache_hits in rows.values_list('cache_hits', flat=True).iterator(chunk_size=2000):
+        requests += 1
+        if 'followup' in cache_hits:
+            continue
+        searches += 1
+        hits.update(name for name in ('rewrite', 'embedding', 'retrieval') if name in cache_hits)
+    return {
+        'since': since.isoformat(timespec='seconds'),
+        'until': until.isoformat(timespec='seconds'),
+        'requests': requests,
+        'searches': searches,
+        'hits': dict(hits),
+        'rates': {name: round(hits[name] / searches, 3) if searches else None
+                  for name in ('rewrite', 'embedding', 'retrieval')},
+    }
+
+
+def last_prewarm():
+    return cache.get(PREWARM_KEY)
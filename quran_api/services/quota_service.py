@@ -0,0 +1,175 @@
+"""
+Daily request quotas kept in the Django cache.
+
+Each (user, day) has an atomic counter in the cache. `reserve()` increments
+it before the pipeline runs and refuses (and rolls back) once the plan
+limit is reached, so concurrent streams from one user cannot race past it.
+A missing counter (new day, cache eviction) is seeded from a fresh read of
+the profile, never from the possibly stale one cached by authentication.
+
+The database only receives the increments in bulk: every worker
+accumulates its own deltas and `flush()` applies them with
+F('requests_today') + n, grouped by delta value. Counters are shared
+across Gunicorn workers only with a shared cache backend (REDIS_URL).
+"""
+
+import atexit
+import datetime
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DAILY_LIMIT = 5
+
+# Counters outlive the day they count so late flushes still find them
+_COUNTER_TTL = 2 * 24 * 3600
+
+
+def _counter_key(user_id, day) -> str:
+    return f"quota:{user_id}:{day.isoformat()}"
+
+
+def daily_limit(profile) -> int:
+    """Daily request limit of a profile (-1 = unlimited)."""
+    plan = profile.subscription_plan
+    return plan.daily_request_limit if plan else DEFAULT_DAILY_LIMIT
+
+
+class Reservation(NamedTuple):
+    """Outcome of reserve(); release() gives back the request of this exact day."""
+    allowed: bool
+    requests_today: int
+    user_id: int
+    day: datetime.date
+
+
+class QuotaService:
+    def __init__(self, flush_interval: float = None):
+        self.flush_interval = flush_interval if flush_interval is not None else getattr(
+            settings, 'QUOTA_FLUSH_INTERVAL', 10
+        )
+        self._pending = defaultdict(int)        # (user_id, day) → requests not yet in the DB
+        self._lock = threading.Lock()
+        self._flusher = None
+        atexit.register(self.flush)
+
+    def _seed(self, user_id, day):
+        """Create the counter of (user, day) from the database, plus this worker's unflushed requests."""
+        from ..models import UserProfile
+
+        row = UserProfile.objects.filter(user_id=user_id).values_list('requests_today', 'last_request_date').first()
+        stored = row[0] if row is not None and row[1] == day else 0
+        with self._lock:
+            stored += self._pending.get((user_id, day), 0)
+        cache.add(_counter_key(user_id, day), stored, _COUNTER_TTL)
+
+    def used_today(self, profile) -> int:
+        day = timezone.localdate()
+        count = cache.get(_counter_key(profile.user_id, day))
+        if count is None:
+            self._seed(profile.user_id, day)
+            count = cache.get(_counter_key(profile.user_id, day), 0)
+        return count
+
+    def reserve(self, profile) -> Reservation:
+        """
+        Atomically take one request from today's quota.
+
+        Returns a Reservation (allowed, requests_today, ...). When refused,
+        the counter is left unchanged.
+        """
+        day = timezone.localdate()
+        key = _counter_key(profile.user_id, day)
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            # First request of the day, or counter evicted
+            self._seed(profile.user_id, day)
+            count = cache.incr(key)
+
+        limit = daily_limit(profile)
+        if limit != -1 and count > limit:
+            cache.decr(key)
+            return Reservation(False, count - 1, profile.user_id, day)
+
+        with self._lock:
+            self._pending[(profile.user_id, day)] += 1
+        self._ensure_flusher()
+        return Reservation(True, count, profile.user_id, day)
+
+    def release(self, reservation: Reservation):
+        """
+        Give back a reserved request (the pipeline failed before answering),
+        on the day it was reserved even if midnight has passed since.
+        """
+        if not reservation.allowed:
+            return
+        key = _counter_key(reservation.user_id, reservation.day)
+        try:
+            cache.decr(key)
+        except ValueError:
+            pass
+        with self._lock:
+            pending_key = (reservation.user_id, reservation.day)
+            if self._pending.get(pending_key, 0) > 0:
+                self._pending[pending_key] -= 1
+
+    def flush(self):
+        """Persist pending increments with one UPDATE per (day, delta) group."""
+        from ..models import UserProfile
+
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+
+        groups = defaultdict(list)
+        for (user_id, day), delta in pending.items():
+            if delta > 0:
+                groups[(day, delta)].append(user_id)
+
+        try:
+            for (day, delta), user_ids in groups.items():
+                profiles = UserProfile.objects.filter(user_id__in=user_ids)
+                profiles.filter(last_request_date=day).update(requests_today=F('requests_today') + delta)
+                profiles.filter(last_request_date__lt=day).update(requests_today=delta, last_request_date=day)
+        except Exception as e:
+            logger.exception(f"Quota flush failed, keeping increments for the next flush: {e}")
+            with self._lock:
+                for (user_id, day), delta in pending.items():
+                    self._pending[(user_id, day)] += delta
+            return 0
+
+        if groups:
+            logger.debug(f"Quota flush: {sum(len(ids) for ids in groups.values())} profiles updated")
+        return len(pending)
+
+    def _ensure_flusher(self):
+        if self._flusher is not None or self.flush_interval <= 0:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='quota-flusher', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+# Singleton instance
+_quota_service = None
+
+def get_quota_service():
+    global _quota_service
+    if _quota_service is None:
+        _quota_service = QuotaService()
+    return _quota_service
@@ -0,0 +1,77 @@
+import numpy as np
+from django.conf import settings
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RelatedService:
+    """
+    Serves precomputed neighbours from the table built by index_related.py.
+
+    Lookups are a dict access plus a row slice: no model, no FAISS search.
+    """
+
+    # (source of the document, source of the neighbours) → array prefix in the .npz
+    _TABLES = {
+        ('quran', 'quran'): 'quran_quran',
+        ('quran', 'hadith'): 'quran_hadith',
+        ('hadith', 'quran'): 'hadith_quran',
+    }
+
+    def __init__(self, path=None):
+        path = path or getattr(settings, 'RELATED_INDEX_PATH', settings.BASE_DIR / 'related_neighbors.npz')
+        self.available = os.path.exists(path)
+        self.positions = {}
+        if not self.available:
+            logger.warning(f"Related neighbours table not found at {path}")
+            return
+
+        data = np.load(path)
+        self.ids = {'quran': data['quran_ids'], 'hadith': data['hadith_ids']}
+        self.refs = {'quran': data['quran_refs'], 'hadith': data['hadith_refs']}
+        self.tables = {
+            key: (data[f'{prefix}_idx'], data[f'{prefix}_dist'])
+            for key, prefix in self._TABLES.items()
+        }
+        for source, ids in self.ids.items():
+            for row, doc_id in enumerate(ids.tolist()):
+                self.positions[doc_id] = (source, row)
+        logger.info(f"Related neighbours loaded: {len(self.positions)} documents")
+
+    def related(self, doc_id: str, limit: int = 10):
+        """
+        Return the neighbours of `doc_id` grouped by target source,
+        or None if the document is unknown.
+        """
+        position = self.positions.get(doc_id)
+        if position is None:
+            return None
+
+        source, row = position
+        result = {}
+        for (from_source, to_source), (indices, distances) in self.tables.items():
+            if from_source != source:
+                continue
+            neighbours = []
+            for idx, dist in zip(indices[row, :limit].tolist(), distances[row, :limit].tolist()):
+                if idx < 0:
+                    break
+                neighbours.append({
+                    "id": str(self.ids[to_source][idx]),
+                    "reference": str(self.refs[to_source][idx]),
+                    "score": float(dist),
+                })
+            result[to_source] = neighbours
+        return result
+
+
+# Singleton instance
+_related_service = None
+
+def get_related_service():
+    global _related_service
+    if _related_service is None:
+        _related_service = RelatedService()
+    return _related_service
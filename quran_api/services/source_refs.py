@@ -0,0 +1,64 @@
+"""
+Compact storage of answer sources.
+
+ChatHistory.sources keeps only a reference per source (document id, score
+and, for passages or hadith chunks, the range that was shown); the texts
+are hydrated back from the corpus loaded by VectorService when read.
+"""
+
+
+def compact_source(source: dict) -> dict:
+    """Reference to a search result; dicts without an id are kept whole."""
+    if 'id' not in source:
+        return source
+
+    ref = {'id': source['id']}
+    if 'score' in source:
+        ref['score'] = round(float(source['score']), 4)
+    if 'match_span' in source:
+        ref['match_span'] = source['match_span']
+    metadata = source.get('metadata') or {}
+    if 'ayah_end' in metadata:
+        ref['ayah_start'] = metadata['ayah_start']
+        ref['ayah_end'] = metadata['ayah_end']
+    return ref
+
+
+def compact_sources(sources: list) -> list:
+    return [compact_source(source) for source in sources]
+
+
+def is_compact(source: dict) -> bool:
+    return 'id' in source and 'text_fr' not in source and 'text_ar' not in source
+
+
+class SourcesUnavailable(Exception):
+    """Compact references cannot be hydrated: this worker has not loaded the corpus yet."""
+
+    retry_after = 5
+
+
+def hydrate_sources(sources: list) -> list:
+    """
+    Replace compact references by full source dicts.
+
+    Legacy rows (full copies) are returned unchanged and references to
+    unknown documents are returned as stored. Raises SourcesUnavailable
+    while the worker has not loaded the corpus: reading the history must
+    not load the encoder and every index (the warm-up thread does), nor
+    answer sources without their texts.
+    """
+    if not sources or not any(is_compact(source) for source in sources):
+        return sources
+
+    from .vector_service import get_vector_service, is_vector_service_loaded
+
+    if not is_vector_service_loaded():
+        raise SourcesUnavailable()
+    service = get_vector_service()
+
+    hydrated = []
+    for source in sources:
+        item = service.hydrate(source) if is_compact(source) else None
+        hydrated.append(item if item is not None else source)
+    return hydrated
@@ -0,0 +1,145 @@
+"""
+Typeahead suggestions (/api/suggest/), built with each IndexSet from the
+loaded metadata: sourate names, verse references ("2:255"), reference
+strings and a frequency-ranked vocabulary of the normalized corpus.
+
+Keys are normalized with normalize_text() and kept in one sorted list, so
+the entries starting with a prefix are the contiguous range found by two
+bisects; the best of the range are picked by weight with numpy. Ranges of
+one- and two-character prefixes are too large to rank per keystroke and
+are ranked once at build time. The model is never involved.
+"""
+
+import bisect
+import logging
+import re
+import time
+from collections import Counter
+
+import numpy as np
+
+from .text_utils import arabic_tokens, normalize_text
+
+logger = logging.getLogger(__name__)
+
+MAX_LIMIT = 20
+
+# Sourates first, then verse references in reading order, then words by
+# frequency; reference strings last
+_SOURATE_WEIGHT = 3_000_000
+_VERSE_WEIGHT = 2_000_000
+_REFERENCE_WEIGHT = -1
+
+# Words of the vocabulary: at least this long and seen this many times
+MIN_WORD_LENGTH = 3
+MIN_WORD_COUNT = 2
+
+_FRENCH_WORD_RE = re.compile(r"[a-z]+")
+_STOPWORDS = frozenset(
+    "les des une que qui dans pour par sur est sont pas plus ils elle elles leur leurs vous nous "
+    "son ses aux avec ont cette ceux celui tout tous car mais ton tes mon mes lui fut etait".split()
+)
+# Precomputed prefix lengths
+_SHORT_PREFIX = 2
+
+
+class SuggestIndex:
+    def __init__(self, quran_metadata: list, hadith_metadata: list):
+        started = time.perf_counter()
+        self.items = []         # suggestion dicts returned to the client
+        entries = []            # (key, weight, item index)
+
+        self._add_sourates(quran_metadata, entries)
+        self._add_references(quran_metadata, hadith_metadata, entries)
+        self._add_vocabulary(quran_metadata + hadith_metadata, entries)
+
+        entries.sort(key=lambda entry: entry[0])
+        self.keys = [key for key, _, _ in entries]
+        self.weights = np.array([weight for _, weight, _ in entries], dtype='float64')
+        self.targets = np.array([item for _, _, item in entries], dtype='int32')
+
+        self._short = {}
+        for length in range(1, _SHORT_PREFIX + 1):
+            for prefix in sorted({key[:length] for key in self.keys if len(key) >= length}):
+                self._short[prefix] = self._rank(prefix, MAX_LIMIT)
+        logger.info(
+            f"Suggestions built: {len(self.keys)} keys, {len(self.items)} items "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+    def _item(self, **item) -> int:
+        self.items.append(item)
+        return len(self.items) - 1
+
+    def _add_sourates(self, quran_metadata, entries):
+        seen = set()
+        for item in quran_metadata:
+            sourate, name = item['metadata']['sourate'], item['metadata']['sourate_name']
+            if sourate in seen:
+                continue
+            seen.add(sourate)
+            target = self._item(type='sourate', label=f"Sourate {sourate} — {name}", value=str(sourate), sourate=sourate)
+            key = normalize_text(name)
+            # "al-baqara", "al baqara", "albaqara", and without the article:
+            # "baqara" ("aal-i-imraan" also gives "i-imraan" and "imraan")
+            parts = key.split('-')
+            variants = {key, key.replace('-', ' '), re.sub(r"[-' ]", '', key)}
+            variants.update('-'.join(parts[i:]) for i in range(1, len(parts)))
+            for variant in variants:
+                entries.append((variant, _SOURATE_WEIGHT - sourate, target))
+            entries.append((str(sourate), _SOURATE_WEIGHT - sourate, target))
+
+    def _add_references(self, quran_metadata, hadith_metadata, entries):
+        for row, item in enumerate(quran_metadata):
+            meta = item['metadata']
+            target = self._item(type='verse', label=item['reference'], value=f"{meta['sourate']}:{meta['ayah']}", id=item['id'])
+            entries.append((f"{meta['sourate']}:{meta['ayah']}", _VERSE_WEIGHT - row, target))
+            entries.append((normalize_text(item['reference']), _REFERENCE_WEIGHT, target))
+        for item in hadith_metadata:
+            target = self._item(type='hadith', label=item['reference'], value=item['reference'], id=item['id'])
+            entries.append((normalize_text(item['reference']), _REFERENCE_WEIGHT, target))
+
+    def _add_vocabulary(self, documents, entries):
+        counts = Counter()
+        for item in documents:
+            counts.update(_FRENCH_WORD_RE.findall(item.get('normalized_fr') or normalize_text(item['text_fr'])))
+            counts.update(arabic_tokens(item.get('normalized_ar') or normalize_text(item['text_ar'])))
+        for word, count in counts.items():
+            if count >= MIN_WORD_COUNT and len(word) >= MIN_WORD_LENGTH and word not in _STOPWORDS:
+                target = self._item(type='term', label=word, value=word, count=count)
+                entries.append((word, count, target))
+
+    def _range(self, prefix):
+        low = bisect.bisect_left(self.keys, prefix)
+        return low, bisect.bisect_left(self.keys, prefix + '\uffff', low)
+
+    def _rank(self, prefix, limit):
+        """Item indices of the best entries starting with `prefix`, one per item."""
+        low, high = self._range(prefix)
+        weights = self.weights[low:high]
+        # A sourate has up to five keys: rank enough entries to fill `limit` items
+        width = limit * 5
+        if len(weights) > width:
+            candidates = np.argpartition(-weights, width)[:width]
+        else:
+            candidates = np.arange(len(weights))
+        # Heaviest first, ties in key order
+        candidates = candidates[np.lexsort((candidates, -weights[candidates]))]
+
+        ranked = []
+        for target in self.targets[low + candidates].tolist():
+            if target not in ranked:
+                ranked.append(target)
+                if len(ranked) == limit:
+                    break
+        return ranked
+
+    def suggest(self, query: str, limit: int = 8) -> list:
+        prefix = normalize_text(query)
+        if not prefix:
+            return []
+        limit = max(1, min(limit, MAX_LIMIT))
+        ranked = self._short.get(prefix) if len(prefix) <= _SHORT_PREFIX else None
+        if ranked is None:
+            ranked = self._rank(prefix, limit)
+        return [self.items[target] for target in ranked[:limit]]
@@ -3,10 +3,64 @@ Text normalization utilities for Quran search.
 
 Ensures consistent matching between indexed content and user queries
 by normalizing French (accents, casing) and Arabic (harakat, alif variants).
+
+The French and full normalizers are a single `str.translate` pass over
+precomputed tables (plus `lower()` and a whitespace split/join) instead of
+regex substitutions, an NFD decomposition and a per-character category
+filter.
+The test suite checks that the output is identical to the original regex
+implementation (kept in `benchmarks/normalization.py`, which measures the
+speedup).
 """
 
 import re
 import unicodedata
+from functools import lru_cache
+
+# Arabic letter unification (alif variants, alif maqsura, hamza carriers, ta marbuta)
+_ARABIC_LETTERS = {
+    'إ': 'ا', 'أ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي',
+    'ؤ': 'و', 'ئ': 'ي',
+    'ة': 'ه',
+}
+# Harakat / tashkeel (U+064B – U+065F) and tatweel (U+0640)
+_ARABIC_MARKS_RE = re.compile('[\u064B-\u065F\u0640]')
+
+_TATWEEL = '\u0640'
+
+
+class _DecompositionTable(dict):
+    """
+    Translation table filled on first use of each code point: the NFD
+    decomposition of the character without its combining marks (category
+    Mn), optionally followed by the Arabic letter unification.
+
+    Only the characters actually met are computed, so there is no
+    import-time scan of the Unicode range.
+    """
+
+    def __init__(self, arabic: bool):
+        super().__init__()
+        self.arabic = arabic
+
+    def __missing__(self, cp):
+        decomposed = ''.join(
+            c for c in unicodedata.normalize('NFD', chr(cp))
+            if unicodedata.category(c) != 'Mn'
+        )
+        if self.arabic:
+            decomposed = ''.join(_ARABIC_LETTERS.get(c, c) for c in decomposed)
+        value = cp if decomposed == chr(cp) else decomposed
+        self[cp] = value
+        return value
+
+
+_FRENCH_TABLE = _DecompositionTable(arabic=False)
+_TEXT_TABLE = _DecompositionTable(arabic=True)
+
+# Queries up to this length go through the memoized path
+SHORT_TEXT_LENGTH = 256
 
 
 def normalize_french(text: str) -> str:
@@ -16,54 +70,141 @@ def normalize_french(text: str) -> str:
     - strip diacritics / accents  (é→e, â→a, ū→u, ā→a …)
     - collapse whitespace
     """
-    text = text.lower()
-
-    # Decompose unicode, then remove combining marks (accents)
-    text = ''.join(
-        c for c in unicodedata.normalize('NFD', text)
-        if unicodedata.category(c) != 'Mn'
-    )
-
-    # Collapse multiple spaces
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    return ' '.join(text.lower().translate(_FRENCH_TABLE).split())
 
 
 def normalize_arabic(text: str) -> str:
     """
     Normalize Arabic text for search:
-    - Unify alif variants  (أ إ آ → ا)
+    - Unify alif variants  (أ إ آ ٱ → ا)
     - Unify alif maqsura   (ى → ي)
     - Unify hamza carriers  (ؤ → و , ئ → ي)
     - ta marbuta → ha       (ة → ه)
-    - Remove harakat / tashkeel (fatha, damma, kasra, shadda, sukun …)
-    """
-    # Alif variants
-    text = re.sub('[إأآٱ]', 'ا', text)
+    - Remove harakat / tashkeel (fatha, damma, kasra, shadda, sukun …) and tatweel
 
-    # Alif maqsura → ya
-    text = re.sub('ى', 'ي', text)
+    Arabic-only text needs no table: one regex deletion plus C-level
+    replace() of the letters present is faster than a per-character
+    translate() here.
+    """
+    text = _ARABIC_MARKS_RE.sub('', text)
+    for letter, replacement in _ARABIC_LETTERS.items():
+        if letter in text:
+            text = text.replace(letter, replacement)
+    return text
 
-    # Hamza carriers
-    text = re.sub('ؤ', 'و', text)
-    text = re.sub('ئ', 'ي', text)
 
-    # Ta marbuta → ha
-    text = re.sub('ة', 'ه', text)
+def _normalize_text(text: str) -> str:
+    text = ' '.join(text.lower().translate(_TEXT_TABLE).split())
+    # Tatweel is removed after the whitespace collapse, as in
+    # normalize_arabic(normalize_french(text))
+    if _TATWEEL in text:
+        text = text.replace(_TATWEEL, '')
+    return text
 
-    # Remove harakat (U+064B – U+065F) and tatweel (U+0640)
-    text = re.sub(r'[\u064B-\u065F\u0640]', '', text)
 
-    return text
+_normalize_short_text = lru_cache(maxsize=4096)(_normalize_text)
 
 
 def normalize_text(text: str) -> str:
     """
     Full normalization pipeline for mixed FR/AR text.
 
-    Applies both French and Arabic normalization, making the text
-    suitable for embedding or keyword search.
+    Same result as normalize_arabic(normalize_french(text)), making the
+    text suitable for embedding or keyword search. Short texts (queries)
+    are memoized.
     """
-    text = normalize_french(text)
-    text = normalize_arabic(text)
-    return text
+    if len(text) <= SHORT_TEXT_LENGTH:
+        return _normalize_short_text(text)
+    return _normalize_text(text)
+
+
+_BATCH_NORMALIZERS = {
+    'french': normalize_french,
+    'arabic': normalize_arabic,
+    'text': _normalize_text,
+}
+# Never produced by the normalizers nor found in the corpus
+_BATCH_SEPARATOR = '\x00'
+
+
+def normalize_batch(texts, kind: str = 'text') -> list:
+    """
+    Normalize many texts at once (indexers): `kind` is 'french', 'arabic'
+    or 'text'. The texts are joined so that lower() and translate() run
+    once over the batch; texts containing the separator fall back to the
+    one-by-one path.
+    """
+    normalizer = _BATCH_NORMALIZERS[kind]
+    texts = list(texts)
+    joined = _BATCH_SEPARATOR.join(texts)
+    if joined.count(_BATCH_SEPARATOR) != max(0, len(texts) - 1):
+        return [normalizer(text) for text in texts]
+
+    if kind == 'arabic':
+        return normalize_arabic(joined).split(_BATCH_SEPARATOR) if texts else []
+
+    table = _FRENCH_TABLE if kind == 'french' else _TEXT_TABLE
+    parts = joined.lower().translate(table).split(_BATCH_SEPARATOR) if texts else []
+    results = [' '.join(part.split()) for part in parts]
+    if kind == 'text':
+        results = [r.replace(_TATWEEL, '') if _TATWEEL in r else r for r in results]
+    return results
+
+
+# Left in place by normalize_arabic(): dagger alif (U+0670), Quranic
+# annotation signs (U+06D6 – U+06ED) and the byte order mark
+_ARABIC_SIGNS_RE = re.compile('[\u0670\u06D6-\u06ED\uFEFF]')
+_ARABIC_WORD_RE = re.compile('[\u0621-\u064A]+')
+
+
+def arabic_tokens(text: str) -> list:
+    """
+    Words of an Arabic text already passed through normalize_arabic():
+    runs of Arabic letters, with the remaining signs dropped (الرحمٰن and
+    الرحمن are the same word). Used by the concordance index.
+    """
+    return _ARABIC_WORD_RE.findall(_ARABIC_SIGNS_RE.sub('', text))
+
+
+_SENTENCE_BREAK_RE = re.compile(r'(?<=[.!?;:؟۔])\s+')
+
+
+def sentence_spans(text: str) -> list:
+    """
+    Split text into sentences (FR or AR punctuation).
+
+    Returns (start, end) character offsets into `text`, so callers can
+    point back to the original passage.
+    """
+    spans = []
+    start = 0
+    for match in _SENTENCE_BREAK_RE.finditer(text):
+        if match.start() > start:
+            spans.append((start, match.start()))
+        start = match.end()
+    if start < len(text.rstrip()):
+        spans.append((start, len(text.rstrip())))
+    return spans
+
+
+def chunk_spans(text: str, window: int = 3, overlap: int = 1) -> list:
+    """
+    Group sentences into overlapping chunks of `window` sentences.
+
+    Returns (start, end) character offsets; a text with `window` sentences
+    or fewer yields a single chunk covering all of it.
+    """
+    sentences = sentence_spans(text)
+    if not sentences:
+        return []
+    if len(sentences) <= window:
+        return [(sentences[0][0], sentences[-1][1])]
+
+    step = max(1, window - overlap)
+    chunks = []
+    for i in range(0, len(sentences), step):
+        group = sentences[i:i + window]
+        chunks.append((group[0][0], group[-1][1]))
+        if i + window >= len(sentences):
+            break
+    return chunks
@@ -0,0 +1,106 @@
+"""
+Per-request stage timing.
+
+TimingMiddleware (or the streaming view itself) binds a RequestTimer to
+the current request; views and services wrap their phases in
+`stage(name)`. Durations of a stage entered twice add up. A timer is
+exported as a Server-Timing header or as a dict for the NDJSON stream,
+and every stage also feeds the histograms of services/metrics.py —
+outside a request `stage()` only feeds the histograms.
+
+The timer also collects the LLM token usage and the caches that served
+the request, which end up in the request ledger (services/ledger.py).
+"""
+
+import contextvars
+import time
+import uuid
+from contextlib import contextmanager
+
+from .metrics import get_metrics
+
+_current = contextvars.ContextVar('request_timer', default=None)
+
+
+class RequestTimer:
+    def __init__(self, endpoint: str = None):
+        self.endpoint = endpoint    # label of the request histogram, None = not observed
+        self.started = time.perf_counter()
+        self.stages = {}            # stage → milliseconds, in first-seen order
+        self.request_id = uuid.uuid4().hex
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hits = []
+
+    def record(self, name: str, ms: float):
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self) -> dict:
+        data = {name: round(ms, 1) for name, ms in self.stages.items()}
+        data['total'] = round(self.total_ms(), 1)
+        return data
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.as_dict().items())
+
+
+def current_timer():
+    return _current.get()
+
+
+def record(name: str, ms: float):
+    """Record a duration measured by the caller (e.g. time to first token)."""
+    timer = _current.get()
+    if timer is not None:
+        timer.record(name, ms)
+    get_metrics().observe('stage', name, ms / 1000)
+
+
+def add_usage(prompt_tokens: int, completion_tokens: int):
+    """Add the token usage reported by an LLM call to the current request."""
+    timer = _current.get()
+    if timer is not None:
+        timer.prompt_tokens += prompt_tokens or 0
+        timer.completion_tokens += completion_tokens or 0
+
+
+def cache_hit(name: str):
+    timer = _current.get()
+    if timer is not None and name not in timer.cache_hits:
+        timer.cache_hits.append(name)
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - started) * 1000)
+
+
+@contextmanager
+def request_timer(endpoint: str = None, timer: RequestTimer = None):
+    """
+    Bind `timer` (a new RequestTimer by default) to the current context for
+    the whole block; the block may set `timer.endpoint` once it is known.
+    A streaming view passes the timer of its request so that its generator
+    keeps timing the same request.
+    """
+    timer = timer if timer is not None else RequestTimer()
+    if endpoint:
+        timer.endpoint = endpoint
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # A streaming generator closed from another context
+            _current.set(None)
+        if timer.endpoint:
+            get_metrics().observe('request', timer.endpoint, timer.total_ms() / 1000)
@@ -1,45 +1,156 @@
-import faiss
 import numpy as np
 import json
-from sentence_transformers import SentenceTransformer
 from django.conf import settings
 from .text_utils import normalize_text
+from . import timing
+from .verse_index import VersePositions, merge_windows
+from . import collection_registry, index_store, query_cache
+from .suggest import SuggestIndex
+import gc
+import heapq
 import os
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
 logger = logging.getLogger(__name__)
 
-class VectorService:
-    def __init__(self):
-        self.model = SentenceTransformer(settings.MODEL_NAME)
-        
-        self.quran_index, self.quran_metadata = self._init_index(
-            settings.FAISS_INDEX_PATH, 
-            settings.QURAN_INDEX_PATH, 
-            "Coran"
-        )
-        
-        self.hadith_index, self.hadith_metadata = self._init_index(
-            getattr(settings, 'HADITH_FAISS_INDEX_PATH', settings.BASE_DIR / 'hadith_faiss.index'), 
-            getattr(settings, 'HADITH_INDEX_PATH', settings.BASE_DIR / 'hadith_indexed.json'), 
-            "Hadith"
-        )
+class Shard:
+    """
+    One collection of an IndexSet (services/collection_registry.py): its FAISS
+    index, its metadata and, for hadiths, optional sentence-level chunks.
+
+    Loaded in its own thread; `ready` is set once it is searchable or
+    known to be unavailable (files missing, load error in `error`).
+    """
+
+    # Chunks searched per requested hadith, since several chunks of the same
+    # hadith usually rank next to each other
+    CHUNK_OVERSAMPLE = 4
+
+    def __init__(self, collection, paths: dict):
+        self.name = collection.name
+        self.source = collection.source
+        self.source_type = collection.source_type
+        self.collection = collection
+        self.paths = paths
+        self.index = None
+        self.metadata = []
+        self.chunk_index = self.chunk_parents = self.chunk_spans = None
+        # Parent vectors of the hadiths without chunks, and their rows
+        self.unchunked_index = self.unchunked_rows = None
+        self.verse_positions = None
+        self.error = None
+        self.ready = threading.Event()
+
+    def load(self):
+        artifacts = self.collection.artifacts
+        started = time.perf_counter()
+        try:
+            self.index, self.metadata = self._init_index(
+                self.paths[artifacts['faiss']], self.paths[artifacts['data']]
+            )
+            # Optional sentence-level chunks of the hadiths (index_hadith.py --chunks)
+            if 'chunks' in artifacts:
+                self.chunk_index, self.chunk_parents, self.chunk_spans = self._init_chunks(
+                    self.paths[artifacts['chunks']], self.paths[artifacts['chunks_faiss']],
+                )
+                if self.chunk_index is not None:
+                    self.unchunked_index, self.unchunked_rows = self._init_unchunked()
+            # Positional index over the contiguous verses, for ±N ayat / ruku expansion
+            if self.source == 'quran' and self.metadata:
+                self.verse_positions = VersePositions(self.metadata, self.paths['quran_ruku'])
+            if self.index is not None:
+                logger.info(f"Shard {self.name} loaded in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            self.error = str(e)
+            logger.exception(f"Shard {self.name} failed to load: {e}")
+        finally:
+            self.ready.set()
+
+    @property
+    def searchable(self) -> bool:
+        return self.ready.is_set() and self.index is not None and len(self.metadata) > 0
+
+    def describe(self):
+        if not self.ready.is_set():
+            return {'source': self.source, 'state': 'loading'}
+        if self.error is not None:
+            return {'source': self.source, 'state': 'error', 'error': self.error}
+        if self.index is None:
+            return {'source': self.source, 'state': 'missing'}
+        return {
+            'source': self.source,
+            'state': 'ready',
+            'documents': len(self.metadata),
+            'vectors': int(self.index.ntotal),
+            'dimension': int(self.index.d),
+            'chunks': None if self.chunk_index is None else int(self.chunk_index.ntotal),
+            'unchunked': None if self.unchunked_rows is None else len(self.unchunked_rows),
+        }
+
+    def _init_chunks(self, chunks_path, index_path):
+        if not os.path.exists(chunks_path) or not self.metadata:
+            return None, None, None
 
-    def _init_index(self, index_path, data_path, source_tag):
+        import faiss
+
+        chunks = np.load(chunks_path)
+        parents = chunks['parents'].astype('int32')
+        spans = chunks['spans'].astype('int32')
+
+        if os.path.exists(index_path):
+            logger.info(f"Loading {self.name} chunk FAISS index from {index_path}...")
+            index = faiss.read_index(str(index_path))
+        else:
+            logger.info(f"Rebuilding {self.name} chunk FAISS index from {chunks_path}...")
+            embeddings = np.ascontiguousarray(chunks['embeddings'], dtype='float32')
+            index = faiss.IndexFlatL2(embeddings.shape[1])
+            index.add(embeddings)
+            faiss.write_index(index, str(index_path))
+
+        logger.info(f"{self.name} chunks: {len(parents)} chunks for {len(self.metadata)} hadiths")
+        return index, parents, spans
+
+    def _init_unchunked(self):
+        """
+        Flat index of the parent vectors of the hadiths that have no chunk
+        (no French text to split), searched next to the chunk index so
+        that they stay reachable.
+        """
+        chunked = np.zeros(len(self.metadata), dtype=bool)
+        chunked[self.chunk_parents[self.chunk_parents < len(self.metadata)]] = True
+        rows = np.flatnonzero(~chunked).astype('int64')
+        if len(rows) == 0:
+            return None, None
+
+        import faiss
+
+        vectors = np.vstack([self.index.reconstruct(int(row)) for row in rows]).astype('float32')
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+        logger.info(f"{self.name}: {len(rows)} hadiths without chunks searched by their full vector")
+        return index, rows
+
+    def _init_index(self, index_path, data_path):
         if not os.path.exists(data_path):
-            logger.warning(f"Data not found for {source_tag} at {data_path}")
+            logger.warning(f"Data not found for {self.name} at {data_path}")
             return None, []
-        
+
+        import faiss
+
         index = None
         metadata = []
         
         if os.path.exists(index_path):
-            logger.info(f"Loading {source_tag} FAISS index from {index_path}...")
+            logger.info(f"Loading {self.name} FAISS index from {index_path}...")
             index = faiss.read_index(str(index_path))
             with open(data_path, 'r', encoding='utf-8') as f:
                 metadata = json.load(f)
         else:
-            logger.info(f"Rebuilding {source_tag} FAISS index from {data_path}...")
+            logger.info(f"Rebuilding {self.name} FAISS index from {data_path}...")
             with open(data_path, 'r', encoding='utf-8') as f:
                 metadata = json.load(f)
             
@@ -50,58 +161,470 @@ class VectorService:
                 index.add(embeddings)
                 
                 faiss.write_index(index, str(index_path))
-                logger.info(f"{source_tag} FAISS index built and saved to {index_path}")
+                logger.info(f"{self.name} FAISS index built and saved to {index_path}")
             else:
-                logger.warning(f"Metadata is empty for {source_tag}, cannot build index.")
+                logger.warning(f"Metadata is empty for {self.name}, cannot build index.")
 
         # Ensure we add the source_type to easily distinguish in the frontend/LLM
         for item in metadata:
-            item['source_type'] = source_tag
+            item['source_type'] = self.source_type
+            item['collection'] = self.name
             
         return index, metadata
 
-    def search(self, query: str, top_k: int = 10, source_filter: str = 'both'):
-        normalized_query = normalize_text(query)
+    def search(self, query_vector, top_k):
+        """Hits as (item, stored vector, row), best (lowest L2 distance) first."""
+        if self.chunk_index is not None:
+            return self._search_chunks(query_vector, top_k)
+
+        hits = []
+        distances, indices = self.index.search(query_vector, top_k)
+        for dist, idx in zip(distances[0], indices[0]):
+            if 0 <= idx < len(self.metadata):
+                item = self.metadata[idx].copy()
+                item['score'] = float(dist)
+                if 'embedding' in item: del item['embedding']
+                hits.append((item, self.index.reconstruct(int(idx)), int(idx)))
+        return hits
+
+    def _search_chunks(self, query_vector, top_k):
+        """
+        Search hadith chunks and dedupe back to their parent hadith.
+
+        Each parent keeps its best chunk: the score is the chunk distance and
+        `match_span` gives the [start, end) offsets of the passage in text_fr.
+        Hadiths without chunks are searched by their full vector and merged in.
+        """
+        hits = []
+        seen = set()
+        k = min(top_k * self.CHUNK_OVERSAMPLE, self.chunk_index.ntotal)
+        distances, indices = self.chunk_index.search(query_vector, k)
+        for dist, idx in zip(distances[0], indices[0]):
+            if idx < 0:
+                continue
+            parent = int(self.chunk_parents[idx])
+            if parent in seen or parent >= len(self.metadata):
+                continue
+            seen.add(parent)
+
+            item = self.metadata[parent].copy()
+            item['score'] = float(dist)
+            if 'embedding' in item: del item['embedding']
+            start, end = self.chunk_spans[idx]
+            item['match_span'] = [int(start), int(end)]
+            hits.append((item, self.chunk_index.reconstruct(int(idx)), parent))
+            if len(hits) >= top_k:
+                break
+
+        if self.unchunked_index is None:
+            return hits
+        unchunked = []
+        k = min(top_k, self.unchunked_index.ntotal)
+        distances, indices = self.unchunked_index.search(query_vector, k)
+        for dist, idx in zip(distances[0], indices[0]):
+            if idx < 0:
+                continue
+            row = int(self.unchunked_rows[idx])
+            item = self.metadata[row].copy()
+            item['score'] = float(dist)
+            if 'embedding' in item: del item['embedding']
+            unchunked.append((item, self.unchunked_index.reconstruct(int(idx)), row))
+        return list(islice(heapq.merge(hits, unchunked, key=lambda hit: hit[0]['score']), top_k))
+
+
+# Fan-out pool of the shard searches (FAISS releases the GIL while it
+# searches). Created per process: a pool inherited through fork has no threads
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _search_pool():
+    global _pool, _pool_pid
+    if _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                workers = getattr(settings, 'SEARCH_FANOUT_WORKERS', 4)
+                _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='shard-search')
+                _pool_pid = os.getpid()
+    return _pool
+
+
+class IndexSet:
+    """
+    One loaded version of the indexes: a shard per collection, searched
+    with an already encoded query, plus the lookups built over all of them.
+
+    Shards load in parallel, so a slow collection does not hold back the
+    others: the service serves a set once its Quran shard is ready
+    (`wait_for_quran()`) and a search skips the shards still loading, which
+    join as they finish; `wait()` blocks until all of them are loaded (or
+    failed). Never mutated once loaded: a reload builds a new IndexSet and
+    swaps it in, and a search keeps the set it started with until it returns.
+    """
+
+    def __init__(self, version: str, paths: dict):
+        self.version = version
+        self.paths = paths
+        # Content identity of the set (query caches): the published version,
+        # or the legacy layout plus a fingerprint of its files once loaded
+        self.fingerprint = version
+        self.loaded_at = time.time()
+        self.shards = [Shard(collection, paths) for collection in collection_registry.registry()]
+        self.doc_positions = {}
+        self.suggestions = None
+        self.loaded = threading.Event()
+        threading.Thread(target=self._load, name=f"indexes-{version}", daemon=True).start()
+
+    def _load(self):
+        threads = [
+            threading.Thread(target=self._load_shard, args=(shard,), name=f"shard-{shard.name}", daemon=True)
+            for shard in self.shards
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self.version == index_store.LEGACY_VERSION:
+            # After the load, which may have rebuilt missing FAISS files
+            self.fingerprint = f"{self.version}-{index_store.fingerprint(self.paths)}"
+
+        # Typeahead of /api/suggest/, rebuilt with every version
+        try:
+            self.suggestions = SuggestIndex(
+                self.quran_metadata,
+                [item for shard in self.shards if shard.source == 'hadith' for item in shard.metadata],
+            )
+        except Exception as e:
+            logger.exception(f"Suggestions of version {self.version} failed: {e}")
+        self.loaded_at = time.time()
+        self.loaded.set()
+
+    def _load_shard(self, shard):
+        shard.load()
+        # doc id → (metadata list, row), to hydrate stored source references;
+        # filled shard by shard so that a loaded collection is usable at once
+        for row, item in enumerate(shard.metadata):
+            self.doc_positions[item['id']] = (shard.metadata, row)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until every shard is loaded (or failed); False on timeout."""
+        return self.loaded.wait(timeout)
+
+    def wait_for_quran(self, timeout: float = None) -> bool:
+        """Block until the Quran shards are loaded (or failed); False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for shard in self.shards:
+            if shard.source == 'quran':
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not shard.ready.wait(remaining):
+                    return False
+        return True
+
+    @property
+    def errors(self) -> dict:
+        return {shard.name: shard.error for shard in self.shards if shard.error is not None}
+
+    @property
+    def _quran(self):
+        for shard in self.shards:
+            if shard.source == 'quran' and shard.ready.is_set():
+                return shard
+        return None
+
+    @property
+    def quran_metadata(self) -> list:
+        quran = self._quran
+        return quran.metadata if quran is not None else []
+
+    @property
+    def verse_positions(self):
+        quran = self._quran
+        return quran.verse_positions if quran is not None else None
+
+    def describe(self) -> dict:
+        """Version and state of each shard (reported by /api/health/ready/)."""
+        return {
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'loaded': self.loaded.is_set(),
+            'collections': {shard.name: shard.describe() for shard in self.shards},
+        }
+
+    def search(self, query_vector, top_k: int = 10, source_filter: str = 'both',
+               window: int = 0, ruku: bool = False):
+        """Hits as (item, stored vector, row), best first; see VectorService.search_with_vectors()."""
+        shards = [shard for shard in self.shards if shard.collection.matches(source_filter) and shard.searchable]
+
+        with timing.stage('faiss'):
+            if len(shards) == 1:
+                results = [shards[0].search(query_vector, top_k)]
+            else:
+                # One search per shard in parallel; each returns its hits sorted by distance
+                pool = _search_pool()
+                futures = [pool.submit(shard.search, query_vector, top_k) for shard in shards]
+                results = [future.result() for future in futures]
+
+        # k-way merge of the sorted shard results (L2 distance: lower is closer/better)
+        hits = list(islice(heapq.merge(*results, key=lambda hit: hit[0]['score']), top_k))
+        verse_positions = self.verse_positions
+        if (window > 0 or ruku) and verse_positions is not None and verse_positions.valid:
+            with timing.stage('expand'):
+                hits = self._expand_verses(hits, window, ruku)
+        return hits
+
+    def _expand_verses(self, hits, window, ruku):
+        """
+        Replace each verse hit by its passage (±`window` ayat, or its ruku).
+
+        Hits are (item, vector, row) sorted by score; merged passages take the
+        place, score and vector of their best hit. Hadith hits are unchanged.
+        """
+        windows = []
+        for position, (item, _, row) in enumerate(hits):
+            if item.get('source_type') == 'Coran':
+                start, end = self.verse_positions.window(row, window, ruku)
+                windows.append((item['metadata']['sourate'], start, end, position))
+
+        passages = {}
+        for start, end, positions in merge_windows(windows):
+            best = min(positions)
+            passages[best] = (start, end)
+
+        expanded = []
+        for position, (item, vector, row) in enumerate(hits):
+            if item.get('source_type') != 'Coran':
+                expanded.append((item, vector, row))
+            elif position in passages:
+                start, end = passages[position]
+                expanded.append((self._passage(item, start, end), vector, row))
+        return expanded
+
+    def hydrate(self, ref: dict):
+        """
+        Rebuild a full source dict from a compact reference
+        (see services/source_refs.py), or None if the document is unknown.
+        """
+        position = self.doc_positions.get(ref.get('id'))
+        if position is None:
+            return None
+
+        metadata, row = position
+        item = metadata[row].copy()
+        item.pop('embedding', None)
+        if 'score' in ref:
+            item['score'] = ref['score']
+        if 'match_span' in ref:
+            item['match_span'] = ref['match_span']
+        if 'ayah_end' in ref and self.verse_positions is not None and self.verse_positions.valid:
+            sourate = item['metadata']['sourate']
+            start = self.verse_positions.row(sourate, ref['ayah_start'])
+            end = self.verse_positions.row(sourate, ref['ayah_end']) + 1
+            item = self._passage(item, start, end)
+        return item
+
+    def _passage(self, hit, start, end):
+        if end - start <= 1:
+            return hit
+
+        verses = self.quran_metadata[start:end]
+        first, last = verses[0]['metadata'], verses[-1]['metadata']
+        passage = hit.copy()
+        passage['reference'] = (
+            f"Sourate {first['sourate']} ({first['sourate_name']}), "
+            f"Versets {first['ayah']}-{last['ayah']}"
+        )
+        passage['text_ar'] = " ".join(f"{v['text_ar']} ﴿{v['metadata']['ayah']}﴾" for v in verses)
+        passage['text_fr'] = " ".join(f"({v['metadata']['ayah']}) {v['text_fr']}" for v in verses)
+        passage['normalized_ar'] = " ".join(v.get('normalized_ar', '') for v in verses)
+        passage['normalized_fr'] = " ".join(v.get('normalized_fr', '') for v in verses)
+        passage['metadata'] = {**hit['metadata'], 'ayah_start': first['ayah'], 'ayah_end': last['ayah']}
+        return passage
+
+class VectorService:
+    """
+    The encoder plus the current IndexSet.
+
+    get_vector_service() returns it once the Quran shard of its first
+    IndexSet is loaded, the other collections joining as they finish;
+    later sets are swapped atomically by reload() once complete: a search reads
+    `self.indexes` once, so in-flight searches finish on the version they
+    started with, and the old version is freed when the last one returns.
+    """
+
+    def __init__(self, model=None):
+        # settings.MODEL_NAME unless an encoder with the same encode() API is injected
+        if model is None:
+            # Imported here: torch + sentence_transformers take seconds and
+            # hundreds of MB, which manage.py commands must not pay
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(settings.MODEL_NAME)
+        self.model = model
+        self._reload_lock = threading.Lock()
+        # One check at a time (watcher thread, admin reload thread)
+        self._check_lock = threading.Lock()
+        self._watcher = None
+        self.reload_error = None
+        # (manifest signature, reload generation) of the loaded version
+        self._seen = (index_store.manifest_signature(), index_store.reload_generation())
+        self.indexes = IndexSet(*index_store.resolve())
+
+    @property
+    def index_versions(self) -> dict:
+        return self.indexes.describe()
+
+    def search(self, query: str, top_k: int = 10, source_filter: str = 'both',
+               window: int = 0, ruku: bool = False):
+        results, _, _ = self.search_with_vectors(query, top_k, source_filter, window, ruku)
+        return results
+
+    def search_with_vectors(self, query: str, top_k: int = 10, source_filter: str = 'both',
+                            window: int = 0, ruku: bool = False):
+        """
+        Same as search(), but also returns the stored vectors of the hits
+        (float32 array aligned with the results) and the query vector.
+
+        Used by the prompt builder to deduplicate / diversify contexts
+        without re-encoding them.
+
+        With `window` > 0 (or `ruku`), each verse hit is expanded to its
+        neighbouring ayat; overlapping passages are merged into one result.
+        """
+        indexes = self.indexes
+
+        with timing.stage('normalize'):
+            normalized_query = normalize_text(query)
         logger.debug(f"Original query: '{query}' → Normalized: '{normalized_query}' → Filter: {source_filter}")
 
-        # E5 requires 'query: ' prefix for searching
-        query_vector = self.model.encode([f"query: {normalized_query}"]).astype('float32')
-        
-        results = []
-        
-        # Search Quran
-        if source_filter in ['both', 'quran']:
-            if self.quran_index is not None and len(self.quran_metadata) > 0:
-                distances, indices = self.quran_index.search(query_vector, top_k)
-                for dist, idx in zip(distances[0], indices[0]):
-                    if idx < len(self.quran_metadata):
-                        item = self.quran_metadata[idx].copy()
-                        item['score'] = float(dist)
-                        if 'embedding' in item: del item['embedding']
-                        results.append(item)
-                    
-        # Search Hadith
-        if source_filter in ['both', 'hadith']:
-            if self.hadith_index is not None and len(self.hadith_metadata) > 0:
-                distances, indices = self.hadith_index.search(query_vector, top_k)
-                for dist, idx in zip(distances[0], indices[0]):
-                    if idx < len(self.hadith_metadata):
-                        item = self.hadith_metadata[idx].copy()
-                        item['score'] = float(dist)
-                        if 'embedding' in item: del item['embedding']
-                        results.append(item)
-        
-        # Sort combined results by distance (L2 distance: lower is closer/better)
-        results.sort(key=lambda x: x['score'])
-        
-        # Return top_k overall
-        return results[:top_k]
+        # Retrieval cache: hits of the same search on this index version
+        with timing.stage('cache'):
+            hits = query_cache.get_retrieval(indexes, normalized_query, top_k, source_filter, window, ruku)
+
+        query_vector = query_cache.get_embedding(normalized_query)
+        if query_vector is None:
+            # E5 requires 'query: ' prefix for searching
+            with timing.stage('encode'):
+                query_vector = self.model.encode([f"query: {normalized_query}"]).astype('float32')[0]
+            query_cache.set_embedding(normalized_query, query_vector)
+        query_vector = query_vector[None, :]
+
+        if hits is None:
+            hits = indexes.search(query_vector, top_k, source_filter, window, ruku)
+            query_cache.set_retrieval(indexes, normalized_query, top_k, source_filter, window, ruku, hits)
+        results = [item for item, _, _ in hits]
+        if hits:
+            vectors = np.stack([vector for _, vector, _ in hits])
+        else:
+            vectors = np.zeros((0, query_vector.shape[1]), dtype='float32')
+        return results, vectors, query_vector[0]
+
+    def hydrate(self, ref: dict):
+        return self.indexes.hydrate(ref)
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Load the current manifest version next to the serving one and swap
+        it in. Returns True when a new IndexSet was swapped in; on failure
+        the serving version is kept and the error is kept in `reload_error`.
+        """
+        with self._reload_lock:
+            try:
+                version, paths = index_store.resolve()
+                if version == self.indexes.version and not force:
+                    # The serving version is the current one: nothing left to retry
+                    self.reload_error = None
+                    return False
+                started = time.perf_counter()
+                indexes = IndexSet(version, paths)
+                # The serving set answers meanwhile: the new one is swapped
+                # in complete, unless a collection it serves failed to load
+                indexes.wait()
+                serving = {shard.name for shard in self.indexes.shards if shard.searchable}
+                errors = {name: error for name, error in indexes.errors.items() if name in serving}
+                if errors:
+                    raise ValueError(f"Collections non chargées : {errors}")
+            except Exception as e:
+                self.reload_error = str(e)
+                logger.exception(f"Index reload failed, keeping version {self.indexes.version}: {e}")
+                return False
+
+            previous, self.indexes = self.indexes, indexes
+            self.reload_error = None
+            logger.info(
+                f"Indexes {previous.version} → {version} swapped in "
+                f"{time.perf_counter() - started:.1f}s (pid {os.getpid()})"
+            )
+
+        # Searches still holding the previous set keep it alive until they return
+        del previous
+        gc.collect()
+        return True
+
+    def start_watching(self, interval: float = None):
+        """
+        Poll the manifest (and the admin reload signal) every `interval`
+        seconds in a daemon thread of this process; reload on change.
+        Must run in the process that serves requests, i.e. after fork.
+        """
+        if interval is None:
+            interval = getattr(settings, 'INDEX_WATCH_INTERVAL', 30)
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name='index-watcher', daemon=True
+        )
+        self._watcher.start()
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.check_for_update()
+            except Exception as e:
+                logger.exception(f"Index watcher error: {e}")
+
+    def check_for_update(self) -> bool:
+        """
+        Reload if the manifest changed (new current version) or if an admin
+        asked for a reload (index_store.request_reload()) since last
+        successful check. A failed reload (e.g. a version still being
+        copied) is retried at the next check.
+        """
+        if not self._check_lock.acquire(blocking=False):
+            return False
+        try:
+            seen = (index_store.manifest_signature(), index_store.reload_generation())
+            previous = self._seen
+            if seen == previous:
+                return False
+            reloaded = self.reload(force=seen[1] != previous[1])
+            if self.reload_error is None:
+                # Reloaded, or nothing to swap (same version): this state is handled
+                self._seen = seen
+            return reloaded
+        finally:
+            self._check_lock.release()
+
 
 # Singleton instance
 _vector_service = None
+_vector_service_lock = threading.Lock()
 
 def get_vector_service():
     global _vector_service
     if _vector_service is None:
-        _vector_service = VectorService()
+        # Loading takes seconds: a warm-up thread and a request must not both build it
+        with _vector_service_lock:
+            if _vector_service is None:
+                service = VectorService()
+                # Published once the Quran is searchable: a hadith collection
+                # still loading (or missing) is skipped by the searches until ready
+                service.indexes.wait_for_quran()
+                _vector_service = service
     return _vector_service
+
+
+def is_vector_service_loaded() -> bool:
+    return _vector_service is not None
@@ -0,0 +1,84 @@
+"""
+Positional index over the Quran metadata.
+
+Verses are stored contiguously (sourate by sourate, ayah by ayah), so a
+verse is addressed by `offsets[sourate] + ayah - 1` and a window of
+neighbouring ayat is a row slice. Used to expand search hits into
+passages without extra searches.
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class VersePositions:
+    def __init__(self, metadata: list, ruku_path=None):
+        # `metadata` must not be empty (VectorService only builds this for a loaded Quran)
+        sourates = np.array([item['metadata']['sourate'] for item in metadata], dtype='int32')
+        ayat = np.array([item['metadata']['ayah'] for item in metadata], dtype='int32')
+
+        # offsets[s] = first row of sourate s, offsets[s + 1] = end of sourate s
+        counts = np.bincount(sourates, minlength=int(sourates.max()) + 1)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype('int32')
+
+        self.valid = bool(np.all(ayat == np.arange(len(ayat)) - self.offsets[sourates] + 1))
+        if not self.valid:
+            logger.warning("Quran metadata is not contiguous by sourate/ayah, verse expansion disabled")
+
+        self.sourates = sourates
+        self.ruku_rows = self._load_ruku(ruku_path) if self.valid else None
+
+    def _load_ruku(self, ruku_path):
+        """
+        Ruku boundaries come from an optional JSON file of [sourate, ayah]
+        starts (e.g. Tanzil metadata); without it ruku expansion falls back
+        to the ±N window.
+        """
+        if not ruku_path or not os.path.exists(ruku_path):
+            return None
+        with open(ruku_path, 'r', encoding='utf-8') as f:
+            starts = json.load(f)
+        rows = sorted(self.row(sourate, ayah) for sourate, ayah in starts)
+        logger.info(f"Loaded {len(rows)} ruku boundaries from {ruku_path}")
+        return np.array(rows, dtype='int32')
+
+    def row(self, sourate: int, ayah: int) -> int:
+        return int(self.offsets[sourate] + ayah - 1)
+
+    def sourate_bounds(self, row: int):
+        sourate = int(self.sourates[row])
+        return int(self.offsets[sourate]), int(self.offsets[sourate + 1])
+
+    def window(self, row: int, size: int = 0, ruku: bool = False):
+        """[start, end) rows of the passage around `row`, never crossing a sourate."""
+        low, high = self.sourate_bounds(row)
+        if ruku and self.ruku_rows is not None:
+            i = int(np.searchsorted(self.ruku_rows, row, side='right')) - 1
+            start = int(self.ruku_rows[i]) if i >= 0 else low
+            end = int(self.ruku_rows[i + 1]) if i + 1 < len(self.ruku_rows) else high
+            return max(start, low), min(end, high)
+        return max(row - size, low), min(row + size + 1, high)
+
+
+def merge_windows(windows: list) -> list:
+    """
+    Merge overlapping or adjacent [start, end) windows of the same sourate.
+
+    `windows` is a list of (sourate, start, end, hit_position); returns
+    (start, end, [hit_positions]) sorted by start.
+    """
+    merged = []
+    last_sourate = None
+    for sourate, start, end, position in sorted(windows):
+        if merged and sourate == last_sourate and start <= merged[-1][1]:
+            last = merged[-1]
+            merged[-1] = (last[0], max(last[1], end), last[2] + [position])
+        else:
+            merged.append((start, end, [position]))
+        last_sourate = sourate
+    return merged
@@ -0,0 +1,129 @@
+"""
+Model and index warm-up, and the readiness state behind /api/health/ready/.
+
+With GUNICORN_PRELOAD=1, gunicorn.conf.py calls `preload()` in the master
+before it forks: the model, the FAISS indexes and the metadata are loaded
+once and the workers share those pages copy-on-write. Each worker then
+calls `warm_up()` to run one real search (and, with PREWARM_QUERIES,
+fill the query caches) before it accepts requests.
+Without preload, a worker warms up in a background thread and reports
+not ready until it is done. A warmed-up worker then watches the index
+manifest for new versions (VectorService.start_watching()).
+"""
+
+import gc
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from . import query_cache
+from .vector_service import get_vector_service, is_vector_service_loaded
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_QUERY = "patience"
+
+_state = {
+    'preloaded': False,
+    'warmed_up_at': None,
+    'error': None,
+    'torch_threads': None,
+}
+_lock = threading.Lock()
+_thread = None
+
+
+def _set_torch_threads(count):
+    """Set the torch intra-op thread count; returns the previous one (None without torch)."""
+    try:
+        import torch
+    except ImportError:
+        return None
+    previous = torch.get_num_threads()
+    torch.set_num_threads(count)
+    return previous
+
+
+def preload():
+    """
+    Load the vector service in the Gunicorn master, before fork.
+
+    Only the encoder is exercised here: torch is limited to one thread and
+    FAISS is not searched so that no OpenMP thread pool exists when the
+    master forks. gc.freeze() keeps the loaded objects out of the
+    collector so that collections in the workers do not dirty their pages.
+    """
+    started = time.perf_counter()
+    _state['torch_threads'] = _set_torch_threads(1)
+    service = get_vector_service()
+    # No loading thread may run when the master forks: wait for every shard
+    service.indexes.wait()
+    service.model.encode([f"query: {WARM_UP_QUERY}"], normalize_embeddings=True)
+    gc.freeze()
+    _state['preloaded'] = True
+    logger.info(f"Vector service preloaded in {time.perf_counter() - started:.1f}s (pid {os.getpid()})")
+
+
+def warm_up():
+    """Run one search in this process so that the first request is not the slow one."""
+    started = time.perf_counter()
+    try:
+        if _state['torch_threads']:
+            _set_torch_threads(_state['torch_threads'])
+        service = get_vector_service()
+        service.search(WARM_UP_QUERY, top_k=1)
+        _prewarm_caches()
+        # Hot reload of published index versions (services/index_store.py)
+        service.start_watching()
+    except Exception as e:
+        _state['error'] = str(e)
+        logger.error(f"Warm-up failed (pid {os.getpid()}): {e}")
+        return False
+    _state['error'] = None
+    _state['warmed_up_at'] = time.time()
+    logger.info(f"Worker {os.getpid()} warmed up in {(time.perf_counter() - started) * 1000:.0f}ms")
+    return True
+
+
+def _prewarm_caches():
+    """Fill the query caches with the most frequent past questions (QUERY_CACHE['prewarm_queries'])."""
+    count = query_cache.config('prewarm_queries')
+    if count <= 0:
+        return
+    try:
+        questions = [question for question, _ in query_cache.popular_queries(count, query_cache.config('prewarm_days'))]
+        query_cache.prewarm(questions)
+    except Exception as e:
+        # Cold caches are slower, not broken: the worker still becomes ready
+        logger.warning(f"Query cache pre-warm failed (pid {os.getpid()}): {e}")
+
+
+def start_background_warm_up():
+    """Warm up in a daemon thread, at most once per process."""
+    global _thread
+    with _lock:
+        if _thread is not None and (_thread.is_alive() or _state['warmed_up_at']):
+            return
+        _thread = threading.Thread(target=warm_up, name='warm-up', daemon=True)
+        _thread.start()
+
+
+def readiness() -> dict:
+    ready = _state['warmed_up_at'] is not None and is_vector_service_loaded()
+    data = {
+        'ready': ready,
+        'pid': os.getpid(),
+        'preloaded': _state['preloaded'],
+        'warmed_up_at': _state['warmed_up_at'],
+        'error': _state['error'],
+        'model': settings.MODEL_NAME,
+        'indexes': None,
+    }
+    if is_vector_service_loaded():
+        service = get_vector_service()
+        data['indexes'] = service.index_versions
+        data['reload_error'] = service.reload_error
+    return data
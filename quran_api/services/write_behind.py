@@ -0,0 +1,153 @@
+"""
+Write-behind persistence for rows that do not need to be visible
+immediately (chat history, request ledger).
+
+Views `put()` unsaved model instances into a bounded in-process queue and
+return; a daemon thread writes them with bulk_create() when `batch_size`
+rows are waiting or `flush_interval` seconds after the first one. When the
+queue is full the row is dropped and counted rather than blocking the
+request. `after_write(batch)` lets the owner update denormalized data once
+rows are stored. `drain()` runs at interpreter exit (Gunicorn worker
+shutdown).
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    def __init__(self, model, max_size: int = 1000, batch_size: int = 50, flush_interval: float = 2.0,
+                 after_write=None):
+        self.model = model
+        self.after_write = after_write
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_size)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+        atexit.register(self.drain)
+
+    def put(self, instance) -> bool:
+        """Queue an unsaved instance; returns False if it was dropped."""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(instance)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logger.warning(f"{self.model.__name__} write-behind queue full, row dropped ({self.dropped} total)")
+            return False
+
+    def stats(self) -> dict:
+        return {
+            'depth': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+        }
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"write-behind-{self.model.__name__}", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+
+    def _collect(self) -> list:
+        """Block for the first row, then gather until the size or time trigger."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list):
+        close_old_connections()
+        try:
+            self.model.objects.bulk_create(batch, batch_size=self.batch_size)
+            with self._lock:
+                self.written += len(batch)
+        except Exception as e:
+            with self._lock:
+                self.dropped += len(batch)
+            logger.exception(f"{self.model.__name__} bulk_create of {len(batch)} rows failed: {e}")
+            return
+
+        if self.after_write is not None:
+            try:
+                self.after_write(batch)
+            except Exception as e:
+                logger.exception(f"{self.model.__name__} after_write hook failed: {e}")
+
+    def drain(self, timeout: float = 10.0):
+        """Stop the flusher and write everything still queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+
+# Singleton instance
+_history_queue = None
+
+def get_history_queue():
+    global _history_queue
+    if _history_queue is None:
+        from ..models import ChatHistory, Conversation
+
+        options = getattr(settings, 'HISTORY_WRITE_BEHIND', {})
+        _history_queue = WriteBehindQueue(ChatHistory, after_write=Conversation.record_messages, **options)
+    return _history_queue
+
+
+_ledger_queue = None
+
+def get_ledger_queue():
+    global _ledger_queue
+    if _ledger_queue is None:
+        from ..models import RequestLedger
+
+        options = getattr(settings, 'LEDGER_WRITE_BEHIND', {})
+        _ledger_queue = WriteBehindQueue(RequestLedger, **options)
+    return _ledger_queue
@@ -1,3 +1,1763 @@
-from django.test import TestCase
+import atexit
+import contextlib
+import http.server
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from email.utils import formatdate
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+import fetch_hadith
+from benchmarks import normalization
+from index_concordance import build_concordance
+from index_related import create_related_index
+
+from . import views
+from .authentication import CachedTokenAuthentication
+from .models import ChatHistory, Conversation, RequestLedger, SubscriptionPlan, UserProfile
+from .services import (
+    admission, index_store, ledger, llm_service, memory_report, query_cache, text_utils, timing, vector_service,
+    warmup,
+)
+from .services.collection_registry import Collection
+from .services.concordance_service import ConcordanceService
+from .services.llm_backends import FakeBackend, LLMBackendError
+from .services.metrics import Metrics
+from .services.related_service import RelatedService
+from .services.prompt_builder import estimate_tokens, format_context, pack_contexts
+from .services.quota_service import QuotaService
+from .services.suggest import SuggestIndex
+from .services.text_utils import chunk_spans, normalize_arabic
+from .services.vector_service import IndexSet, Shard, VectorService
+from .services.write_behind import WriteBehindQueue
+from .services.verse_index import VersePositions, merge_windows
+
+
+class TakeTokenTests(SimpleTestCase):
+    # Start of a bucket epoch: the allowance is exactly `burst`
+    NOW = 1000 * 3600.0
+
+    def setUp(self):
+        cache.clear()
+
+    def test_burst_then_refused_with_wait(self):
+        results = [admission.take_token('c', rate=1, burst=3, now=self.NOW) for _ in range(4)]
+        self.assertEqual([allowed for allowed, _ in results], [True, True, True, False])
+        self.assertAlmostEqual(results[-1][1], 1.0)
+
+    def test_refills_at_rate(self):
+        for _ in range(3):
+            admission.take_token('c', rate=2, burst=3, now=self.NOW)
+        self.assertFalse(admission.take_token('c', rate=2, burst=3, now=self.NOW)[0])
+        # 2 tokens per second: one second later, two more requests pass
+        later = self.NOW + 1
+        self.assertTrue(admission.take_token('c', rate=2, burst=3, now=later)[0])
+        self.assertTrue(admission.take_token('c', rate=2, burst=3, now=later)[0])
+        self.assertFalse(admission.take_token('c', rate=2, burst=3, now=later)[0])
+
+    def test_idle_credit_capped_at_burst(self):
+        admission.take_token('c', rate=1, burst=3, now=self.NOW)
+        later = self.NOW + 100
+        allowed = [admission.take_token('c', rate=1, burst=3, now=later)[0] for _ in range(5)]
+        self.assertEqual(allowed, [True, True, True, False, False])
+
+    def test_clients_have_separate_buckets(self):
+        admission.take_token('a', rate=1, burst=1, now=self.NOW)
+        self.assertFalse(admission.take_token('a', rate=1, burst=1, now=self.NOW)[0])
+        self.assertTrue(admission.take_token('b', rate=1, burst=1, now=self.NOW)[0])
+
+    def test_epoch_change_does_not_refill_the_bucket(self):
+        end = self.NOW + 3600 - 0.5
+        self.assertEqual([admission.take_token('c', rate=1, burst=3, now=end)[0] for _ in range(4)],
+                         [True, True, True, False])
+        # One second later, in the next epoch: one token refilled, not a new burst
+        later = self.NOW + 3600 + 0.5
+        self.assertEqual([admission.take_token('c', rate=1, burst=3, now=later)[0] for _ in range(3)],
+                         [True, False, False])
+
+    def test_idle_client_starts_the_next_epoch_full(self):
+        admission.take_token('c', rate=1, burst=3, now=self.NOW)
+        later = self.NOW + 3600 + 10
+        self.assertEqual([admission.take_token('c', rate=1, burst=3, now=later)[0] for _ in range(4)],
+                         [True, True, True, False])
+
+    def test_zero_rate_rejected_at_start_up(self):
+        rates = {'anonymous': (0, 10), 'free': (1, 20)}
+        with override_settings(ADMISSION={'rates': rates}):
+            with self.assertRaises(ImproperlyConfigured):
+                admission.check_rates()
+        with override_settings(ADMISSION={'rates': {'anonymous': (None, 0), 'free': (1, 20)}}):
+            admission.check_rates()
+
+
+class NormalizationEquivalenceTests(SimpleTestCase):
+    """The translate-table normalizers against the original regex implementation."""
+
+    # Accents, harakat, whitespace, final sigma, tatweel, ligatures, case oddities
+    POOLS = (
+        'abcdeéèêëàâäîïôöùûüçœÉÈÀÇ ', 'ΟΔΟΣ σς Σ', ' \t\n  \u3000',
+        ''.join(chr(cp) for cp in range(0x0621, 0x0660)) + 'ٱـٰ',
+        ''.join(chr(cp) for cp in range(0x0300, 0x0370)), 'ﷲﻻﷺ', 'İıǅẞ', 'ᴖ5ᴖe',
+    )
+
+    def _assert_equivalent(self, texts):
+        for reference, normalizer, kind in (
+                (normalization.reference_french, text_utils.normalize_french, 'french'),
+                (normalization.reference_arabic, text_utils.normalize_arabic, 'arabic'),
+                (normalization.reference_text, text_utils.normalize_text, 'text')):
+            expected = [reference(text) for text in texts]
+            for text, want in zip(texts, expected):
+                self.assertEqual(normalizer(text), want, f"{kind}: {text!r}")
+            self.assertEqual(text_utils.normalize_batch(texts, kind), expected)
+
+    def test_random_mixed_script_strings(self):
+        rng = random.Random(0)
+        self._assert_equivalent([
+            ''.join(rng.choice(rng.choice(self.POOLS)) for _ in range(rng.randint(0, 40)))
+            for _ in range(5000)
+        ])
+
+    def test_quran_corpus(self):
+        corpus = normalization.load_corpus([os.path.join(settings.BASE_DIR, 'quran_complet.json')])
+        if not corpus:
+            self.skipTest("quran_complet.json absent")
+        self._assert_equivalent(corpus)
+
+
+class SearchGateTests(SimpleTestCase):
+    def _hold(self, gate, priority=0):
+        """Occupy a slot from a thread until the returned event is set."""
+        entered, release = threading.Event(), threading.Event()
+
+        def run():
+            with gate.slot(priority):
+                entered.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        entered.wait(5)
+        return release, thread
+
+    def _queue(self, gate, priority, order, errors):
+        def run():
+            try:
+                with gate.slot(priority):
+                    order.append(priority)
+            except admission.Overloaded:
+                errors.append(priority)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def _wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_higher_plan_runs_first(self):
+        gate = admission.SearchGate(concurrency=1, queue_size=4, timeout=5)
+        release, holder = self._hold(gate)
+        order, errors = [], []
+        threads = []
+        for priority in (3, 2, 0):
+            threads.append(self._queue(gate, priority, order, errors))
+            self._wait_for(lambda: gate.stats()['waiting'] == len(threads))
+
+        release.set()
+        for thread in [holder, *threads]:
+            thread.join(5)
+        self.assertEqual(order, [0, 2, 3])
+        self.assertEqual(errors, [])
+
+    def test_full_queue_evicts_a_lower_plan(self):
+        gate = admission.SearchGate(concurrency=1, queue_size=1, timeout=5)
+        release, holder = self._hold(gate)
+        order, errors = [], []
+        low = self._queue(gate, admission.PRIORITIES['anonymous'], order, errors)
+        self._wait_for(lambda: gate.stats()['waiting'] == 1)
+
+        high = self._queue(gate, admission.PRIORITIES['max'], order, errors)
+        low.join(5)
+        self.assertEqual(errors, [admission.PRIORITIES['anonymous']])
+
+        release.set()
+        for thread in (holder, high):
+            thread.join(5)
+        self.assertEqual(order, [admission.PRIORITIES['max']])
+        self.assertEqual(gate.stats()['shed'], 1)
+
+    def test_full_queue_sheds_same_plan(self):
+        gate = admission.SearchGate(concurrency=1, queue_size=1, timeout=5)
+        release, holder = self._hold(gate)
+        order, errors = [], []
+        first = self._queue(gate, 2, order, errors)
+        self._wait_for(lambda: gate.stats()['waiting'] == 1)
+
+        with self.assertRaises(admission.Overloaded):
+            with gate.slot(2):
+                pass
+        self.assertFalse(gate.would_admit(2))
+        self.assertTrue(gate.would_admit(0))
+
+        release.set()
+        for thread in (holder, first):
+            thread.join(5)
+        self.assertEqual(order, [2])
+
+    def test_waiter_shed_after_timeout(self):
+        gate = admission.SearchGate(concurrency=1, queue_size=2, timeout=0.1)
+        release, holder = self._hold(gate)
+        started = time.monotonic()
+        with self.assertRaises(admission.Overloaded) as raised:
+            with gate.slot(0):
+                pass
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        self.assertEqual(raised.exception.retry_after, 1)
+        self.assertEqual(gate.stats()['waiting'], 0)
+
+        release.set()
+        holder.join(5)
+        with gate.slot(0):
+            self.assertEqual(gate.stats()['active'], 1)
+        self.assertEqual(gate.stats(), {'active': 0, 'waiting': 0, 'admitted': 2, 'shed': 1})
+
+
+class QuotaServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        plan = SubscriptionPlan.objects.create(name='mensuel', daily_request_limit=3)
+        self.user = User.objects.create_user('reader', password='x')
+        UserProfile.objects.filter(user=self.user).update(subscription_plan=plan)
+        self.profile = UserProfile.objects.select_related('subscription_plan').get(user=self.user)
+        # No background flusher: flush() is called explicitly
+        self.quota = QuotaService(flush_interval=0)
+        # Nor a flush at exit, once the test database is gone
+        self.addCleanup(atexit.unregister, self.quota.flush)
+
+    def _reserve(self):
+        reservation = self.quota.reserve(self.profile)
+        return reservation.allowed, reservation.requests_today
+
+    def test_reserve_up_to_the_plan_limit(self):
+        results = [self._reserve() for _ in range(4)]
+        self.assertEqual(results, [(True, 1), (True, 2), (True, 3), (False, 3)])
+        self.assertEqual(self.quota.used_today(self.profile), 3)
+
+    def test_release_gives_the_request_back(self):
+        first = self.quota.reserve(self.profile)
+        self.quota.reserve(self.profile)
+        self.quota.release(first)
+        self.assertEqual(self.quota.used_today(self.profile), 1)
+        self.assertEqual(self.quota.flush(), 1)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.requests_today, 1)
+
+    def test_released_request_can_be_reserved_again(self):
+        reservations = [self.quota.reserve(self.profile) for _ in range(3)]
+        self.quota.release(reservations[-1])
+        self.assertEqual(self._reserve(), (True, 3))
+        self.assertFalse(self._reserve()[0])
+
+    def test_refused_reservation_releases_nothing(self):
+        for _ in range(3):
+            self.quota.reserve(self.profile)
+        refused = self.quota.reserve(self.profile)
+        self.quota.release(refused)
+        self.assertEqual(self.quota.used_today(self.profile), 3)
+
+    def test_release_after_midnight_gives_back_the_reserved_day(self):
+        today = timezone.localdate()
+        with mock.patch.object(timezone, 'localdate', return_value=today - timedelta(days=1)):
+            reservation = self.quota.reserve(self.profile)
+        self.quota.reserve(self.profile)
+        self.quota.release(reservation)
+        self.assertEqual(cache.get(f'quota:{self.user.pk}:{reservation.day.isoformat()}'), 0)
+        self.assertEqual(self.quota.used_today(self.profile), 1)
+
+    def test_concurrent_reservations_never_exceed_the_limit(self):
+        # Counter seeded here: the threads cannot read the test transaction
+        self.quota.used_today(self.profile)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.quota.reserve(self.profile).allowed))
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(results), 3)
+        self.assertEqual(self.quota.used_today(self.profile), 3)
+
+    def test_counter_seeded_from_a_fresh_profile(self):
+        # self.profile is stale, like the one cached by authentication
+        UserProfile.objects.filter(pk=self.profile.pk).update(
+            requests_today=2, last_request_date=timezone.localdate()
+        )
+        self.assertEqual(self._reserve(), (True, 3))
+        self.assertFalse(self._reserve()[0])
+
+    def test_evicted_counter_keeps_unflushed_requests(self):
+        self.quota.reserve(self.profile)
+        self.quota.reserve(self.profile)
+        cache.clear()
+        self.assertEqual(self._reserve(), (True, 3))
+
+    def test_flush_adds_pending_increments(self):
+        self.quota.reserve(self.profile)
+        self.quota.reserve(self.profile)
+        self.quota.flush()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.requests_today, 2)
+        self.assertEqual(self.profile.last_request_date, timezone.localdate())
+        # Nothing left to write
+        self.assertEqual(self.quota.flush(), 0)
+
+
+def _verse(doc_id, score, text='Louange à Allah, Seigneur des mondes.'):
+    return {'id': doc_id, 'reference': doc_id, 'score': score, 'source_type': 'Coran',
+            'text_ar': 'الحمد لله', 'text_fr': text}
+
+
+@override_settings(PROMPT_PACKING={'token_budget': 3000, 'max_distance': 0.6})
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.plan = SubscriptionPlan.objects.create(name='mensuel', daily_request_limit=3)
+        self.user = User.objects.create_user('reader', password='x')
+        UserProfile.objects.filter(user=self.user).update(subscription_plan=self.plan)
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def _authenticate(self, queries):
+        with self.assertNumQueries(queries):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+        return user
+
+    def test_second_request_needs_no_query(self):
+        self._authenticate(1)
+        user = self._authenticate(0)
+        # The profile and the plan come with the cached user
+        with self.assertNumQueries(0):
+            self.assertEqual(user.profile.subscription_plan.daily_request_limit, 3)
+
+    def test_deleted_token_is_refused(self):
+        self._authenticate(1)
+        self.token.delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_profile_save_reloads_the_user(self):
+        self._authenticate(1)
+        profile = UserProfile.objects.get(user=self.user)
+        profile.subscription_plan = None
+        profile.save()
+        self.assertIsNone(self._authenticate(1).profile.subscription_plan)
+
+    def test_plan_change_reloads_every_user(self):
+        other = User.objects.create_user('listener', password='x')
+        other_token = Token.objects.create(user=other)
+        self._authenticate(1)
+        self.auth.authenticate_credentials(other_token.key)
+
+        self.plan.daily_request_limit = 10
+        self.plan.save()
+        self.assertEqual(self._authenticate(1).profile.subscription_plan.daily_request_limit, 10)
+        with self.assertNumQueries(1):
+            self.auth.authenticate_credentials(other_token.key)
+
+
+class PackContextsTests(SimpleTestCase):
+    def test_distance_cutoff_keeps_the_best_hit(self):
+        packed = pack_contexts('question', [_verse('a', 0.9), _verse('b', 0.95)])
+        self.assertEqual([ctx['id'] for ctx in packed.contexts], ['a'])
+        self.assertEqual(packed.stats['dropped_distance'], 1)
+
+        packed = pack_contexts('question', [_verse('a', 0.2), _verse('b', 0.5), _verse('c', 0.7)])
+        self.assertEqual([ctx['id'] for ctx in packed.contexts], ['a', 'b'])
+
+    def test_exact_duplicates_removed(self):
+        packed = pack_contexts('question', [_verse('a', 0.1), _verse('a', 0.2), _verse('b', 0.3)])
+        self.assertEqual([ctx['id'] for ctx in packed.contexts], ['a', 'b'])
+        self.assertEqual(packed.stats['dropped_duplicates'], 1)
+
+    def test_near_duplicate_vectors_removed(self):
+        contexts = [_verse('a', 0.1), _verse('b', 0.2), _verse('c', 0.3)]
+        vectors = np.array([[1.0, 0.0], [0.999, 0.01], [0.6, 0.8]], dtype='float32')
+        packed = pack_contexts('question', contexts, vectors, np.array([1.0, 0.0], dtype='float32'))
+        self.assertEqual([ctx['id'] for ctx in packed.contexts], ['a', 'c'])
+
+    def test_token_budget(self):
+        contexts = [_verse(str(i), 0.1, 'mot ' * 100) for i in range(5)]
+        cost = estimate_tokens(format_context(contexts[0]))
+        with override_settings(PROMPT_PACKING={'token_budget': cost * 2 + 1, 'max_distance': None}):
+            packed = pack_contexts('question', contexts)
+        self.assertEqual(len(packed.contexts), 2)
+        self.assertLessEqual(packed.stats['tokens_after'], cost * 2 + 1)
+        self.assertEqual(packed.stats['tokens_saved'], packed.stats['tokens_before'] - packed.stats['tokens_after'])
+
+        # The best hit is kept even when it alone exceeds the budget
+        with override_settings(PROMPT_PACKING={'token_budget': 1, 'max_distance': None}):
+            self.assertEqual(len(pack_contexts('question', contexts).contexts), 1)
+
+    def test_hadith_trimmed_to_its_matched_passage(self):
+        text = 'Première phrase. La patience est une lumière. Dernière phrase.'
+        hadith = {'id': 'h', 'reference': 'h', 'score': 0.1, 'source_type': 'Hadith',
+                  'text_ar': 'الصبر ضياء', 'text_fr': text, 'match_span': [17, 45]}
+        packed = pack_contexts('patience', [hadith])
+        self.assertEqual(packed.contexts[0]['text_fr'], '[…] La patience est une lumière. […]')
+        # Sources shown to the user keep the full text
+        self.assertEqual(packed.selected[0]['text_fr'], text)
+
+    @override_settings(PROMPT_PACKING={'hadith_max_chars': 60, 'max_distance': None})
+    def test_long_hadith_keeps_the_relevant_sentences(self):
+        text = 'Il entra dans la mosquée. Le Prophète parla de la patience. Puis il sortit vers le marché.'
+        hadith = {'id': 'h', 'reference': 'h', 'score': 0.1, 'source_type': 'Hadith',
+                  'text_ar': '', 'text_fr': text}
+        trimmed = pack_contexts('la patience', [hadith]).contexts[0]['text_fr']
+        self.assertIn('patience', trimmed)
+        self.assertLess(len(trimmed), len(text))
+
+
+class MergeWindowsTests(SimpleTestCase):
+    def test_overlapping_and_adjacent_windows_merge(self):
+        merged = merge_windows([(2, 10, 13, 0), (2, 12, 15, 1), (2, 15, 17, 2)])
+        self.assertEqual(merged, [(10, 17, [0, 1, 2])])
+
+    def test_disjoint_windows_stay_apart_sorted_by_start(self):
+        merged = merge_windows([(2, 20, 23, 0), (2, 10, 13, 1)])
+        self.assertEqual(merged, [(10, 13, [1]), (20, 23, [0])])
+
+    def test_windows_of_different_sourates_never_merge(self):
+        # Rows 6-7 end sourate 1, rows 7-9 start sourate 2: adjacent rows, other sourate
+        merged = merge_windows([(1, 5, 7, 0), (2, 7, 9, 1)])
+        self.assertEqual(merged, [(5, 7, [0]), (7, 9, [1])])
+
+    def test_empty(self):
+        self.assertEqual(merge_windows([]), [])
+
+
+class VersePositionsTests(SimpleTestCase):
+    def setUp(self):
+        metadata = [{'metadata': {'sourate': s, 'ayah': a}} for s, n in ((1, 7), (2, 10)) for a in range(1, n + 1)]
+        self.positions = VersePositions(metadata)
+
+    def test_rows(self):
+        self.assertTrue(self.positions.valid)
+        self.assertEqual(self.positions.row(1, 1), 0)
+        self.assertEqual(self.positions.row(2, 1), 7)
+
+    def test_window_never_crosses_a_sourate(self):
+        self.assertEqual(self.positions.window(self.positions.row(1, 7), 2), (4, 7))
+        self.assertEqual(self.positions.window(self.positions.row(2, 1), 2), (7, 10))
+        self.assertEqual(self.positions.window(self.positions.row(2, 5), 1), (10, 13))
+
+    def test_non_contiguous_metadata_disables_expansion(self):
+        metadata = [{'metadata': {'sourate': 1, 'ayah': a}} for a in (1, 2, 4)]
+        self.assertFalse(VersePositions(metadata).valid)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='x')
+        other = User.objects.create_user('other', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        for i in range(5):
+            entry = ChatHistory.objects.create(user=self.user, query=f'question {i}', response='réponse')
+            # auto_now_add: distinct dates set afterwards, newest last
+            ChatHistory.objects.filter(pk=entry.pk).update(created_at=now + timedelta(minutes=i))
+            Conversation.objects.create(user=self.user, title=f'conversation {i}', message_count=1,
+                                        last_message_at=now + timedelta(minutes=i))
+        ChatHistory.objects.create(user=other, query='ailleurs', response='réponse')
+        Conversation.objects.create(user=other, title='ailleurs', last_message_at=now + timedelta(hours=1))
+
+    def _walk(self, url, field):
+        """Follow the `next` cursor to the end; returns the pages' values of `field`."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([item[field] for item in response.json()['results']])
+            url = response.json()['next']
+        return pages
+
+    def test_history_pages_newest_first(self):
+        pages = self._walk('/api/history/?page_size=2', 'query')
+        self.assertEqual(pages, [['question 4', 'question 3'], ['question 2', 'question 1'], ['question 0']])
+
+    def test_history_entries_are_lean(self):
+        item = self.client.get('/api/history/').json()['results'][0]
+        self.assertEqual(set(item), {'id', 'query', 'created_at'})
+
+    def test_conversations_pages_most_recent_first(self):
+        pages = self._walk('/api/conversations/?page_size=2', 'title')
+        self.assertEqual(pages, [['conversation 4', 'conversation 3'], ['conversation 2', 'conversation 1'],
+                                 ['conversation 0']])
+
+    def test_new_entry_does_not_shift_the_next_page(self):
+        first = self.client.get('/api/conversations/?page_size=2').json()
+        Conversation.objects.create(user=self.user, title='nouvelle')
+        second = self.client.get(first['next']).json()
+        self.assertEqual([item['title'] for item in second['results']], ['conversation 2', 'conversation 1'])
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get('/api/conversations/').status_code, 401)
+
+
+class ConcordanceSearchTests(SimpleTestCase):
+    QURAN = ['بسم الله الرحمن الرحيم', 'الحمد لله رب العالمين', 'الرحمن الرحيم']
+    HADITHS = ['إنما الأعمال بالنيات', 'الحمد لله على كل حال']
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        texts = [normalize_arabic(text) for text in cls.QURAN + cls.HADITHS]
+        ids = [f'v_1_{i + 1}' for i in range(len(cls.QURAN))] + [f'h_{i}' for i in range(len(cls.HADITHS))]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'concordance.npz')
+            np.savez(path, doc_ids=np.array(ids), doc_refs=np.array(ids),
+                     quran_docs=np.int64(len(cls.QURAN)), **build_concordance(texts))
+            cls.concordance = ConcordanceService(path)
+
+    def _hits(self, query, **kwargs):
+        return [(hit['id'], hit['position']) for hit in self.concordance.search(query, **kwargs)['results']]
+
+    def test_word_in_corpus_order(self):
+        self.assertEqual(self._hits('الرحيم'), [('v_1_1', 3), ('v_1_3', 1)])
+
+    def test_phrase_needs_consecutive_words(self):
+        self.assertEqual(self._hits('الحمد لله'), [('v_1_2', 0), ('h_1', 0)])
+        self.assertEqual(self._hits('الله الرحيم'), [])
+
+    def test_harakat_ignored(self):
+        self.assertEqual(self._hits('الرَّحِيمِ'), self._hits('الرحيم'))
+
+    def test_prefix_matches_every_word_starting_with_it(self):
+        result = self.concordance.search('الرح*')
+        self.assertEqual(result['total'], 4)
+        self.assertEqual({e['term']: e['count'] for e in result['expansions']['الرح*']},
+                         {'الرحمن': 2, 'الرحيم': 2})
+
+    def test_prefix_inside_a_phrase(self):
+        self.assertEqual(self._hits('الرحمن الر*'), [('v_1_1', 2), ('v_1_3', 0)])
+
+    def test_source_filter(self):
+        self.assertEqual(self._hits('لله', source='quran'), [('v_1_2', 1)])
+        self.assertEqual(self._hits('لله', source='hadith'), [('h_1', 1)])
+
+    def test_keyword_in_context(self):
+        hit = self.concordance.search('رب', context=1)['results'][0]
+        self.assertEqual((hit['left'], hit['match'], hit['right']), ('لله', 'رب', 'العالمين'))
+
+    def test_invalid_queries(self):
+        with self.assertRaises(ValueError):
+            self.concordance.search('patience')
+        with self.assertRaises(ValueError):
+            self.concordance.search('ا*')
+
+
+# Three hadith collections, interleaved along one axis: the k-th closest
+# document to the origin alternates between the shards
+SHARDS = {'a': [0, 3, 6], 'b': [1, 4, 7], 'c': [2, 5]}
+
+
+def _collection_files(directory, name, metadata):
+    """Artifact paths of a declared collection whose metadata is written to `directory`."""
+    paths = {f'{name}_data': os.path.join(directory, f'{name}_indexed.json')}
+    with open(paths[f'{name}_data'], 'w', encoding='utf-8') as f:
+        json.dump(metadata, f)
+    # Missing files: the FAISS index is rebuilt from the embeddings, no chunks
+    for kind in ('faiss', 'chunks', 'chunks_faiss'):
+        paths[f'{name}_{kind}'] = os.path.join(directory, f'{name}_{kind}')
+    return paths
+
+
+def _verses(*texts):
+    return [
+        {'id': f'v_1_{ayah}', 'reference': f'Sourate 1, Verset {ayah}', 'text_ar': '', 'text_fr': text,
+         'metadata': {'sourate': 1, 'sourate_name': 'Al-Fatiha', 'ayah': ayah}, 'embedding': [float(ayah), 0.0]}
+        for ayah, text in enumerate(texts, 1)
+    ]
+
+
+@override_settings(COLLECTIONS={'quran': {'source': 'quran'}})
+class IndexStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.build = os.path.join(tmp.name, 'build')
+        os.mkdir(self.build)
+        overrides = override_settings(INDEX_DIR=os.path.join(tmp.name, 'indexes'))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def _publish(self, version, *texts, **options):
+        sources = _collection_files(self.build, 'quran', _verses(*texts))
+        return index_store.publish(sources, version=version, **options)
+
+    def test_without_manifest_the_legacy_layout_is_served(self):
+        legacy = os.path.join(self.build, 'quran_indexed.json')
+        with override_settings(QURAN_INDEX_PATH=legacy):
+            version, paths = index_store.resolve()
+        self.assertEqual(version, index_store.LEGACY_VERSION)
+        self.assertEqual(paths['quran_data'], Path(legacy))
+
+    def test_publish_makes_the_copy_current(self):
+        self._publish('v1', 'Louange')
+        version, paths = index_store.resolve()
+        self.assertEqual(version, 'v1')
+        self.assertEqual(paths['quran_data'], index_store.index_dir() / 'v1' / 'quran_indexed.json')
+        with open(paths['quran_data'], encoding='utf-8') as f:
+            self.assertEqual(json.load(f)[0]['text_fr'], 'Louange')
+        # Only the files that exist are recorded
+        self.assertEqual(list(index_store.read_manifest()['versions']['v1']['files']), ['quran_indexed.json'])
+        # No staging directory left behind
+        self.assertEqual(sorted(p.name for p in index_store.index_dir().iterdir()), ['manifest.json', 'v1'])
+
+    def test_inactive_publish_then_activate(self):
+        self._publish('v1', 'Louange')
+        self._publish('v2', 'Patience', activate=False)
+        self.assertEqual(index_store.resolve()[0], 'v1')
+        index_store.activate('v2')
+        self.assertEqual(index_store.resolve()[0], 'v2')
+        with self.assertRaises(ValueError):
+            index_store.activate('v9')
+        with self.assertRaises(ValueError):
+            self._publish('v2', 'Encore')
+
+    def test_prune_keeps_the_newest_and_the_current(self):
+        self._publish('v1', 'Un')
+        for version in ('v2', 'v3', 'v4'):
+            self._publish(version, version, activate=False, keep=2)
+        self.assertEqual(sorted(index_store.read_manifest()['versions']), ['v1', 'v3', 'v4'])
+        self.assertFalse((index_store.index_dir() / 'v2').exists())
+        self.assertEqual(index_store.resolve()[0], 'v1')
+
+    def test_truncated_file_is_refused(self):
+        self._publish('v1', 'Louange')
+        path = index_store.resolve()[1]['quran_data']
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('[')
+        with self.assertRaises(ValueError):
+            index_store.resolve()
+
+    def test_failed_reload_is_retried_at_the_next_check(self):
+        self._publish('v1', 'Louange')
+        service = VectorService(model=StubEncoder())
+        service.indexes.wait()
+        self._publish('v2', 'Patience', 'Gratitude')
+        data = index_store.resolve()[1]['quran_data']
+        with open(data, encoding='utf-8') as f:
+            content = f.read()
+        # Still being copied: the manifest is there, the file is not complete yet
+        with open(data, 'w', encoding='utf-8') as f:
+            f.write(content[:10])
+
+        with self.assertLogs('quran_api', 'ERROR'):
+            self.assertFalse(service.check_for_update())
+        self.assertEqual(service.indexes.version, 'v1')
+        self.assertIsNotNone(service.reload_error)
+
+        with open(data, 'w', encoding='utf-8') as f:
+            f.write(content)
+        # Same manifest as the failed check: retried all the same
+        self.assertTrue(service.check_for_update())
+        self.assertEqual(service.indexes.version, 'v2')
+        self.assertIsNone(service.reload_error)
+        self.assertFalse(service.check_for_update())
+
+
+class QueryCacheKeyTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        items = {item['id']: item for item in _verses('Louange', 'Patience')}
+        self.hits = [(item, np.array([1.0, 0.0], dtype='float32'), row) for row, item in enumerate(items.values())]
+        loaded = threading.Event()
+        loaded.set()
+        self.indexes = lambda fingerprint: mock.Mock(fingerprint=fingerprint, loaded=loaded, hydrate=lambda ref: items[ref['id']])
+
+    @override_settings(MODEL_NAME='encoder-a')
+    def test_embedding_is_keyed_by_the_model(self):
+        query_cache.set_embedding('patience', [0.5, 0.5])
+        np.testing.assert_array_equal(query_cache.get_embedding('  Patience '), [0.5, 0.5])
+        with override_settings(MODEL_NAME='encoder-b'):
+            self.assertIsNone(query_cache.get_embedding('patience'))
+
+    @override_settings(MODEL_NAME='encoder-a')
+    def test_retrieval_is_keyed_by_the_model_and_the_index(self):
+        options = ('patience', 10, None, 0, False)
+        query_cache.set_retrieval(self.indexes('v1-abc'), *options, self.hits)
+        cached = query_cache.get_retrieval(self.indexes('v1-abc'), *options)
+        self.assertEqual([item['id'] for item, _, _ in cached], ['v_1_1', 'v_1_2'])
+        self.assertIsNone(query_cache.get_retrieval(self.indexes('v1-def'), *options))
+        with override_settings(MODEL_NAME='encoder-b'):
+            self.assertIsNone(query_cache.get_retrieval(self.indexes('v1-abc'), *options))
+
+    def test_rebuilt_legacy_files_change_the_fingerprint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = _collection_files(directory, 'quran', _verses('Louange'))
+            before = index_store.fingerprint(paths)
+            _collection_files(directory, 'quran', _verses('Louange', 'Patience'))
+            self.assertNotEqual(index_store.fingerprint(paths), before)
+
+    def test_prewarm_refuses_a_process_local_cache(self):
+        with mock.patch.object(query_cache, 'popular_queries', return_value=[('patience', 3)]), \
+                mock.patch.object(query_cache, 'prewarm') as prewarm:
+            with self.assertRaises(CommandError):
+                call_command('prewarm_cache')
+            with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}):
+                self.assertTrue(query_cache.is_shared())
+        prewarm.assert_not_called()
+
+
+class ShardMergeTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        paths = {}
+        for name, positions in SHARDS.items():
+            metadata = [
+                {'id': f'{name}_{x}', 'reference': f'{name} {x}', 'text_ar': '', 'text_fr': '',
+                 'embedding': [float(x), 0.0]}
+                for x in positions
+            ]
+            paths.update(_collection_files(cls.tmp.name, name, metadata))
+        with override_settings(COLLECTIONS={name: {'source': 'hadith'} for name in SHARDS}):
+            cls.indexes = IndexSet('test', paths)
+            cls.indexes.wait()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+        super().tearDownClass()
+
+    def _search(self, x, top_k, source_filter='both'):
+        query = np.array([[x, 0.0]], dtype='float32')
+        return [item['id'] for item, _, _ in self.indexes.search(query, top_k, source_filter)]
+
+    def test_shards_loaded(self):
+        self.assertEqual(self.indexes.errors, {})
+        self.assertEqual([shard.searchable for shard in self.indexes.shards], [True, True, True])
+
+    def test_merged_best_first_across_shards(self):
+        self.assertEqual(self._search(0, 5), ['a_0', 'b_1', 'c_2', 'a_3', 'b_4'])
+        self.assertEqual(self._search(7, 3), ['b_7', 'a_6', 'c_5'])
+
+    def test_scores_sorted_and_rows_of_their_shard(self):
+        hits = self.indexes.search(np.array([[2.4, 0.0]], dtype='float32'), 8)
+        scores = [item['score'] for item, _, _ in hits]
+        self.assertEqual(scores, sorted(scores))
+        for item, vector, row in hits:
+            self.assertEqual(f"{item['collection']}_{int(vector[0])}", item['id'])
+            self.assertEqual(SHARDS[item['collection']][row], int(vector[0]))
+
+    def test_top_k_larger_than_the_corpus(self):
+        self.assertEqual(len(self._search(0, 50)), 8)
+
+    def test_source_filter_by_collection(self):
+        self.assertEqual(self._search(0, 5, 'c'), ['c_2', 'c_5'])
+        self.assertEqual(self._search(0, 2, 'quran'), [])
+
+
+class HadithChunkTests(SimpleTestCase):
+    LONG = 'Un. Deux. Trois. Quatre. Cinq.'
+
+    def test_chunk_spans_overlap(self):
+        spans = chunk_spans(self.LONG, window=3, overlap=1)
+        self.assertEqual([self.LONG[start:end] for start, end in spans], ['Un. Deux. Trois.', 'Trois. Quatre. Cinq.'])
+        self.assertEqual(chunk_spans('Une seule phrase.'), [(0, 17)])
+        self.assertEqual(chunk_spans('   '), [])
+
+    def _shard(self, directory):
+        metadata = [
+            {'id': 'h0', 'reference': 'h0', 'text_ar': '', 'text_fr': self.LONG, 'embedding': [9.0, 0.0]},
+            {'id': 'h1', 'reference': 'h1', 'text_ar': '', 'text_fr': 'Six.', 'embedding': [1.0, 0.0]},
+            # No French text, hence no chunk
+            {'id': 'h2', 'reference': 'h2', 'text_ar': 'سبعة', 'text_fr': '', 'embedding': [2.0, 0.0]},
+        ]
+        paths = _collection_files(directory, 'sahih', metadata)
+        with open(paths['sahih_chunks'], 'wb') as f:
+            np.savez(
+                f, parents=np.array([0, 0, 1]), spans=np.array([[0, 15], [10, 29], [0, 3]]),
+                embeddings=np.array([[0.0, 0.0], [5.0, 0.0], [1.0, 0.0]], dtype='float32'),
+            )
+        shard = Shard(Collection('sahih', 'hadith'), paths)
+        shard.load()
+        return shard
+
+    def _search(self, shard, x, top_k=3):
+        hits = shard.search(np.array([[x, 0.0]], dtype='float32'), top_k)
+        return [(item['id'], item.get('match_span'), item['score'], row) for item, _, row in hits]
+
+    def test_best_chunk_per_hadith_and_unchunked_merged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            shard = self._shard(directory)
+            self.assertEqual(shard.describe()['chunks'], 3)
+            self.assertEqual(shard.describe()['unchunked'], 1)
+            self.assertEqual(self._search(shard, 0), [
+                ('h0', [0, 15], 0.0, 0), ('h1', [0, 3], 1.0, 1), ('h2', None, 4.0, 2),
+            ])
+            # h0 once, by its closest chunk; the hadith without chunk found by its own vector
+            self.assertEqual(self._search(shard, 5), [
+                ('h0', [10, 29], 0.0, 0), ('h2', None, 9.0, 2), ('h1', [0, 3], 16.0, 1),
+            ])
+            self.assertEqual(self._search(shard, 2, top_k=1), [('h2', None, 0.0, 2)])
+
+
+class RelatedDocumentsTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        files = {}
+        for source, positions in (('quran', [0.0, 1.0, 5.0]), ('hadith', [0.4, 4.0])):
+            files[source] = os.path.join(cls.tmp.name, f'{source}_indexed.json')
+            with open(files[source], 'w', encoding='utf-8') as f:
+                json.dump([{'id': f'{source[0]}{i}', 'reference': f'{source} {i}', 'embedding': [x, 0.0]}
+                           for i, x in enumerate(positions)], f)
+        cls.table = os.path.join(cls.tmp.name, 'related_neighbors.npz')
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_related_index(
+                files['quran'], os.path.join(cls.tmp.name, 'absent.index'),
+                files['hadith'], os.path.join(cls.tmp.name, 'absent.index'), cls.table, k=3,
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        patcher = mock.patch.object(views, 'get_related_service', return_value=RelatedService(self.table))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _related(self, doc_id, **params):
+        response = self.client.get(f'/api/related/{doc_id}/', params)
+        return response.status_code, response.json()
+
+    def _ids(self, doc_id, **params):
+        related = self._related(doc_id, **params)[1]['related']
+        return {source: [(n['id'], round(n['score'], 2)) for n in neighbours] for source, neighbours in related.items()}
+
+    def test_verse_neighbours_exclude_itself(self):
+        self.assertEqual(self._ids('q0'), {
+            'quran': [('q1', 1.0), ('q2', 25.0)],
+            'hadith': [('h0', 0.16), ('h1', 16.0)],
+        })
+
+    def test_hadith_neighbours_are_verses(self):
+        self.assertEqual(self._ids('h1', limit=2), {'quran': [('q2', 1.0), ('q1', 9.0)]})
+
+    def test_unknown_document_and_bad_limit(self):
+        self.assertEqual(self._related('q9')[0], 404)
+        self.assertEqual(self._related('q0', limit='dix')[0], 400)
+
+    def test_missing_table(self):
+        with self.assertLogs('quran_api', 'WARNING'):
+            missing = RelatedService(os.path.join(self.tmp.name, 'absent.npz'))
+        with mock.patch.object(views, 'get_related_service', return_value=missing):
+            self.assertEqual(self._related('q0')[0], 503)
+
+
+class SuggestTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        verses = [
+            (1, 'Al-Fatiha', 1, 'Louange à Allah, la patience.'), (1, 'Al-Fatiha', 2, 'Le paradis.'),
+            (2, 'Al-Baqara', 1, 'La patience et le paradis.'), (2, 'Al-Baqara', 2, 'Le pardon.'),
+        ]
+        quran = [
+            {'id': f'v_{sourate}_{ayah}', 'reference': f'Sourate {name}, Verset {ayah}', 'text_ar': '', 'text_fr': text,
+             'metadata': {'sourate': sourate, 'sourate_name': name, 'ayah': ayah}}
+            for sourate, name, ayah, text in verses
+        ]
+        hadiths = [{'id': 'h1', 'reference': 'Sahih al-Bukhari 1', 'text_ar': '', 'text_fr': 'La patience encore.'}]
+        cls.index = SuggestIndex(quran, hadiths)
+
+    def _values(self, query, limit=8):
+        return [(item['type'], item['value']) for item in self.index.suggest(query, limit)]
+
+    def test_sourate_names_with_or_without_article(self):
+        for query in ('baq', 'Al-Baq', 'al baqara', 'albaq'):
+            self.assertEqual(self._values(query)[0], ('sourate', '2'), query)
+
+    def test_references_in_reading_order(self):
+        self.assertEqual(self._values('2'), [('sourate', '2'), ('verse', '2:1'), ('verse', '2:2')])
+        self.assertEqual(self._values('1:', limit=1), [('verse', '1:1')])
+        self.assertEqual(self._values('sahih'), [('hadith', 'Sahih al-Bukhari 1')])
+
+    def test_frequent_words(self):
+        self.assertEqual(self._values('pa'), [('term', 'patience'), ('term', 'paradis')])
+        # Seen once: not in the vocabulary
+        self.assertEqual(self._values('pardon'), [])
+        self.assertEqual(self._values('  '), [])
+
+    def test_endpoint(self):
+        with mock.patch.object(vector_service, '_vector_service', None):
+            self.assertEqual(self.client.get('/api/suggest/', {'q': 'baq'}).status_code, 503)
+        service = mock.Mock(indexes=mock.Mock(suggestions=self.index))
+        with mock.patch.object(vector_service, '_vector_service', service), \
+                mock.patch.object(views, 'get_vector_service', return_value=service):
+            self.assertEqual(self.client.get('/api/suggest/', {'q': 'baq', 'limit': 'x'}).status_code, 400)
+            response = self.client.get('/api/suggest/', {'q': 'baq', 'limit': 1})
+        self.assertEqual(response.json(), {'query': 'baq', 'suggestions': [
+            {'type': 'sourate', 'label': 'Sourate 2 — Al-Baqara', 'value': '2', 'sourate': 2},
+        ]})
+
+
+class StubEncoder:
+    """Encodes every text to the same point: searches rank by stored vector only."""
+
+    def encode(self, texts, **kwargs):
+        return np.zeros((len(texts), 2), dtype='float32')
+
+
+class MemoryReportTests(SimpleTestCase):
+    def test_deep_size_counts_shared_objects_once(self):
+        shared = ['x' * 1000]
+        seen = set()
+        first = memory_report.deep_size({'a': shared}, seen)
+        self.assertGreater(first, 1000)
+        self.assertLess(memory_report.deep_size({'b': shared}, seen), 1000)
+
+        array = np.zeros(1000, dtype='float32')
+        self.assertGreaterEqual(memory_report.deep_size(array, set()), 4000)
+        # A view does not own its data
+        self.assertLess(memory_report.deep_size(array[10:], set()), 4000)
+
+    def test_components_of_the_loaded_stack(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = _collection_files(directory, 'quran', _verses('Louange', 'Patience', 'Gratitude'))
+            paths['quran_ruku'] = os.path.join(directory, 'quran_ruku.json')
+            with override_settings(COLLECTIONS={'quran': {'source': 'quran'}}):
+                indexes = IndexSet('test', paths)
+                indexes.wait()
+        self.assertEqual(indexes.errors, {})
+        service = mock.Mock(model=StubEncoder(), indexes=indexes)
+        with mock.patch.object(vector_service, '_vector_service', service), \
+                mock.patch('quran_api.services.concordance_service._concordance_service', None), \
+                mock.patch('quran_api.services.related_service._related_service', None), \
+                mock.patch.object(memory_report, 'rss_bytes', return_value=3 * memory_report.MB):
+            report = memory_report.report(budget_mb=2)
+            within = memory_report.report(budget_mb=0)
+
+        components = {component['name']: component for component in report['components']}
+        self.assertEqual(components['model'], {'name': 'model', 'bytes': 0, 'encoder': 'StubEncoder'})
+        self.assertEqual(components['faiss:quran'], {'name': 'faiss:quran', 'bytes': 3 * 2 * 4, 'vectors': 3})
+        self.assertEqual(components['embeddings:quran']['documents'], 3)
+        self.assertGreater(components['embeddings:quran']['bytes'], 0)
+        self.assertEqual(report['attributed_bytes'], sum(c['bytes'] for c in report['components']))
+        self.assertEqual(report['unattributed_bytes'], 3 * memory_report.MB - report['attributed_bytes'])
+        self.assertTrue(report['over_budget'])
+        self.assertFalse(within['over_budget'])
+
+    def test_command_fails_over_budget(self):
+        report = {'components': [], 'rss_bytes': 3 * memory_report.MB, 'peak_rss_bytes': 0,
+                  'unattributed_bytes': 0, 'budget_mb': 2, 'over_budget': True}
+        with mock.patch.object(memory_report, 'load_serving_stack'), \
+                mock.patch.object(memory_report, 'report', return_value=report):
+            with self.assertRaises(CommandError):
+                call_command('memory_report', '--budget-mb', '2', stdout=io.StringIO())
+
+
+class ShardLoadingTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        verses = [
+            {'id': f'v_1_{ayah}', 'reference': f'Sourate 1, Verset {ayah}', 'text_ar': '', 'text_fr': '',
+             'metadata': {'sourate': 1, 'sourate_name': 'Al-Fatiha', 'ayah': ayah}, 'embedding': [float(ayah), 0.0]}
+            for ayah in range(1, 4)
+        ]
+        hadiths = [{'id': 'm_1', 'reference': 'Muslim 1', 'text_ar': '', 'text_fr': '', 'embedding': [0.0, 0.0]}]
+        self.paths = {'quran_ruku': os.path.join(tmp.name, 'quran_ruku.json')}
+        self.paths.update(_collection_files(tmp.name, 'quran', verses))
+        self.paths.update(_collection_files(tmp.name, 'muslim', hadiths))
+        collections = override_settings(COLLECTIONS={'quran': {'source': 'quran'}, 'muslim': {'source': 'hadith'}})
+        collections.enable()
+        self.addCleanup(collections.disable)
+
+        # The Muslim shard stays loading until released
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        load = Shard.load
+
+        def slow_load(shard):
+            if shard.name == 'muslim':
+                self.release.wait()
+            load(shard)
+
+        patcher = mock.patch.object(Shard, 'load', slow_load)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _ids(self, indexes, top_k=5):
+        return [item['id'] for item, _, _ in indexes.search(np.zeros((1, 2), dtype='float32'), top_k)]
+
+    def test_quran_answers_while_another_shard_loads(self):
+        indexes = IndexSet('test', self.paths)
+        self.assertTrue(indexes.wait_for_quran(timeout=10))
+        self.assertFalse(indexes.loaded.is_set())
+        self.assertEqual(self._ids(indexes), ['v_1_1', 'v_1_2', 'v_1_3'])
+        self.assertEqual(indexes.describe()['collections']['muslim'], {'source': 'hadith', 'state': 'loading'})
+        self.assertIsNotNone(indexes.hydrate({'id': 'v_1_2'}))
+
+        # The shard joins the searches once loaded
+        self.release.set()
+        self.assertTrue(indexes.wait(timeout=10))
+        self.assertEqual(self._ids(indexes, 2), ['m_1', 'v_1_1'])
+        self.assertIsNotNone(indexes.hydrate({'id': 'm_1'}))
+
+    def test_service_published_before_every_shard_loads(self):
+        self.addCleanup(setattr, vector_service, '_vector_service', None)
+        with mock.patch.object(vector_service.index_store, 'resolve', return_value=('test', self.paths)), \
+                mock.patch.object(vector_service, 'VectorService', lambda: VectorService(model=StubEncoder())):
+            service = vector_service.get_vector_service()
+        self.assertTrue(vector_service.is_vector_service_loaded())
+        self.assertEqual([item['id'] for item in service.search('patience', top_k=2)], ['v_1_1', 'v_1_2'])
+
+    def test_partial_hits_are_not_cached(self):
+        indexes = IndexSet('test', self.paths)
+        indexes.wait_for_quran(timeout=10)
+        hits = indexes.search(np.zeros((1, 2), dtype='float32'), 2)
+        with mock.patch.object(query_cache.cache, 'set') as cache_set:
+            query_cache.set_retrieval(indexes, 'patience', 2, 'both', 0, False, hits)
+        cache_set.assert_not_called()
+
+
+class _Rows:
+    """Stands for a model: records the batches given to bulk_create()."""
+
+    __name__ = 'Row'
+
+    def __init__(self, fail=False):
+        self.objects = self
+        self.batches = []
+        self.fail = fail
+        self.stored = threading.Event()
+
+    def bulk_create(self, batch, batch_size):
+        if self.fail:
+            raise RuntimeError('database unavailable')
+        self.batches.append(list(batch))
+        self.stored.set()
+
+
+class WriteBehindQueueTests(SimpleTestCase):
+    def _queue(self, rows, flusher=True, **options):
+        behind = WriteBehindQueue(rows, **options)
+        self.addCleanup(atexit.unregister, behind.drain)
+        self.addCleanup(behind.drain, 1)
+        if not flusher:
+            patcher = mock.patch.object(behind, '_ensure_thread')
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return behind
+
+    def test_full_batch_is_written_before_the_interval(self):
+        rows = _Rows()
+        behind = self._queue(rows, batch_size=3, flush_interval=60)
+        for row in range(3):
+            behind.put(row)
+        self.assertTrue(rows.stored.wait(2))
+        self.assertEqual(rows.batches, [[0, 1, 2]])
+        self.assertEqual(behind.stats()['written'], 3)
+
+    def test_partial_batch_is_written_after_the_interval(self):
+        rows = _Rows()
+        behind = self._queue(rows, batch_size=50, flush_interval=0.1)
+        behind.put('a')
+        behind.put('b')
+        self.assertTrue(rows.stored.wait(2))
+        self.assertEqual(rows.batches, [['a', 'b']])
+
+    def test_full_queue_drops_and_counts(self):
+        behind = self._queue(_Rows(), flusher=False, max_size=2)
+        with self.assertLogs('quran_api', 'WARNING'):
+            self.assertEqual([behind.put(row) for row in range(3)], [True, True, False])
+        self.assertEqual(behind.stats(), {'depth': 2, 'written': 0, 'dropped': 1})
+
+    def test_drain_writes_what_is_left_in_batches(self):
+        rows = _Rows()
+        written = []
+        behind = self._queue(rows, flusher=False, batch_size=2, after_write=written.extend)
+        for row in range(5):
+            behind.put(row)
+        behind.drain()
+        self.assertEqual(rows.batches, [[0, 1], [2, 3], [4]])
+        self.assertEqual(written, [0, 1, 2, 3, 4])
+        self.assertEqual(behind.stats(), {'depth': 0, 'written': 5, 'dropped': 0})
+
+    def test_failed_write_counts_as_dropped(self):
+        behind = self._queue(_Rows(fail=True), flusher=False)
+        behind.put('a')
+        with self.assertLogs('quran_api', 'ERROR'):
+            behind.drain()
+        self.assertEqual(behind.stats()['dropped'], 1)
+
+
+class WriteBehindHistoryTests(TestCase):
+    def test_row_keeps_the_time_it_was_queued(self):
+        user = User.objects.create_user('reader', password='x')
+        behind = WriteBehindQueue(ChatHistory)
+        self.addCleanup(atexit.unregister, behind.drain)
+        queued_at = timezone.now() - timedelta(minutes=5)
+        with mock.patch.object(behind, '_ensure_thread'):
+            behind.put(ChatHistory(user=user, query='q', response='r', created_at=queued_at))
+        behind.drain()
+        self.assertEqual(ChatHistory.objects.get().created_at, queued_at)
+
+
+class AskTestCase(TestCase):
+    """
+    The ask endpoints over a three-verse corpus and the fake LLM; quota,
+    history and ledger rows stay in memory (self.quota, self.history, self.ledger).
+    """
+
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        verses = [
+            {'id': f'v_1_{ayah}', 'reference': f'Sourate 1, Verset {ayah}', 'text_ar': 'الحمد لله',
+             'text_fr': f'Verset {ayah}.', 'metadata': {'sourate': 1, 'sourate_name': 'Al-Fatiha', 'ayah': ayah},
+             'embedding': [float(ayah), 0.0]}
+            for ayah in range(1, 4)
+        ]
+        paths = {'quran_ruku': os.path.join(tmp.name, 'quran_ruku.json')}
+        paths.update(_collection_files(tmp.name, 'quran', verses))
+        with override_settings(COLLECTIONS={'quran': {'source': 'quran'}}), \
+                mock.patch.object(vector_service.index_store, 'resolve', return_value=('test', paths)):
+            self.service = VectorService(model=StubEncoder())
+            self.service.indexes.wait()
+        self.backend = FakeBackend(first_token_latency=0, tokens_per_second=0, answer_tokens=5)
+        self.quota = QuotaService(flush_interval=0)
+        self.addCleanup(atexit.unregister, self.quota.flush)
+        self.history, self.ledger = mock.Mock(), mock.Mock()
+        for target, name, value in (
+                (vector_service, '_vector_service', self.service),
+                (llm_service, '_llm_service', llm_service.LLMService(self.backend)),
+                (views, 'get_quota_service', lambda: self.quota),
+                (views, 'get_history_queue', lambda: self.history),
+                (ledger, 'get_ledger_queue', lambda: self.ledger)):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        plan = SubscriptionPlan.objects.create(name='max', daily_request_limit=-1)
+        user = User.objects.create_user('reader', password='x')
+        UserProfile.objects.filter(user=user).update(subscription_plan=plan)
+        # Reloaded: the instance still caches the profile created with the user
+        self.user = User.objects.get(pk=user.pk)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def ask(self, **data):
+        return self.client.post('/api/ask/', data, format='json')
+
+    def ask_stream(self, **data):
+        response = self.client.post('/api/ask/stream/', data, format='json')
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def saved(self):
+        """ChatHistory rows put in the history queue."""
+        return [call.args[0] for call in self.history.put.call_args_list]
+
+
+class ConversationFollowUpTests(AskTestCase):
+    def test_first_question_starts_a_conversation(self):
+        response = self.ask(q='Que dit le Coran sur la louange ?')
+        self.assertEqual(response.status_code, 200)
+        conversation = Conversation.objects.get(pk=response.json()['conversation_id'])
+        self.assertEqual(conversation.title, 'Que dit le Coran sur la louange ?')
+        self.assertEqual([ref['id'] for ref in conversation.contexts], ['v_1_1'])
+        self.assertEqual([row.conversation_id for row in self.saved()], [conversation.pk])
+
+    def test_follow_up_reuses_the_contexts_without_searching(self):
+        first = self.ask(q='louange').json()
+        with mock.patch.object(VectorService, 'search_with_vectors', side_effect=AssertionError('searched')), \
+                mock.patch.object(llm_service.LLMService, 'rewrite_query', side_effect=AssertionError('rewritten')):
+            response = self.ask(q='Et ensuite ?', conversation_id=first['conversation_id'])
+            events = self.ask_stream(q='Encore ?', conversation_id=first['conversation_id'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['conversation_id'], first['conversation_id'])
+        self.assertEqual(response.json()['sources'], first['sources'])
+        self.assertEqual([event['type'] for event in events][-3:], ['conversation', 'timing', 'done'])
+        self.assertIn('hydrate', events[-2]['data'])
+        self.assertNotIn('faiss', events[-2]['data'])
+        self.assertEqual(Conversation.objects.count(), 1)
+
+    def test_refresh_contexts_searches_again(self):
+        first = self.ask(q='louange').json()
+        with mock.patch.object(VectorService, 'search_with_vectors', wraps=self.service.search_with_vectors) as search:
+            self.ask(q='Et ensuite ?', conversation_id=first['conversation_id'], refresh_contexts=True)
+        search.assert_called_once()
+
+    def test_conversation_of_another_user(self):
+        other = User.objects.create_user('other', password='x')
+        conversation = Conversation.objects.create(user=other, title='ailleurs', contexts=[{'id': 'v_1_1'}])
+        response = self.ask(q='Et ensuite ?', conversation_id=conversation.pk)
+        self.assertEqual(response.status_code, 404)
+        # The refused request does not count
+        self.assertEqual(self.quota.used_today(self.user.profile), 0)
+
+    def test_summary_counts_the_stored_messages(self):
+        conversation = Conversation.objects.create(user=self.user, title='louange', message_count=5)
+        now = timezone.now()
+        rows = [
+            ChatHistory.objects.create(user=self.user, conversation=conversation, query=str(i), response='')
+            for i in range(2)
+        ]
+        ChatHistory.objects.filter(pk=rows[1].pk).update(created_at=now + timedelta(minutes=5))
+        Conversation.record_messages(rows)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.message_count, 2)
+        self.assertEqual(conversation.last_message_at, now + timedelta(minutes=5))
+
+
+class ReadinessTests(AskTestCase):
+    def setUp(self):
+        super().setUp()
+        for patcher in (
+                mock.patch.dict(warmup._state, preloaded=False, warmed_up_at=None, error=None, torch_threads=None),
+                mock.patch.object(warmup, 'start_background_warm_up'),
+                mock.patch.object(self.service, 'start_watching')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _ready(self):
+        response = self.client.get('/api/health/ready/')
+        return response.status_code, response.json()
+
+    def test_not_ready_until_warmed_up(self):
+        code, data = self._ready()
+        self.assertEqual((code, data['ready']), (503, False))
+        warmup.start_background_warm_up.assert_called_once()
+
+        self.assertTrue(warmup.warm_up())
+        code, data = self._ready()
+        self.assertEqual((code, data['ready']), (200, True))
+        self.assertEqual(data['indexes']['version'], 'test')
+        self.assertIsNone(data['reload_error'])
+        self.service.start_watching.assert_called_once()
+
+    def test_failed_warm_up_is_reported(self):
+        with mock.patch.object(self.service, 'search', side_effect=RuntimeError('encoder unavailable')), \
+                self.assertLogs('quran_api', 'ERROR'):
+            self.assertFalse(warmup.warm_up())
+        code, data = self._ready()
+        self.assertEqual((code, data['error']), (503, 'encoder unavailable'))
+
+    def test_preload_loads_everything_before_fork(self):
+        with mock.patch.object(warmup, '_set_torch_threads', return_value=8) as threads, \
+                mock.patch.object(warmup.gc, 'freeze') as freeze, \
+                mock.patch.object(self.service.indexes, 'wait', wraps=self.service.indexes.wait) as wait:
+            warmup.preload()
+        threads.assert_called_once_with(1)
+        wait.assert_called_once()
+        freeze.assert_called_once()
+        self.assertTrue(warmup._state['preloaded'])
+
+        # The worker gets its torch threads back when it warms up
+        with mock.patch.object(warmup, '_set_torch_threads') as threads:
+            warmup.warm_up()
+        threads.assert_called_once_with(8)
+
+
+class LedgerRecordTests(AskTestCase):
+    # Long enough to be rewritten
+    QUESTION = 'Que dit le Coran sur la patience dans les épreuves ?'
+
+    def _rows(self):
+        return [call.args[0] for call in self.ledger.put.call_args_list]
+
+    def test_answered_ask_is_recorded(self):
+        response = self.ask(q=self.QUESTION)
+        [row] = self._rows()
+        self.assertEqual(row.request_id, response['X-Request-ID'])
+        self.assertEqual((row.user_id, row.plan, row.endpoint, row.success), (self.user.id, 'max', 'quran_ask', True))
+        # The fake backend counts 4 words for the rewrite and 5 for the answer
+        self.assertEqual(row.completion_tokens, 9)
+        self.assertGreater(row.prompt_tokens, 0)
+        self.assertLessEqual({'rewrite', 'encode', 'faiss', 'pack', 'generate'}, set(row.stages))
+        self.assertGreaterEqual(row.total_ms, int(sum(row.stages.values())) - len(row.stages))
+
+    def test_repeated_question_records_its_cache_hits(self):
+        self.ask(q=self.QUESTION)
+        self.ask(q=self.QUESTION)
+        first, second = self._rows()
+        self.assertEqual(first.cache_hits, [])
+        self.assertLessEqual({'rewrite', 'embedding', 'retrieval'}, set(second.cache_hits))
+        self.assertEqual(second.completion_tokens, 5)
+
+
+class LedgerReportTests(TestCase):
+    def _row(self, plan, total_ms, days_ago=0, success=True, **fields):
+        RequestLedger.objects.create(
+            request_id='r', plan=plan, endpoint='quran_ask', success=success, total_ms=total_ms,
+            created_at=timezone.now() - timedelta(days=days_ago), **fields,
+        )
+
+    def setUp(self):
+        for total_ms in range(1, 101):
+            self._row('max', total_ms, prompt_tokens=10, completion_tokens=2,
+                      stages={'faiss': total_ms / 10, 'unknown': 1}, cache_hits=['rewrite'] if total_ms % 2 else [])
+        self._row('free', 40, success=False)
+        self._row('max', 500, days_ago=1)
+        self._row('max', 900, days_ago=3)
+
+    def test_grouped_by_day_and_plan(self):
+        report = ledger.daily_report(days=2)
+        self.assertEqual([(row['plan'], row['requests'], row['errors']) for row in report],
+                         [('free', 1, 1), ('max', 100, 0), ('max', 1, 0)])
+        today = report[1]
+        self.assertEqual((today['prompt_tokens'], today['completion_tokens']), (1000, 200))
+        self.assertEqual(today['cache_hits'], {'rewrite': 50})
+        self.assertEqual(today['total_ms'], {'p50': 50.5, 'p95': 95.0, 'p99': 99.0})
+        self.assertEqual(list(today['stages_ms']), ['faiss'])
+        self.assertEqual(report[0]['stages_ms'], {})
+
+    def test_plan_filter_and_command(self):
+        self.assertEqual([row['requests'] for row in ledger.daily_report(days=7, plan='max')], [100, 1, 1])
+        out = io.StringIO()
+        call_command('ledger_report', '--days', '1', '--plan', 'free', '--json', stdout=out)
+        self.assertEqual([(row['plan'], row['errors']) for row in json.loads(out.getvalue())], [('free', 1)])
+
+
+class BackfillConversationsTests(TransactionTestCase):
+    BEFORE = [('quran_api', '0007_requestledger')]
+    AFTER = [('quran_api', '0008_backfill_conversations')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_one_conversation_per_legacy_row(self):
+        apps = self._migrate(self.BEFORE)
+        self.addCleanup(self._migrate, self.AFTER)
+        User = apps.get_model('auth', 'User')
+        ChatHistory = apps.get_model('quran_api', 'ChatHistory')
+        Conversation = apps.get_model('quran_api', 'Conversation')
+        user = User.objects.create(username='reader')
+        question = 'Que dit le Coran sur la patience ' * 5
+        legacy = ChatHistory.objects.create(
+            user=user, query=question, response='...',
+            sources=[{'id': 'v_2_153', 'score': 0.2}, 'texte ancien'],
+        )
+        ChatHistory.objects.filter(pk=legacy.pk).update(created_at=timezone.now() - timedelta(days=30))
+        threaded = Conversation.objects.create(user=user, title='déjà', message_count=1)
+        ChatHistory.objects.create(user=user, conversation=threaded, query='déjà', response='...')
+
+        self._migrate(self.AFTER)
+
+        row = ChatHistory.objects.get(pk=legacy.pk)
+        conversation = Conversation.objects.get(pk=row.conversation_id)
+        self.assertEqual(conversation.title, question[:80].rstrip() + '…')
+        self.assertEqual(conversation.contexts, [{'id': 'v_2_153', 'score': 0.2}])
+        self.assertEqual(conversation.message_count, 1)
+        self.assertEqual(conversation.last_message_at, row.created_at)
+        self.assertEqual(Conversation.objects.count(), 2)
+        self.assertFalse(ChatHistory.objects.filter(conversation__isnull=True).exists())
+
+
+class HistorySourcesTests(AskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.conversation = Conversation.objects.create(user=self.user, title='louange', message_count=1)
+        self.entry = ChatHistory.objects.create(
+            user=self.user, conversation=self.conversation, query='louange', response='...',
+            sources=[{'id': 'v_1_2', 'score': 0.5}, {'id': 'v_1_1', 'score': 0.7, 'ayah_start': 1, 'ayah_end': 2}],
+        )
+
+    def test_compact_references_hydrated_from_the_corpus(self):
+        sources = self.client.get(f'/api/history/{self.entry.pk}/').json()['sources']
+        self.assertEqual([source['text_fr'] for source in sources], ['Verset 2.', '(1) Verset 1. (2) Verset 2.'])
+        self.assertEqual([source['score'] for source in sources], [0.5, 0.7])
+
+    def test_unloaded_corpus_answers_503(self):
+        with mock.patch.object(vector_service, '_vector_service', None):
+            for url in (f'/api/history/{self.entry.pk}/', f'/api/conversations/{self.conversation.pk}/'):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response.json()['error_code'], 'warming_up')
+                self.assertEqual(response['Retry-After'], '5')
+            # Nothing was loaded to answer
+            self.assertFalse(vector_service.is_vector_service_loaded())
+
+    def test_legacy_full_sources_need_no_corpus(self):
+        legacy = [{'id': 'v_1_1', 'text_fr': 'Verset 1.', 'text_ar': 'الحمد لله', 'score': 0.2}]
+        ChatHistory.objects.filter(pk=self.entry.pk).update(sources=legacy)
+        with mock.patch.object(vector_service, '_vector_service', None):
+            response = self.client.get(f'/api/history/{self.entry.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['sources'], legacy)
+
+    def test_unknown_document_kept_as_stored(self):
+        ChatHistory.objects.filter(pk=self.entry.pk).update(sources=[{'id': 'v_9_9', 'score': 0.1}])
+        self.assertEqual(self.client.get(f'/api/history/{self.entry.pk}/').json()['sources'], [{'id': 'v_9_9', 'score': 0.1}])
+
+
+class EditionHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Stand-in for the hadith-api CDN, serving the files of `server.editions`
+    with ETag / Last-Modified validators and Range + If-Range. Requests are
+    logged in `server.log`; `server.failures[name]` scripts the next answers
+    of a file ('truncate' or a status code).
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _empty(self, code, **headers):
+        self.send_response(code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        name = self.path.rsplit('/', 1)[-1]
+        self.server.log.append((name, dict(self.headers)))
+        failure = self.server.failures.get(name, []).pop(0) if self.server.failures.get(name) else None
+        if isinstance(failure, int):
+            return self._empty(failure)
+
+        path = os.path.join(self.server.editions, name)
+        if not os.path.exists(path):
+            return self._empty(404)
+        with open(path, 'rb') as f:
+            data = f.read()
+        validators = {'Last-Modified': formatdate(os.path.getmtime(path), usegmt=True)}
+        if self.server.use_etag:
+            validators['ETag'] = f'"{len(data)}-{hash(data) & 0xffff}"'
+
+        if (self.headers.get('If-None-Match') == validators.get('ETag') is not None
+                or (self.headers.get('If-None-Match') is None
+                    and self.headers.get('If-Modified-Since') == validators['Last-Modified'])):
+            return self._empty(304, **validators)
+
+        start, code = 0, 200
+        if self.headers.get('Range') and self.headers.get('If-Range') in validators.values():
+            start, code = int(self.headers['Range'].split('=')[1].rstrip('-')), 206
+        body = data[start:]
+        self.send_response(code)
+        for header, value in validators.items():
+            self.send_header(header, value)
+        self.send_header('Content-Length', str(len(body)))
+        if code == 206:
+            self.send_header('Content-Range', f'bytes {start}-{len(data) - 1}/{len(data)}')
+        self.end_headers()
+        if failure == 'truncate':
+            # Connection lost after a third of the body
+            self.wfile.write(body[:len(body) // 3])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+def _edition(numbers, language, texts=None):
+    texts = texts or {}
+    return {'metadata': {'name': language}, 'hadiths': [
+        {'hadithnumber': n, 'text': texts.get(n, f'<p>{language} {n}</p>'), 'reference': {'book': 1, 'hadith': n},
+         'grades': []}
+        for n in numbers
+    ]}
+
+
+class FetchHadithTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.editions = os.path.join(tmp.name, 'editions')
+        self.cache_dir = os.path.join(tmp.name, 'cache')
+        self.output_dir = tmp.name
+        os.makedirs(self.editions)
+        os.makedirs(self.cache_dir)
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), EditionHandler)
+        self.server.editions, self.server.log, self.server.failures, self.server.use_etag = self.editions, [], {}, True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}/editions'
+        # Retries and progress are logged at WARNING / INFO
+        patcher = mock.patch.object(fetch_hadith.logger, 'disabled', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _publish(self, name, content):
+        with open(os.path.join(self.editions, name), 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False)
+
+    def _download(self, name, **kwargs):
+        with requests.Session() as session:
+            return fetch_hadith.download(session, f'{self.base_url}/{name}', os.path.join(self.cache_dir, name),
+                                         timeout=5, backoff=0, **kwargs)
+
+    def _headers(self, name):
+        return [headers for logged, headers in self.server.log if logged == name]
+
+    def test_truncated_download_resumes_with_range(self):
+        edition = _edition(range(1, 2000), 'fra')
+        self._publish('fra-bukhari.json', edition)
+        self.server.failures['fra-bukhari.json'] = ['truncate']
+        self.assertEqual(self._download('fra-bukhari.json'), 'resumed')
+
+        with open(os.path.join(self.cache_dir, 'fra-bukhari.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f), edition)
+        first, retry = self._headers('fra-bukhari.json')
+        self.assertEqual(first['Accept-Encoding'], 'identity')
+        self.assertNotIn('Range', first)
+        self.assertRegex(retry['Range'], r'^bytes=[1-9]\d*-$')
+        self.assertIsNotNone(retry['If-Range'])
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, 'fra-bukhari.json.part')))
+
+    def test_changed_resource_restarts_the_part(self):
+        self._publish('fra-bukhari.json', _edition(range(1, 2000), 'fra'))
+        self.server.failures['fra-bukhari.json'] = ['truncate']
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            self._download('fra-bukhari.json', retries=0)
+        edition = _edition(range(1, 1500), 'fra')
+        self._publish('fra-bukhari.json', edition)
+        # If-Range no longer matches: a full 200 replaces the .part
+        self.assertEqual(self._download('fra-bukhari.json'), 'downloaded')
+        with open(os.path.join(self.cache_dir, 'fra-bukhari.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f), edition)
+
+    def test_unchanged_edition_answers_304_on_etag(self):
+        self._publish('ara-bukhari.json', _edition([1, 2], 'ara'))
+        self.assertEqual(self._download('ara-bukhari.json'), 'downloaded')
+        self.assertEqual(self._download('ara-bukhari.json'), 'unchanged')
+        self.assertIn('If-None-Match', self._headers('ara-bukhari.json')[1])
+
+    def test_unchanged_edition_answers_304_on_last_modified(self):
+        self.server.use_etag = False
+        self._publish('ara-bukhari.json', _edition([1, 2], 'ara'))
+        self.assertEqual(self._download('ara-bukhari.json'), 'downloaded')
+        self.assertEqual(self._download('ara-bukhari.json'), 'unchanged')
+        second = self._headers('ara-bukhari.json')[1]
+        self.assertNotIn('If-None-Match', second)
+        self.assertIn('If-Modified-Since', second)
+
+    def test_server_errors_are_retried(self):
+        self._publish('ara-bukhari.json', _edition([1, 2], 'ara'))
+        self.server.failures['ara-bukhari.json'] = [503, 500]
+        self.assertEqual(self._download('ara-bukhari.json', retries=2), 'downloaded')
+        self.assertEqual(len(self._headers('ara-bukhari.json')), 3)
+
+        self.server.failures['fra-bukhari.json'] = [503, 503]
+        self._publish('fra-bukhari.json', _edition([1], 'fra'))
+        with self.assertRaises(requests.HTTPError):
+            self._download('fra-bukhari.json', retries=1)
+
+    def test_client_errors_are_not_retried(self):
+        with self.assertRaises(requests.HTTPError):
+            self._download('fra-missing.json', retries=3)
+        self.assertEqual(len(self._headers('fra-missing.json')), 1)
+
+    def test_merge_by_hadith_number_in_stream(self):
+        fra = _edition([1, 2, 3, 5, 6], 'fra')
+        ara = _edition([2, 1, 3, 4, 5, 6], 'ara', texts={6: ''})
+        fra_path, ara_path = os.path.join(self.cache_dir, 'fra.json'), os.path.join(self.cache_dir, 'ara.json')
+        for path, content in ((fra_path, fra), (ara_path, ara)):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(content, f, ensure_ascii=False)
+        output = os.path.join(self.output_dir, 'bukhari_complet.json')
+        # Tiny reads: objects and the array key cross the read boundaries
+        with mock.patch.object(fetch_hadith, 'CHUNK_SIZE', 7):
+            count = fetch_hadith.merge_editions('bukhari', fra_path, ara_path, output)
+
+        with open(output, encoding='utf-8') as f:
+            merged = json.load(f)
+        self.assertEqual(count, 4)
+        self.assertEqual([(h['hadith_number'], h['text_fr'], h['text_ar']) for h in merged],
+                         [(n, f'fra {n}', f'ara {n}') for n in (1, 2, 3, 5)])
+        self.assertEqual(merged[0]['collection'], 'Sahih al-Bukhari')
+
+    def test_fetch_from_a_local_base_url(self):
+        for collection in ('bukhari', 'muslim'):
+            self._publish(f'fra-{collection}.json', _edition([1, 2], 'fra'))
+            self._publish(f'ara-{collection}.json', _edition([1, 2], 'ara'))
+        command = [sys.executable, 'fetch_hadith.py', '--collections', 'bukhari,muslim', '--base-url', self.base_url,
+                   '--cache-dir', self.cache_dir, '--output-dir', self.output_dir, '--workers', '2']
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        subprocess.run(command, cwd=root, check=True, capture_output=True)
+        with open(os.path.join(self.output_dir, 'muslim_complet.json'), encoding='utf-8') as f:
+            self.assertEqual([h['text_ar'] for h in json.load(f)], ['ara 1', 'ara 2'])
+
+        # Second run: every edition answers 304
+        self.server.log.clear()
+        subprocess.run(command, cwd=root, check=True, capture_output=True)
+        self.assertEqual(len(self.server.log), 4)
+        self.assertTrue(all('If-None-Match' in headers for _, headers in self.server.log))
+
+    def test_one_session_per_worker_thread(self):
+        for collection in ('bukhari', 'muslim', 'malik'):
+            self._publish(f'fra-{collection}.json', _edition([1], 'fra'))
+            self._publish(f'ara-{collection}.json', _edition([1], 'ara'))
+        used = []
+        download = fetch_hadith.download
+
+        def recording_download(session, *args, **kwargs):
+            used.append((threading.current_thread().name, session))
+            return download(session, *args, **kwargs)
+
+        with mock.patch.object(fetch_hadith, 'download', recording_download):
+            self.assertTrue(fetch_hadith.fetch_collections(
+                ['bukhari', 'muslim', 'malik'], self.base_url, self.cache_dir, self.output_dir, workers=2, timeout=5
+            ))
+        sessions = {}
+        for thread, session in used:
+            sessions.setdefault(thread, set()).add(id(session))
+        self.assertTrue(all(len(ids) == 1 for ids in sessions.values()))
+        self.assertEqual(len({id(session) for _, session in used}), len(sessions))
+
+
+class FakeBackendTests(SimpleTestCase):
+    def test_answer_depends_only_on_the_prompt(self):
+        backend = FakeBackend(first_token_latency=0, tokens_per_second=0, answer_tokens=8)
+        self.assertEqual(backend.generate('prompt'), FakeBackend(0, 0, answer_tokens=8, seed=3).generate('prompt'))
+        self.assertEqual(''.join(backend.stream('prompt')), backend.generate('prompt'))
+        self.assertEqual(len(backend.generate('prompt').split()), 8)
+
+    def test_failure_before_the_first_chunk(self):
+        backend = FakeBackend(first_token_latency=0, tokens_per_second=0, failure_rate=1)
+        with self.assertRaises(LLMBackendError):
+            next(backend.stream('prompt'))
+        with self.assertRaises(LLMBackendError):
+            backend.generate('prompt')
+
+    def test_failure_mid_stream(self):
+        backend = FakeBackend(first_token_latency=0, tokens_per_second=0, failure_rate=1, fail_after_tokens=3)
+        chunks = []
+        with self.assertRaises(LLMBackendError):
+            for chunk in backend.stream('prompt'):
+                chunks.append(chunk)
+        self.assertEqual(len(chunks), 3)
+
+
+class GenerationFailureTests(AskTestCase):
+    def _ledger(self):
+        return [(row.endpoint, row.success) for row in (call.args[0] for call in self.ledger.put.call_args_list)]
+
+    def test_unconfigured_backend_answers_503_before_reserving(self):
+        with mock.patch.object(llm_service.get_llm_service(), 'backend', None):
+            response = self.ask(q='patience')
+            stream = self.client.post('/api/ask/stream/', {'q': 'patience'}, format='json')
+        for answer in (response, stream):
+            self.assertEqual(answer.status_code, 503)
+            self.assertEqual(answer.json()['error_code'], 'llm_not_configured')
+        self.assertEqual(self.quota.used_today(self.user.profile), 0)
+        self.assertEqual(self._ledger(), [])
+
+    def test_failed_answer_is_given_back_and_recorded(self):
+        self.backend.failure_rate = 1
+        with self.assertLogs('quran_api', 'ERROR'):
+            response = self.ask(q='patience')
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(self.quota.used_today(self.user.profile), 0)
+        self.assertEqual(self._ledger(), [('quran_ask', False)])
+        self.assertEqual(self.saved(), [])
+
+    def test_stream_broken_mid_answer_is_given_back(self):
+        self.backend.failure_rate, self.backend.fail_after_tokens = 1, 2
+        with self.assertLogs('quran_api', 'ERROR'):
+            events = self.ask_stream(q='patience')
+        self.assertEqual([event['type'] for event in events], ['sources', 'token', 'token', 'error'])
+        self.assertEqual(events[-1]['data'], 'La génération de la réponse a été interrompue.')
+        self.assertEqual(self.quota.used_today(self.user.profile), 0)
+        self.assertEqual(self._ledger(), [('quran_ask_stream', False)])
+        self.assertEqual(self.saved(), [])
+
+    def test_answered_stream_counts(self):
+        events = self.ask_stream(q='patience')
+        self.assertEqual(events[-1], {'type': 'done'})
+        self.assertEqual(self.quota.used_today(self.user.profile), 1)
+        self.assertEqual(self._ledger(), [('quran_ask_stream', True)])
+        self.assertEqual(len(self.saved()), 1)
+
+
+class StreamTimingTests(SimpleTestCase):
+    def test_generate_excludes_the_consumer(self):
+        service = llm_service.LLMService(FakeBackend(first_token_latency=0, tokens_per_second=0, answer_tokens=3))
+        with timing.request_timer() as timer:
+            for chunk in service.generate_response_stream('patience', []):
+                time.sleep(0.05)
+        self.assertIn('ttft', timer.stages)
+        self.assertLess(timer.stages['generate'], 50)
+
+    def test_generate_recorded_when_the_client_leaves(self):
+        service = llm_service.LLMService(FakeBackend(first_token_latency=0, tokens_per_second=0, answer_tokens=3))
+        with timing.request_timer() as timer:
+            stream = service.generate_response_stream('patience', [])
+            next(stream)
+            stream.close()
+        self.assertIn('generate', timer.stages)
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.workers = [Metrics(flush_interval=0) for _ in range(2)]
+        for worker in self.workers:
+            self.addCleanup(atexit.unregister, worker.flush)
+
+    def test_workers_register_their_series_side_by_side(self):
+        first, second = self.workers
+        first.observe('stage', 'faiss', 0.002)
+        second.observe('stage', 'generate', 1.2)
+        # A worker registering a series must not drop the other's
+        second.flush()
+        first.flush()
+        first.observe('request', 'quran_ask', 1.3)
+        first.flush()
+
+        text = second.render()
+        self.assertIn('quran_stage_duration_seconds_count{stage="faiss"} 1', text)
+        self.assertIn('quran_stage_duration_seconds_count{stage="generate"} 1', text)
+        self.assertIn('quran_request_duration_seconds_count{endpoint="quran_ask"} 1', text)
+
+    def test_a_series_gets_one_slot(self):
+        for worker in self.workers:
+            worker.observe('stage', 'faiss', 0.002)
+            worker.flush()
+            worker.observe('stage', 'faiss', 0.3)
+            worker.flush()
+        self.assertEqual(cache.get('metrics:series:count'), 1)
+        text = self.workers[0].render()
+        self.assertIn('quran_stage_duration_seconds_count{stage="faiss"} 4', text)
+        self.assertIn('quran_stage_duration_seconds_bucket{stage="faiss",le="0.005"} 2', text)
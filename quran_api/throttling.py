@@ -0,0 +1,29 @@
+"""
+Per-plan token bucket throttle of the search and ask views.
+
+One bucket per user (per client IP for anonymous requests, resolved by
+DRF's get_ident(): REMOTE_ADDR, or X-Forwarded-For as seen by the
+NUM_PROXIES trusted proxies, see core/settings.py), shared by search and
+ask; rates come from ADMISSION['rates'] (see services/admission.py).
+"""
+
+from rest_framework.throttling import BaseThrottle
+
+from .services import admission
+
+
+class PlanTokenBucketThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        plan = admission.tier(request.user)
+        rate, burst = admission.config('rates')[plan]
+        if rate is None:
+            return True
+        if request.user and request.user.is_authenticated:
+            client = f"user:{request.user.id}"
+        else:
+            client = f"ip:{self.get_ident(request)}"
+        allowed, self._wait = admission.take_token(client, rate, burst)
+        return allowed
+
+    def wait(self):
+        return self._wait
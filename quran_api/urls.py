@@ -1,14 +1,27 @@
 from django.urls import path
 from .views import (
     QuranSearchView, QuranAskView, quran_ask_stream, 
-    RegisterView, LoginView, ChatHistoryListView
+    RegisterView, LoginView, LogoutView, ChatHistoryListView, ChatHistoryDetailView,
+    ConversationListView, ConversationDetailView,
+    RelatedDocumentsView, ConcordanceView, SuggestView, IndexReloadView, MemoryReportView, prometheus_metrics, readiness
 )
 
 urlpatterns = [
     path('auth/register/', RegisterView.as_view(), name='register'),
     path('auth/login/', LoginView.as_view(), name='login'),
+    path('auth/logout/', LogoutView.as_view(), name='logout'),
     path('history/', ChatHistoryListView.as_view(), name='chat_history'),
+    path('history/<int:pk>/', ChatHistoryDetailView.as_view(), name='chat_history_detail'),
+    path('conversations/', ConversationListView.as_view(), name='conversations'),
+    path('conversations/<int:pk>/', ConversationDetailView.as_view(), name='conversation_detail'),
     path('search/', QuranSearchView.as_view(), name='quran_search'),
+    path('related/<str:doc_id>/', RelatedDocumentsView.as_view(), name='related_documents'),
+    path('concordance/', ConcordanceView.as_view(), name='concordance'),
+    path('suggest/', SuggestView.as_view(), name='suggest'),
     path('ask/', QuranAskView.as_view(), name='quran_ask'),
     path('ask/stream/', quran_ask_stream, name='quran_ask_stream'),
+    path('metrics/', prometheus_metrics, name='metrics'),
+    path('health/ready/', readiness, name='readiness'),
+    path('indexes/reload/', IndexReloadView.as_view(), name='index_reload'),
+    path('memory/', MemoryReportView.as_view(), name='memory_report'),
 ]
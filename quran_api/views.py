@@ -1,24 +1,166 @@
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from rest_framework.authtoken.models import Token
-from django.http import StreamingHttpResponse, JsonResponse
+from django.http import HttpResponse, StreamingHttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
-from rest_framework.decorators import api_view, permission_classes
-from .services.vector_service import get_vector_service
-from .services.llm_service import get_llm_service
-from .models import ChatHistory
-from .serializers import UserSerializer, ChatHistorySerializer
+from django.views.decorators.http import require_GET, require_POST
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from .services.vector_service import get_vector_service, is_vector_service_loaded
+from .services.llm_service import GenerationError, LLMNotConfigured, get_llm_service
+from .services.prompt_builder import pack_contexts
+from .services.related_service import get_related_service
+from .services.concordance_service import get_concordance_service
+from .services.quota_service import get_quota_service
+from .services.write_behind import get_history_queue
+from .services.source_refs import SourcesUnavailable, compact_sources
+from .services.metrics import get_metrics
+from .services import timing
+from .services import admission, conversation_service, index_store, ledger, memory_report, warmup
+from .models import ChatHistory, Conversation
+from .serializers import (
+    UserSerializer, ChatHistorySerializer, ChatHistoryListSerializer, ConversationListSerializer
+)
+from .pagination import ChatHistoryCursorPagination, ConversationCursorPagination
+from .throttling import PlanTokenBucketThrottle
 import json
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 
+def _verse_expansion(data, default_window=0):
+    """
+    Read the verse expansion options of a request: `window` (±N ayat,
+    capped by MAX_VERSE_WINDOW) and `ruku` (expand to the whole ruku).
+    """
+    try:
+        window = int(data.get('window', default_window))
+    except (TypeError, ValueError):
+        window = default_window
+    window = max(0, min(window, settings.MAX_VERSE_WINDOW))
+    ruku = str(data.get('ruku', '')).lower() in ('1', 'true')
+    return window, ruku
+
+
+def _parse_limit(data, default):
+    """`limit` of a request, between 1 and SEARCH_MAX_TOP_K; ValueError if not an integer."""
+    try:
+        limit = int(data.get('limit', default))
+    except (TypeError, ValueError):
+        raise ValueError("Le paramètre 'limit' doit être un entier.")
+    return max(1, min(limit, getattr(settings, 'SEARCH_MAX_TOP_K', 20)))
+
+
+def _overloaded(e):
+    """503 of a request shed by the search gate (services/admission.py)."""
+    response = Response(
+        {
+            "error": "Le service est surchargé, veuillez réessayer dans quelques secondes.",
+            "error_code": "overloaded",
+            "retry_after": e.retry_after
+        },
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(e.retry_after)
+    return response
+
+
+def _llm_not_configured():
+    """503 of an ask while no LLM backend is configured (nothing reserved yet)."""
+    return Response(
+        {"error": str(LLMNotConfigured()), "error_code": "llm_not_configured"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
+def _warming_up(e):
+    """503 of a history read while this worker loads the corpus its sources come from."""
+    response = Response(
+        {
+            "error": "Les sources de cet historique sont en cours de chargement, veuillez réessayer.",
+            "error_code": "warming_up",
+            "retry_after": e.retry_after
+        },
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(e.retry_after)
+    return response
+
+
+def _conversation_refs(user, data):
+    """
+    Conversation of a request and the contexts a follow-up can reuse.
+
+    Returns (conversation_id, refs); refs is None when the question must run
+    the full pipeline (new conversation or `refresh_contexts`). Raises
+    LookupError if the conversation is not the user's.
+    """
+    value = data.get('conversation_id')
+    if value in (None, ''):
+        return None, None
+    conversation_id = int(value)
+    refs = conversation_service.get_contexts(user.id, conversation_id)
+    if refs is None:
+        raise LookupError(conversation_id)
+    if str(data.get('refresh_contexts', '')).lower() in ('1', 'true'):
+        return conversation_id, None
+    return conversation_id, refs
+
+
+def _retrieve_contexts(query, refs, source_filter, window, ruku, top_k, plan):
+    """
+    Packed contexts for a question: a follow-up reuses the conversation's
+    contexts (hydrated from the loaded corpus, no rewrite nor search),
+    otherwise the query is rewritten and searched. Returns (packed, reused).
+    The search waits for a slot of the search gate with the priority of
+    `plan`; raises admission.Overloaded when shed.
+    """
+    vector_service = get_vector_service()
+    if refs:
+        with timing.stage('hydrate'):
+            contexts = [ctx for ctx in (vector_service.hydrate(ref) for ref in refs) if ctx is not None]
+        if contexts:
+            timing.cache_hit('followup')
+            with timing.stage('pack'):
+                return pack_contexts(query, contexts), True
+
+    optimized_query = get_llm_service().rewrite_query(query)
+    with admission.get_search_gate().slot(admission.PRIORITIES[plan]):
+        contexts, vectors, query_vector = vector_service.search_with_vectors(
+            optimized_query, top_k=top_k, source_filter=source_filter,
+            window=window, ruku=ruku
+        )
+    with timing.stage('pack'):
+        return pack_contexts(query, contexts, vectors, query_vector), False
+
+
+def _save_exchange(user, conversation_id, query, answer, sources, packed, reused):
+    """Store the exchange (written behind); returns the conversation id."""
+    with timing.stage('history'):
+        refs = compact_sources(packed.selected)
+        if conversation_id is None:
+            conversation_id = conversation_service.start_conversation(user, query, refs).id
+        elif not reused:
+            conversation_service.store_contexts(user.id, conversation_id, refs)
+
+        get_history_queue().put(ChatHistory(
+            user=user,
+            conversation_id=conversation_id,
+            query=query,
+            response=answer,
+            sources=compact_sources(sources),
+            created_at=timezone.now(),
+        ))
+    return conversation_id
+
+
 class RegisterView(APIView):
     permission_classes = [AllowAny]
 
@@ -63,13 +205,77 @@ class LoginView(APIView):
         return Response({'error': 'Identifiants invalides.'}, status=status.HTTP_401_UNAUTHORIZED)
 
 
+class LogoutView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # Deleting the token also drops its cached authentication entry
+        if isinstance(request.auth, Token):
+            Token.objects.filter(key=request.auth.key).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class ChatHistoryListView(APIView):
+    """
+    Sidebar history: cursor-paginated, lean entries (id, query preview, date).
+    The full response and sources come from ChatHistoryDetailView.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        history = ChatHistory.objects.filter(user=request.user).only('id', 'query', 'created_at')
+        paginator = ChatHistoryCursorPagination()
+        page = paginator.paginate_queryset(history, request, view=self)
+        serializer = ChatHistoryListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class ChatHistoryDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        item = ChatHistory.objects.filter(user=request.user, pk=pk).first()
+        if item is None:
+            return Response({"error": "Historique introuvable."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            return Response(ChatHistorySerializer(item).data, status=status.HTTP_200_OK)
+        except SourcesUnavailable as e:
+            return _warming_up(e)
+
+
+class ConversationListView(APIView):
+    """Sidebar conversations, most recently active first."""
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        history = ChatHistory.objects.filter(user=request.user)
-        serializer = ChatHistorySerializer(history, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # A conversation whose first message is not stored yet (or was dropped) is not listed
+        conversations = Conversation.objects.filter(user=request.user, message_count__gt=0).only(
+            'id', 'title', 'message_count', 'last_message_at'
+        )
+        paginator = ConversationCursorPagination()
+        page = paginator.paginate_queryset(conversations, request, view=self)
+        serializer = ConversationListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class ConversationDetailView(APIView):
+    """Messages of a conversation, oldest first."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        conversation = Conversation.objects.filter(user=request.user, pk=pk).only(
+            'id', 'title', 'message_count', 'last_message_at'
+        ).first()
+        if conversation is None:
+            return Response({"error": "Conversation introuvable."}, status=status.HTTP_404_NOT_FOUND)
+
+        messages = conversation.messages.order_by('created_at')
+        data = ConversationListSerializer(conversation).data
+        try:
+            data['messages'] = ChatHistorySerializer(messages, many=True).data
+        except SourcesUnavailable as e:
+            return _warming_up(e)
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class QuranSearchView(APIView):
@@ -77,10 +283,10 @@ class QuranSearchView(APIView):
     Search Quranic verses by semantic similarity (FAISS).
     """
     permission_classes = [AllowAny] # Optionnel: restreindre si besoin
+    throttle_classes = [PlanTokenBucketThrottle]
 
     def get(self, request):
         query = request.query_params.get('q', None)
-        top_k = int(request.query_params.get('limit', 5))
 
         if not query:
             return Response(
@@ -88,10 +294,21 @@ class QuranSearchView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        try:
+            top_k = _parse_limit(request.query_params, 5)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        window, ruku = _verse_expansion(request.query_params)
+        priority = admission.PRIORITIES[admission.tier(request.user)]
+
         try:
             service = get_vector_service()
-            results = service.search(query, top_k)
+            with admission.get_search_gate().slot(priority):
+                results = service.search(query, top_k, window=window, ruku=ruku)
             return Response(results, status=status.HTTP_200_OK)
+        except admission.Overloaded as e:
+            return _overloaded(e)
         except Exception as e:
             logger.exception(f"Erreur lors de la recherche FAISS: {e}")
             return Response(
@@ -100,19 +317,130 @@ class QuranSearchView(APIView):
             )
 
 
+class RelatedDocumentsView(APIView):
+    """
+    Verses / hadiths similar to a document, served from the
+    precomputed neighbours table (index_related.py).
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, doc_id):
+        service = get_related_service()
+        if not service.available:
+            return Response(
+                {"error": "La table des documents similaires n'est pas disponible."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response(
+                {"error": "Le paramètre 'limit' doit être un entier."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        related = service.related(doc_id, limit=max(1, limit))
+        if related is None:
+            return Response(
+                {"error": f"Document '{doc_id}' introuvable."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({"id": doc_id, "related": related}, status=status.HTTP_200_OK)
+
+
+class ConcordanceView(APIView):
+    """
+    Every occurrence of an Arabic word, phrase or prefix (`word*`) in the
+    Quran and the hadiths, paginated by offset, from the positional index
+    built by index_concordance.py.
+    """
+    permission_classes = [AllowAny]
+    MAX_LIMIT = 500
+    MAX_CONTEXT = 20
+
+    def get(self, request):
+        service = get_concordance_service()
+        if not service.available:
+            return Response(
+                {"error": "La concordance n'est pas disponible."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        query = request.query_params.get('q', '')
+        source = request.query_params.get('source', 'both')
+        if source not in ('both', 'quran', 'hadith'):
+            return Response(
+                {"error": "Le paramètre 'source' doit valoir both, quran ou hadith."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            offset = max(0, int(request.query_params.get('offset', 0)))
+            limit = max(1, min(int(request.query_params.get('limit', 50)), self.MAX_LIMIT))
+            context = max(0, min(int(request.query_params.get('context', 5)), self.MAX_CONTEXT))
+        except ValueError:
+            return Response(
+                {"error": "Les paramètres 'offset', 'limit' et 'context' doivent être des entiers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            result = service.search(query, source=source, offset=offset, limit=limit, context=context)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        result['offset'] = offset
+        result['next_offset'] = offset + limit if offset + limit < result['total'] else None
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class SuggestView(APIView):
+    """
+    Typeahead of the search box: sourate names, verse references ("2:255")
+    and frequent words starting with `q`, from an index built with the
+    loaded indexes. Never loads the encoder: 503 until the worker's
+    warm-up has loaded the vector service.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', 8))
+        except ValueError:
+            return Response(
+                {"error": "Le paramètre 'limit' doit être un entier."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        index = get_vector_service().indexes.suggestions if is_vector_service_loaded() else None
+        if index is None:
+            return Response(
+                {"error": "Les suggestions ne sont pas encore disponibles."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        suggestions = index.suggest(query, limit=limit)
+        return Response({"query": query, "suggestions": suggestions}, status=status.HTTP_200_OK)
+
+
 class QuranAskView(APIView):
     """
     Ask a question about the Quran (non-streaming).
     Requires Authentication and uses quotas.
     """
     permission_classes = [IsAuthenticated]
+    throttle_classes = [PlanTokenBucketThrottle]
     SEARCH_TOP_K = 10
 
     def post(self, request):
-        # Vérification du quota
+        if not get_llm_service().configured:
+            return _llm_not_configured()
+
+        # Vérification du quota (réservation atomique)
         profile = request.user.profile
-        if not profile.can_make_request():
-            from django.utils import timezone
+        quota = get_quota_service()
+        with timing.stage('quota'):
+            reservation = quota.reserve(profile)
+        if not reservation.allowed:
             import datetime
             
             now = timezone.localtime()
@@ -132,41 +460,67 @@ class QuranAskView(APIView):
             )
 
         query = request.data.get('q', None)
-        source_limit = int(request.data.get('limit', 5))
         source_filter = request.data.get('source_filter', 'both')
+        window, ruku = _verse_expansion(request.data, settings.ASK_VERSE_WINDOW)
 
         if not query:
+            quota.release(reservation)
             return Response(
                 {"error": "La question 'q' est obligatoire."}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         try:
-            llm_service = get_llm_service()
-            vector_service = get_vector_service()
-
-            optimized_query = llm_service.rewrite_query(query)
-            contexts = vector_service.search(optimized_query, top_k=self.SEARCH_TOP_K, source_filter=source_filter)
-            answer = llm_service.generate_response(query, contexts)
-            user_sources = contexts[:source_limit]
-
-            # Déduction et sauvegarde
-            profile.increment_request()
-            ChatHistory.objects.create(
-                user=request.user, 
-                query=query, 
-                response=answer,
-                sources=user_sources
+            source_limit = _parse_limit(request.data, 5)
+        except ValueError as e:
+            quota.release(reservation)
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            conversation_id, refs = _conversation_refs(request.user, request.data)
+        except (LookupError, TypeError, ValueError):
+            quota.release(reservation)
+            return Response(
+                {"error": "Conversation introuvable."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            packed, reused = _retrieve_contexts(
+                query, refs, source_filter, window, ruku, self.SEARCH_TOP_K,
+                admission.tier(request.user)
             )
+            answer = get_llm_service().generate_response(query, packed.contexts)
+            user_sources = packed.selected[:source_limit]
+
+            # Sauvegarde différée (le quota a déjà été décompté)
+            conversation_id = _save_exchange(
+                request.user, conversation_id, query, answer, user_sources, packed, reused
+            )
+            ledger.record(request.user, 'quran_ask')
 
             return Response({
                 "question": query,
                 "answer": answer,
                 "sources": user_sources,
-                "requests_today": profile.requests_today
+                "conversation_id": conversation_id,
+                "requests_today": reservation.requests_today
             }, status=status.HTTP_200_OK)
 
+        except admission.Overloaded as e:
+            quota.release(reservation)
+            ledger.record(request.user, 'quran_ask', success=False)
+            return _overloaded(e)
+
+        except GenerationError as e:
+            # Already logged by LLMService; the failed answer does not count
+            quota.release(reservation)
+            ledger.record(request.user, 'quran_ask', success=False)
+            return Response({"error": str(e)}, status=status.HTTP_502_BAD_GATEWAY)
+
         except Exception as e:
+            quota.release(reservation)
+            ledger.record(request.user, 'quran_ask', success=False)
             logger.exception(f"Erreur lors de la génération de la réponse: {e}")
             return Response(
                 {"error": "Erreur lors de la génération de la réponse."}, 
@@ -177,13 +531,25 @@ class QuranAskView(APIView):
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([PlanTokenBucketThrottle])
 def quran_ask_stream(request):
     """
     Streaming endpoint for Quran Q&A.
     """
+    # The search runs after the response has started: shed now if the
+    # search gate is already full for this plan
+    plan = admission.tier(request.user)
+    gate = admission.get_search_gate()
+    if not gate.would_admit(admission.PRIORITIES[plan]):
+        return _overloaded(admission.Overloaded(gate.timeout))
+    if not get_llm_service().configured:
+        return _llm_not_configured()
+
     profile = request.user.profile
-    if not profile.can_make_request():
-        from django.utils import timezone
+    quota = get_quota_service()
+    with timing.stage('quota'):
+        reservation = quota.reserve(profile)
+    if not reservation.allowed:
         import datetime
         now = timezone.localtime()
         tomorrow = now.replace(hour=0, minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
@@ -214,62 +580,97 @@ def quran_ask_stream(request):
         else:
             data = request.data
     except Exception:
+        quota.release(reservation)
         return JsonResponse({"error": "Invalid Data"}, status=400)
 
     query = data.get('q', '')
     if not query:
+        quota.release(reservation)
         return JsonResponse(
             {"error": "La question 'q' est obligatoire."}, status=400
         )
 
-    source_limit = int(data.get('limit', 5))
+    try:
+        source_limit = _parse_limit(data, 5)
+    except ValueError as e:
+        quota.release(reservation)
+        return JsonResponse({"error": str(e)}, status=400)
     source_filter = data.get('source_filter', 'both')
+    window, ruku = _verse_expansion(data, settings.ASK_VERSE_WINDOW)
 
-    def event_stream():
-        full_response = ""
-        try:
-            llm_service = get_llm_service()
-            vector_service = get_vector_service()
-
-            # Step 1: Query rewriting
-            optimized_query = llm_service.rewrite_query(query)
+    try:
+        conversation_id, refs = _conversation_refs(request.user, data)
+    except (LookupError, TypeError, ValueError):
+        quota.release(reservation)
+        return JsonResponse({"error": "Conversation introuvable."}, status=404)
 
-            # Step 2: Vector search
-            contexts = vector_service.search(optimized_query, top_k=10, source_filter=source_filter)
+    # The response is returned before the stream runs: the generator keeps
+    # timing this request and reports it in a final `timing` event
+    timer = timing.current_timer()
 
-            # Step 3: Send sources first
-            sources = []
-            for ctx in contexts[:source_limit]:
-                source = {k: v for k, v in ctx.items() if k != 'embedding'}
-                sources.append(source)
+    def event_stream():
+        full_response = ""
+        # Until the exchange is saved, any failure gives the reserved request back
+        answered = False
+        with timing.request_timer('quran_ask_stream', timer):
+            try:
+                # Steps 1-2: Query rewriting + vector search + context packing
+                # (a follow-up reuses the contexts of its conversation)
+                packed, reused = _retrieve_contexts(
+                    query, refs, source_filter, window, ruku, 10, plan
+                )
+
+                # Step 3: Send sources first
+                sources = []
+                for ctx in packed.selected[:source_limit]:
+                    source = {k: v for k, v in ctx.items() if k != 'embedding'}
+                    sources.append(source)
 
-            yield json.dumps(
-                {"type": "sources", "data": sources}, ensure_ascii=False
-            ) + "\n"
+                yield json.dumps(
+                    {"type": "sources", "data": sources}, ensure_ascii=False
+                ) + "\n"
 
-            # Step 4: Stream LLM response
-            for chunk in llm_service.generate_response_stream(query, contexts):
-                full_response += chunk
+                # Step 4: Stream LLM response
+                for chunk in get_llm_service().generate_response_stream(query, packed.contexts):
+                    full_response += chunk
+                    yield json.dumps(
+                        {"type": "token", "data": chunk}, ensure_ascii=False
+                    ) + "\n"
+
+                # History keeping, written behind (quota already reserved)
+                saved_conversation_id = _save_exchange(
+                    request.user, conversation_id, query, full_response, sources, packed, reused
+                )
+                answered = True
                 yield json.dumps(
-                    {"type": "token", "data": chunk}, ensure_ascii=False
+                    {"type": "conversation", "data": saved_conversation_id}
                 ) + "\n"
 
-            yield json.dumps({"type": "done"}) + "\n"
-            
-            # Quota processing & History keeping
-            profile.increment_request()
-            ChatHistory.objects.create(
-                user=request.user, 
-                query=query, 
-                response=full_response,
-                sources=sources
-            )
+                ledger.record(request.user, 'quran_ask_stream')
+                yield json.dumps(
+                    {"type": "timing", "data": timing.current_timer().as_dict()}
+                ) + "\n"
 
-        except Exception as e:
-            logger.exception(f"Streaming error: {e}")
-            yield json.dumps(
-                {"type": "error", "data": str(e)}, ensure_ascii=False
-            ) + "\n"
+                yield json.dumps({"type": "done"}) + "\n"
+
+            except admission.Overloaded as e:
+                quota.release(reservation)
+                ledger.record(request.user, 'quran_ask_stream', success=False)
+                yield json.dumps({
+                    "type": "error",
+                    "error_code": "overloaded",
+                    "retry_after": e.retry_after,
+                    "data": "Le service est surchargé, veuillez réessayer dans quelques secondes."
+                }, ensure_ascii=False) + "\n"
+
+            except Exception as e:
+                if not answered:
+                    quota.release(reservation)
+                ledger.record(request.user, 'quran_ask_stream', success=False)
+                logger.exception(f"Streaming error: {e}")
+                yield json.dumps(
+                    {"type": "error", "data": str(e)}, ensure_ascii=False
+                ) + "\n"
 
     response = StreamingHttpResponse(
         event_stream(),
@@ -278,3 +679,86 @@ def quran_ask_stream(request):
     response['Cache-Control'] = 'no-cache'
     response['X-Accel-Buffering'] = 'no'
     return response
+
+
+@require_GET
+def prometheus_metrics(request):
+    """
+    Prometheus scrape endpoint: request/stage duration histograms summed
+    over all workers, plus the history write-behind queue and the search
+    gate of this worker.
+    Protected by `Authorization: Bearer <METRICS_TOKEN>` when set.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return HttpResponse(status=401)
+
+    queue_stats = get_history_queue().stats()
+    gate_stats = admission.get_search_gate().stats()
+    gauges = {
+        'quran_search_gate_active': ("Searches running in this worker", gate_stats['active']),
+        'quran_search_gate_waiting': ("Searches waiting for a slot in this worker", gate_stats['waiting']),
+        'quran_search_gate_admitted_total': ("Searches admitted by this worker", gate_stats['admitted']),
+        'quran_search_gate_shed_total': ("Searches shed (503) by this worker", gate_stats['shed']),
+        'quran_history_queue_depth': ("Chat history rows waiting to be written", queue_stats['depth']),
+        'quran_history_queue_written_total': ("Chat history rows written by this worker", queue_stats['written']),
+        'quran_history_queue_dropped_total': ("Chat history rows dropped by this worker", queue_stats['dropped']),
+    }
+    return HttpResponse(
+        get_metrics().render(gauges),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+@require_GET
+def readiness(request):
+    """
+    Load balancer health check: 200 once this worker has loaded and warmed
+    up the model and indexes (with their versions), 503 until then.
+    """
+    data = warmup.readiness()
+    if not data['ready']:
+        warmup.start_background_warm_up()
+    return JsonResponse(data, status=200 if data['ready'] else 503)
+
+
+class IndexReloadView(APIView):
+    """
+    Admin signal: reload the current manifest version of the indexes.
+
+    This worker reloads right away in the background; the other workers
+    follow at their next manifest check (INDEX_WATCH_INTERVAL, requires
+    the shared cache). Searches keep being served by the loaded version
+    until the new one is swapped in.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        manifest = index_store.read_manifest()
+        return Response({
+            'loaded': get_vector_service().index_versions,
+            'current': manifest.get('current') if manifest else index_store.LEGACY_VERSION,
+            'versions': sorted(manifest['versions']) if manifest else [],
+        }, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        generation = index_store.request_reload()
+        service = get_vector_service()
+        threading.Thread(target=service.check_for_update, name='index-reload', daemon=True).start()
+        return Response(
+            {'loaded': service.indexes.version, 'generation': generation},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class MemoryReportView(APIView):
+    """
+    Memory of this worker per component (model, FAISS indexes, metadata,
+    lookups) and its RSS against MEMORY_BUDGET_MB. Loads whatever the
+    worker has not loaded yet, as `manage.py memory_report` does.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        memory_report.load_serving_stack()
+        return Response(memory_report.report(), status=status.HTTP_200_OK)